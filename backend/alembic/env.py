@@ -3,6 +3,7 @@ import asyncio
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from alembic import context
@@ -58,7 +59,15 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    async def do_run_migrations(connection):
+    def do_run_migrations(connection):
+        # Идентификаторы ревизий (004_add_employee_duty_preferences) длиннее стандартных
+        # 32 символов alembic_version.version_num
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(64) NOT NULL, "
+            "CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num))"
+        ))
+        connection.execute(text("ALTER TABLE alembic_version ALTER COLUMN version_num TYPE VARCHAR(64)"))
+        connection.commit()
         context.configure(connection=connection, target_metadata=target_metadata)
         with context.begin_transaction():
             context.run_migrations()
@@ -26,7 +26,7 @@ def upgrade() -> None:
             SELECT column_name FROM information_schema.columns WHERE table_name='duty_types' AND column_name='duty_category'
         """))
         if not result.fetchone():
-    op.add_column('duty_types', sa.Column('duty_category', sa.String(50), nullable=True, server_default='academic'))
+            op.add_column('duty_types', sa.Column('duty_category', sa.String(50), nullable=True, server_default='academic'))
         result = conn.execute(sa.text("""
             SELECT column_name FROM information_schema.columns WHERE table_name='duty_types' AND column_name='priority'
         """))
@@ -41,7 +41,7 @@ def downgrade() -> None:
             SELECT column_name FROM information_schema.columns WHERE table_name='duty_types' AND column_name='duty_category'
         """))
         if result.fetchone():
-    op.drop_column('duty_types', 'duty_category') 
+            op.drop_column('duty_types', 'duty_category')
         result = conn.execute(sa.text("""
             SELECT column_name FROM information_schema.columns WHERE table_name='duty_types' AND column_name='priority'
         """))
@@ -0,0 +1,35 @@
+"""add indexes for period range filters
+
+Revision ID: 005_add_period_indexes
+Revises: 004_add_employee_duty_preferences, 41c538533fd1
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_add_period_indexes'
+down_revision: Union[str, None] = ('004_add_employee_duty_preferences', '41c538533fd1')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS: индексы могли быть созданы create_all вместе с таблицей
+    op.create_index(op.f('ix_duty_records_duty_date'), 'duty_records', ['duty_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_duty_records_employee_id_duty_date', 'duty_records', ['employee_id', 'duty_date'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_department_duty_days_duty_date'), 'department_duty_days', ['duty_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_employee_status_schedules_employee_id_start_date', 'employee_status_schedules', ['employee_id', 'start_date'], unique=False, if_not_exists=True)
+    op.create_index('ix_employee_duty_preferences_employee_id_date', 'employee_duty_preferences', ['employee_id', 'date'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_employee_duty_preferences_employee_id_date', table_name='employee_duty_preferences')
+    op.drop_index('ix_employee_status_schedules_employee_id_start_date', table_name='employee_status_schedules')
+    op.drop_index(op.f('ix_department_duty_days_duty_date'), table_name='department_duty_days')
+    op.drop_index('ix_duty_records_employee_id_duty_date', table_name='duty_records')
+    op.drop_index(op.f('ix_duty_records_duty_date'), table_name='duty_records')
@@ -0,0 +1,47 @@
+"""add department duty rules table
+
+Revision ID: 006_add_department_duty_rules
+Revises: 005_add_period_indexes
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006_add_department_duty_rules'
+down_revision: Union[str, None] = '005_add_period_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Таблица могла быть создана create_all (профиль development) до применения миграций
+    if sa.inspect(op.get_bind()).has_table('department_duty_rules'):
+        return
+    op.create_table('department_duty_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=False),
+    sa.Column('duty_type_id', sa.Integer(), nullable=False),
+    sa.Column('rrule', sa.String(length=500), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('end_date', sa.Date(), nullable=True),
+    sa.Column('exdates', sa.JSON(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['department_id'], ['departments.id'], ),
+    sa.ForeignKeyConstraint(['duty_type_id'], ['duty_types.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_department_duty_rules_id'), 'department_duty_rules', ['id'], unique=False)
+    op.create_index(op.f('ix_department_duty_rules_department_id'), 'department_duty_rules', ['department_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_department_duty_rules_department_id'), table_name='department_duty_rules')
+    op.drop_index(op.f('ix_department_duty_rules_id'), table_name='department_duty_rules')
+    op.drop_table('department_duty_rules')
@@ -0,0 +1,39 @@
+"""unique employee duty type assignments
+
+Revision ID: 007_unique_employee_duty_types
+Revises: 006_add_department_duty_rules
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007_unique_employee_duty_types'
+down_revision: Union[str, None] = '006_add_department_duty_rules'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Удаляем дубликаты назначений, оставляя самое раннее
+    op.execute("""
+        DELETE FROM employee_duty_types AS duplicate
+        USING employee_duty_types AS original
+        WHERE duplicate.employee_id = original.employee_id
+          AND duplicate.duty_type_id = original.duty_type_id
+          AND duplicate.id > original.id
+    """)
+    constraints = sa.inspect(op.get_bind()).get_unique_constraints('employee_duty_types')
+    if any(constraint['name'] == 'uq_employee_duty_types_employee_id_duty_type_id' for constraint in constraints):
+        return
+    op.create_unique_constraint(
+        'uq_employee_duty_types_employee_id_duty_type_id', 'employee_duty_types', ['employee_id', 'duty_type_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_employee_duty_types_employee_id_duty_type_id', 'employee_duty_types', type_='unique')
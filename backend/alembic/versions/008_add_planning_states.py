@@ -0,0 +1,40 @@
+"""add planning states table
+
+Revision ID: 008_add_planning_states
+Revises: 007_unique_employee_duty_types
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '008_add_planning_states'
+down_revision: Union[str, None] = '007_unique_employee_duty_types'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Таблица могла быть создана create_all (профиль development) до применения миграций
+    if sa.inspect(op.get_bind()).has_table('planning_states'):
+        return
+    op.create_table('planning_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('scope', sa.String(length=50), nullable=False),
+    sa.Column('planned_through', sa.Date(), nullable=False),
+    sa.Column('state', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_planning_states_id'), 'planning_states', ['id'], unique=False)
+    op.create_index('ix_planning_states_scope_planned_through', 'planning_states', ['scope', 'planned_through'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_planning_states_scope_planned_through', table_name='planning_states')
+    op.drop_index(op.f('ix_planning_states_id'), table_name='planning_states')
+    op.drop_table('planning_states')
@@ -0,0 +1,39 @@
+"""add department delete jobs table
+
+Revision ID: 009_add_department_delete_jobs
+Revises: 008_add_planning_states
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009_add_department_delete_jobs'
+down_revision: Union[str, None] = '008_add_planning_states'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Таблица могла быть создана create_all (профиль development) до применения миграций
+    if sa.inspect(op.get_bind()).has_table('department_delete_jobs'):
+        return
+    op.create_table('department_delete_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('department_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('counts', sa.JSON(), nullable=False),
+    sa.Column('deleted', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('department_delete_jobs')
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Бенчмарк компактного формата списков нарядов (services/compact_duties.py).
+
+Для /duty-distribution/all, /duty-distribution/department/{id} (самое большое
+подразделение) и, с --generate, POST /generate сравниваются обычный формат и compact=true:
+размер тела, размер после gzip и задержка p50 (--requests последовательных запросов,
+ASGI в процессе, без сжатия ответа). Результаты пишутся в JSON
+(benchmarks/results/compact-duties-<commit>.json).
+
+База берется из DATABASE_URL и должна содержать данные за месяц --year/--month.
+Наряды, созданные /generate за пустой месяц --generate-month, удаляются после каждого
+запроса (вне замера).
+
+Запуск из каталога backend:
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_compact_duties.py --year 2025 --month 2
+"""
+import argparse
+import asyncio
+import calendar
+import platform
+import zlib
+from collections import Counter
+
+import httpx
+
+from common import git_revision, percentile, timed_calls, write_report
+
+import main  # noqa: E402
+
+
+def month_bounds(year: int, month: int):
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
+
+
+async def measure(client: httpx.AsyncClient, method: str, path: str, requests: int, body=None, cleanup=None) -> dict:
+    async def call():
+        response = await client.request(method, path, json=body, headers={"accept-encoding": "identity"})
+        return response.raise_for_status()
+
+    latencies, responses = await timed_calls(call, requests, cleanup)
+    content = responses[-1].content
+    return {
+        "bytes": len(content),
+        "gzip_bytes": len(zlib.compress(content, 6)),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+    }
+
+
+async def run(args) -> list:
+    month_start, month_end = month_bounds(args.year, args.month)
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            duties = (await client.get(f"/api/duty-distribution/all?year={args.year}&month={args.month}")).json()
+            largest = Counter(duty["department_id"] for duty in duties).most_common(1)[0][0]
+            endpoints = [
+                ("GET", f"/api/duty-distribution/all?year={args.year}&month={args.month}", None),
+                ("GET", f"/api/duty-distribution/department/{largest}?start_date={month_start}&end_date={month_end}", None),
+            ]
+            generate_start, generate_end = month_bounds(args.year, args.generate_month)
+            if args.generate:
+                endpoints.append((
+                    "POST", "/api/duty-distribution/generate", {"start_date": generate_start, "end_date": generate_end}
+                ))
+
+            async def clear_generated():
+                await client.request(
+                    "DELETE", "/api/duty-distribution/clear", json={"start_date": generate_start, "end_date": generate_end}
+                )
+
+            for method, path, body in endpoints:
+                for compact in (False, True):
+                    url = path + ("&" if "?" in path else "?") + "compact=true" if compact else path
+                    result = await measure(
+                        client, method, url, args.requests, body, clear_generated if method == "POST" else None
+                    )
+                    endpoint = f"{method} {path.split('?')[0]}"
+                    results.append({"endpoint": endpoint, "compact": compact, **result})
+                    print(
+                        f"{endpoint:<48} {'compact' if compact else 'full':<8} {result['bytes'] / 1024:>8.0f} КБ  "
+                        f"gzip {result['gzip_bytes'] / 1024:>6.0f} КБ  p50 {result['p50_ms']:>8.1f} мс"
+                    )
+    return results
+
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Компактный формат списков нарядов")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--generate", action="store_true", help="Измерять и POST /generate")
+    parser.add_argument("--generate-month", type=int, default=4, help="Месяц без нарядов для POST /generate")
+    parser.add_argument("--output", help="Файл результатов")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "compact_duties",
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "results": asyncio.run(run(args)),
+    }
+    write_report(report, "compact-duties", args.output)
+
+
+if __name__ == "__main__":
+    main_cli()
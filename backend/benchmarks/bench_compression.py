@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Бенчмарк сжатия ответов (services/compression.py).
+
+Для каждого эндпоинта и каждого доступного алгоритма (плюс identity - без сжатия)
+выполняется --requests последовательных запросов с соответствующим Accept-Encoding.
+Приложение вызывается в процессе (ASGI, без сети); выводятся размер тела до и после
+сжатия, степень сжатия, задержка p50 и процессорное время сжатия на ответ (по метрике
+compression_cpu_seconds_total). Тело ответа распаковывается и сверяется по размеру с
+несжатым (порядок строк с одинаковыми ФИО в выборке не фиксирован). Результаты пишутся
+в JSON (benchmarks/results/compression-<commit>.json).
+
+База берется из DATABASE_URL и должна содержать данные за месяц --year/--month.
+
+Запуск из каталога backend:
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_compression.py --year 2025 --month 2
+"""
+import argparse
+import asyncio
+import gzip
+import platform
+
+import httpx
+
+from common import git_revision, percentile, timed_calls, write_report
+
+import main  # noqa: E402
+from services import compression  # noqa: E402
+from services.metrics import compression_cpu_seconds_total  # noqa: E402
+
+
+def decompress(encoding: str, body: bytes) -> bytes:
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "br":
+        return compression.brotli.decompress(body)
+    if encoding == "zstd":
+        return compression.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
+
+
+def cpu_seconds(encoding: str) -> float:
+    return compression_cpu_seconds_total._values.get((encoding,), 0.0)
+
+
+async def fetch(client: httpx.AsyncClient, path: str, encoding: str):
+    """Сырое тело ответа и заголовок content-encoding"""
+    async with client.stream("GET", path, headers={"accept-encoding": encoding}) as response:
+        response.raise_for_status()
+        body = b"".join([part async for part in response.aiter_raw()])
+        return body, response.headers.get("content-encoding", "identity")
+
+
+async def measure(client: httpx.AsyncClient, path: str, encoding: str, requests: int, reference: bytes) -> dict:
+    # Прогрев отдельно: время сжатия считается только по замеренным запросам
+    await fetch(client, path, encoding)
+    cpu_before = cpu_seconds(encoding)
+    latencies, responses = await timed_calls(lambda: fetch(client, path, encoding), requests, warmup=False)
+    body, applied = responses[-1]
+    if len(decompress(applied, body)) != len(reference):
+        raise RuntimeError(f"{path}: размер тела после распаковки {applied} не совпадает с несжатым")
+    return {
+        "applied": applied,
+        "bytes": len(body),
+        "ratio": round(len(body) / len(reference), 4),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "cpu_ms_per_response": round((cpu_seconds(encoding) - cpu_before) / requests * 1000, 3),
+    }
+
+
+async def run(args) -> list:
+    paths = [
+        f"/api/duty-distribution/all?year={args.year}&month={args.month}",
+        "/api/employees/with-status",
+        "/api/duty-types/all-with-departments",
+        f"/api/duty-distribution/export?year={args.year}&month={args.month}&format=csv",
+    ]
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            for path in paths:
+                reference, _ = await fetch(client, path, "identity")
+                for encoding in ["identity"] + compression.available_encodings():
+                    result = await measure(client, path, encoding, args.requests, reference)
+                    results.append({"path": path, "encoding": encoding, "identity_bytes": len(reference), **result})
+                    print(
+                        f"{path.split('?')[0]:<40} {encoding:<9} {result['bytes'] / 1024:>8.0f} КБ "
+                        f"({result['ratio']:.3f})  p50 {result['p50_ms']:>7.1f} мс  "
+                        f"сжатие {result['cpu_ms_per_response']:>6.2f} мс/ответ"
+                    )
+    return results
+
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Сжатие ответов API")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--output", help="Файл результатов")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "compression",
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "encodings": compression.available_encodings(),
+        "requests": args.requests,
+        "results": asyncio.run(run(args)),
+    }
+    write_report(report, "compression", args.output)
+
+
+if __name__ == "__main__":
+    main_cli()
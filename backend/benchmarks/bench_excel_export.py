@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Бенчмарк экспорта нарядов подразделения в Excel (формат duty_types).
+
+Сравнивает прежний способ оформления (новые PatternFill/Font/Border на каждую ячейку
+и поиск палитры по подстроке для каждой ячейки) с реестром именованных стилей.
+
+Запуск из каталога backend:
+    python benchmarks/bench_excel_export.py --employees 500
+"""
+import argparse
+import io
+import random
+import time
+from datetime import date, timedelta
+
+# Добавляет путь к backend
+import common  # noqa: F401
+
+import openpyxl
+
+from services.excel_export import DutyExportRow, render_department_workbook
+
+DUTY_TYPE_NAMES = [
+    "Академический наряд", "Дежурный по курсу", "Патрульный", "Караульный",
+    "Конвойный", "Охрана объекта", "Инспектор", "Помощник коменданта",
+    "Наряд по столовой", "Наряд по КПП",
+]
+
+
+def generate_rows(employees_count: int, year: int, month: int, seed: int = 42):
+    """Синтетический месяц: каждый сотрудник заступает в наряд примерно раз в 3 дня"""
+    rng = random.Random(seed)
+    first_day = date(year, month, 1)
+    days = ((first_day.replace(day=28) + timedelta(days=4)).replace(day=1) - first_day).days
+    rows = []
+    for employee_id in range(1, employees_count + 1):
+        name = f"Фамилия{employee_id} Имя{employee_id}"
+        for day in range(rng.randint(0, 2), days, 3):
+            duty_type_id = rng.randrange(len(DUTY_TYPE_NAMES))
+            rows.append(DutyExportRow(
+                duty_date=first_day + timedelta(days=day),
+                employee_id=employee_id,
+                employee_name=name,
+                department_id=1,
+                department_name="Подразделение 1",
+                duty_type_id=duty_type_id + 1,
+                duty_type_name=DUTY_TYPE_NAMES[duty_type_id]
+            ))
+    return rows
+
+
+def legacy_render(rows, department_id: int, year: int, month: int) -> bytes:
+    """Прежняя реализация оформления: стили создаются заново для каждой ячейки"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = f"Подразделение {department_id} - по датам и типам"
+    dates = sorted({row.duty_date for row in rows})
+    duty_types = []
+    duty_type_set = set()
+    for row in rows:
+        if row.duty_type_id not in duty_type_set:
+            duty_types.append((row.duty_type_id, row.duty_type_name))
+            duty_type_set.add(row.duty_type_id)
+    duty_map = {}
+    for row in rows:
+        duty_map.setdefault((row.duty_date, row.duty_type_id), []).append(row.employee_name)
+
+    def get_duty_color(duty_type_name: str):
+        name = duty_type_name.lower()
+        if 'академический' in name:
+            return {'bg': 'E9D5FF', 'text': '7C3AED'}
+        elif 'дежурный' in name or 'дежурство' in name:
+            return {'bg': 'DBEAFE', 'text': '1D4ED8'}
+        elif 'патрульный' in name or 'патруль' in name:
+            return {'bg': 'D1FAE5', 'text': '047857'}
+        elif 'караульный' in name or 'караул' in name:
+            return {'bg': 'FEE2E2', 'text': 'DC2626'}
+        elif 'конвойный' in name or 'конвой' in name:
+            return {'bg': 'FED7AA', 'text': 'EA580C'}
+        elif 'охранный' in name or 'охрана' in name:
+            return {'bg': 'FEF3C7', 'text': 'D97706'}
+        elif 'инспектор' in name:
+            return {'bg': 'E0E7FF', 'text': '3730A3'}
+        elif 'комендант' in name:
+            return {'bg': 'FCE7F3', 'text': 'BE185D'}
+        return {'bg': 'F3F4F6', 'text': '374151'}
+
+    header = ["Дата"] + [name for _, name in duty_types]
+    ws.append(header)
+    for col in range(1, len(header) + 1):
+        cell = ws.cell(row=1, column=col)
+        cell.font = openpyxl.styles.Font(bold=True)
+        cell.fill = openpyxl.styles.PatternFill(start_color="E5E7EB", end_color="E5E7EB", fill_type="solid")
+    for row_idx, duty_date in enumerate(dates, start=2):
+        values = [duty_date.strftime("%d-%m")]
+        for col_idx, (duty_type_id, duty_type_name) in enumerate(duty_types, start=2):
+            employees = duty_map.get((duty_date, duty_type_id), [])
+            values.append(", ".join(employees) if employees else "—")
+            if employees:
+                cell = ws.cell(row=row_idx, column=col_idx)
+                colors = get_duty_color(duty_type_name)
+                cell.fill = openpyxl.styles.PatternFill(start_color=colors['bg'], end_color=colors['bg'], fill_type="solid")
+                cell.font = openpyxl.styles.Font(color=colors['text'], bold=True)
+                cell.border = openpyxl.styles.Border(
+                    left=openpyxl.styles.Side(style='thin'),
+                    right=openpyxl.styles.Side(style='thin'),
+                    top=openpyxl.styles.Side(style='thin'),
+                    bottom=openpyxl.styles.Side(style='thin')
+                )
+        ws.append(values)
+    stream = io.BytesIO()
+    wb.save(stream)
+    return stream.getvalue()
+
+
+def measure(label: str, render, repeat: int):
+    timings = []
+    content = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        content = render()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f"{label:<10} {best * 1000:10.1f} ms {len(content) / 1024:10.1f} KiB")
+    return best, len(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк экспорта нарядов в Excel")
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = generate_rows(args.employees, args.year, args.month)
+    print(f"Сотрудников: {args.employees}, записей нарядов: {len(rows)}")
+    print(f"{'вариант':<10} {'время':>13} {'размер':>14}")
+    before = measure("до", lambda: legacy_render(rows, 1, args.year, args.month), args.repeat)
+    after = measure("после", lambda: render_department_workbook(rows, 1, args.year, args.month, "duty_types")[1], args.repeat)
+    print(f"Ускорение: x{before[0] / after[0]:.2f}, размер: {after[1] / before[1] * 100:.0f}% от исходного")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Бенчмарк сериализации больших JSON-ответов: стандартный путь FastAPI и services/fast_json.
+
+Для каждого эндпоинта выполняется --requests последовательных запросов в каждом режиме
+(FAST_JSON_RESPONSES выкл/вкл). Приложение вызывается в процессе (ASGI, без сети).
+Выводятся задержки p50/p99, размер ответа и пропускная способность в байтах в секунду.
+Результаты пишутся в JSON (benchmarks/results/json-responses-<commit>.json).
+
+База берется из DATABASE_URL и должна содержать данные за месяц --year/--month, например
+после benchmarks/bench_planner.py --database-url ... (5000 сотрудников, февраль 2025).
+С --generate измеряется и POST /generate за пустой месяц --generate-month: созданные
+наряды удаляются после каждого запроса (вне замера).
+
+Запуск из каталога backend:
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_json_responses.py --year 2025 --month 2
+"""
+import argparse
+import asyncio
+import calendar
+import platform
+
+import httpx
+
+from common import git_revision, percentile, timed_calls, write_report
+
+import main  # noqa: E402
+from settings import settings  # noqa: E402
+
+
+async def measure(client: httpx.AsyncClient, method: str, path: str, requests: int, body=None, cleanup=None) -> dict:
+    async def call():
+        return (await client.request(method, path, json=body)).raise_for_status()
+
+    latencies, responses = await timed_calls(call, requests, cleanup)
+    sizes = [len(response.content) for response in responses]
+    total = sum(latencies)
+    return {
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "bytes": sizes[-1],
+        "bytes_per_second": round(sum(sizes) / total),
+    }
+
+
+async def run(args) -> list:
+    month = args.generate_month
+    period_start = f"{args.year}-{month:02d}-01"
+    period_end = f"{args.year}-{month:02d}-{calendar.monthrange(args.year, month)[1]:02d}"
+    endpoints = [
+        ("GET", f"/api/duty-distribution/all?year={args.year}&month={args.month}", None),
+        ("GET", "/api/employees/with-status", None),
+        ("GET", "/api/duty-types/all-with-departments", None),
+    ]
+    if args.generate:
+        endpoints.append(("POST", "/api/duty-distribution/generate", {"start_date": period_start, "end_date": period_end}))
+
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            async def clear_generated():
+                # Наряды, существовавшие до бенчмарка, не затрагиваются: период должен быть пустым
+                await client.request("DELETE", "/api/duty-distribution/clear", json={"start_date": period_start, "end_date": period_end})
+
+            for method, path, body in endpoints:
+                for fast in (False, True):
+                    settings.fast_json_responses = fast
+                    result = await measure(
+                        client, method, path, args.requests, body, clear_generated if method == "POST" else None
+                    )
+                    results.append({"endpoint": f"{method} {path.split('?')[0]}", "fast_json": fast, **result})
+                    print(
+                        f"{method} {path.split('?')[0]:<40} {'fast' if fast else 'std ':<5} "
+                        f"p50 {result['p50_ms']:>8.1f} мс  p99 {result['p99_ms']:>8.1f} мс  "
+                        f"{result['bytes'] / 1024:>8.0f} КБ  {result['bytes_per_second'] / 1024 / 1024:>7.1f} МБ/с"
+                    )
+    return results
+
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Сериализация больших JSON-ответов")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--generate", action="store_true", help="Измерять и POST /generate")
+    parser.add_argument("--generate-month", type=int, default=4, help="Месяц без нарядов для POST /generate")
+    parser.add_argument("--output", help="Файл результатов")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "json_responses",
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "results": asyncio.run(run(args)),
+    }
+    write_report(report, "json-responses", args.output)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Бенчмарк распределения нарядов на синтетической организации.
+
+Генератор детерминированный (--seed): структуры, подразделения, сотрудники, типы нарядов
+с разными people_per_day/days_duration, расписания статусов, предпочтения, академический
+календарь и история нарядов за предыдущий месяц.
+
+Режимы:
+    engine   - только чистый движок (services.duty_planner.plan_snapshot) на снимке,
+               собранном в памяти, без базы данных;
+    database - полный цикл на локальном PostgreSQL: загрузка снимка, распределение и запись.
+               Схема в указанной базе пересоздается, используйте отдельную базу.
+
+Метрики: время (по этапам), число SQL-запросов, пиковая память (tracemalloc),
+незаполненные места и разброс числа нарядов между сотрудниками. Результаты пишутся
+в JSON, чтобы сравнивать их между коммитами (--compare).
+
+Запуск из каталога backend:
+    python benchmarks/bench_planner.py --sizes 50,1000,5000
+    python benchmarks/bench_planner.py --mode database --database-url postgresql+asyncpg://.../naradi_bench
+    python benchmarks/bench_planner.py --compare benchmarks/results/planner-old.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from common import git_revision, write_report
+
+from services.duty_planner import (
+    BLOCKING_STATUSES, PlanningDutyType, PlanningEmployee, PlanningSnapshot, plan_records, plan_snapshot
+)
+from services.periods import month_period
+
+DEFAULT_SIZES = "50,200,1000,5000,20000"
+EMPLOYEES_PER_DEPARTMENT = 50
+DEPARTMENTS_PER_STRUCTURE = 10
+
+
+def generate_organization(employees_count: int, year: int, month: int, seed: int = 42) -> dict:
+    """Синтетическая организация в виде строк таблиц (списки словарей с явными ID)"""
+    rng = random.Random(seed)
+    period = month_period(year, month)
+    days = list(period.days())
+    previous = month_period(*((year - 1, 12) if month == 1 else (year, month - 1)))
+    previous_days = list(previous.days())
+
+    departments_count = max(1, employees_count // EMPLOYEES_PER_DEPARTMENT)
+    structures_count = max(1, departments_count // DEPARTMENTS_PER_STRUCTURE)
+    structures = [{"id": index + 1, "name": f"Структура {index + 1}", "parent_id": None} for index in range(structures_count)]
+    departments = [
+        {"id": structures_count + index + 1, "name": f"Подразделение {index + 1}", "parent_id": index % structures_count + 1}
+        for index in range(departments_count)
+    ]
+
+    # Количество людей в наряде растет с размером организации
+    scale = max(2, employees_count // 250)
+    duty_types = [
+        {"id": 1, "name": "Караул", "duty_category": "division", "people_per_day": scale, "days_duration": 1},
+        {"id": 2, "name": "Патруль", "duty_category": "division", "people_per_day": max(1, scale // 2), "days_duration": 1},
+        {"id": 3, "name": "Дежурный по курсу", "duty_category": "department", "people_per_day": max(1, scale // 4), "days_duration": 2},
+        {"id": 4, "name": "Наряд по КПП", "duty_category": "division", "people_per_day": 2, "days_duration": 3},
+        {"id": 5, "name": "Академический наряд", "duty_category": "academic", "people_per_day": 1, "days_duration": 1},
+        {"id": 6, "name": "Академический дежурный", "duty_category": "academic", "people_per_day": 2, "days_duration": 1},
+    ]
+    common_types = [1, 2, 3, 4]
+    academic_types = [5, 6]
+
+    employees = []
+    employee_duty_types = []
+    for index in range(employees_count):
+        employee_id = index + 1
+        employees.append({
+            "id": employee_id,
+            "first_name": f"Имя{employee_id}",
+            "last_name": f"Фамилия{employee_id}",
+            "position": "курсант",
+            "department_id": departments[index % departments_count]["id"],
+            "status": "НЛ",
+            "duty_count": rng.randint(0, 5),
+            "is_active": True,
+        })
+        for duty_type_id in sorted(rng.sample(common_types, rng.randint(1, 3))) + academic_types:
+            employee_duty_types.append({"employee_id": employee_id, "duty_type_id": duty_type_id, "is_active": True})
+
+    status_schedules = []
+    for employee in rng.sample(employees, employees_count // 20):
+        start = rng.choice(days)
+        status_schedules.append({
+            "employee_id": employee["id"],
+            "status": rng.choice(BLOCKING_STATUSES),
+            "start_date": start,
+            "end_date": start + timedelta(days=rng.randint(2, 9)),
+        })
+
+    preferences = []
+    for employee in rng.sample(employees, employees_count // 10):
+        for preference_date in rng.sample(days, rng.randint(1, 3)):
+            preferences.append({
+                "employee_id": employee["id"],
+                "date": preference_date,
+                "preference_type": rng.choice(("preferred", "unavailable")),
+            })
+
+    # Каждое подразделение дежурит по академическим нарядам раз в неделю
+    department_duty_days = [
+        {"department_id": department["id"], "duty_type_id": duty_type_id, "duty_date": day}
+        for department in departments
+        for offset, duty_type_id in enumerate(academic_types)
+        for day in days
+        if day.weekday() == (department["id"] + offset * 3) % 7
+    ]
+
+    qualified = {}
+    for row in employee_duty_types:
+        qualified.setdefault(row["employee_id"], []).append(row["duty_type_id"])
+    history = []
+    for employee in employees:
+        for _ in range(rng.randint(0, 3)):
+            history.append({
+                "employee_id": employee["id"],
+                "duty_type_id": rng.choice(qualified[employee["id"]]),
+                "duty_date": rng.choice(previous_days),
+            })
+
+    return {
+        "period": period,
+        "structures": structures,
+        "departments": departments,
+        "duty_types": duty_types,
+        "employees": employees,
+        "employee_duty_types": employee_duty_types,
+        "status_schedules": status_schedules,
+        "preferences": preferences,
+        "department_duty_days": department_duty_days,
+        "duty_records": history,
+    }
+
+
+def build_snapshot(organization: dict) -> PlanningSnapshot:
+    """Снимок для чистого движка - то же, что вернул бы load_planning_snapshot для всей организации"""
+    period = organization["period"]
+    duty_types = {
+        row["id"]: PlanningDutyType(row["id"], row["name"], row["duty_category"], row["people_per_day"], row["days_duration"])
+        for row in organization["duty_types"]
+    }
+    employees = {
+        row["id"]: PlanningEmployee(row["id"], row["last_name"], row["first_name"], row["department_id"], row["duty_count"])
+        for row in organization["employees"]
+    }
+    qualified = {}
+    for row in sorted(organization["employee_duty_types"], key=lambda item: (item["duty_type_id"], item["employee_id"])):
+        qualified.setdefault(row["duty_type_id"], []).append(row["employee_id"])
+
+    calendar = {}
+    for row in organization["department_duty_days"]:
+        calendar.setdefault((row["duty_type_id"], row["duty_date"]), []).append(row["department_id"])
+    calendar = {key: sorted(value) for key, value in calendar.items()}
+
+    last_duty_by_type = {}
+    last_duty_any = {}
+    for row in organization["duty_records"]:
+        key = (row["employee_id"], row["duty_type_id"])
+        if last_duty_by_type.get(key, date.min) < row["duty_date"]:
+            last_duty_by_type[key] = row["duty_date"]
+        if last_duty_any.get(row["employee_id"], (date.min, 1))[0] < row["duty_date"]:
+            last_duty_any[row["employee_id"]] = (row["duty_date"], duty_types[row["duty_type_id"]].days_duration)
+
+    preferences = {}
+    for row in organization["preferences"]:
+        key = (row["employee_id"], row["date"])
+        if preferences.get(key) != "unavailable":
+            preferences[key] = row["preference_type"]
+
+    blocked = {}
+    for row in organization["status_schedules"]:
+        blocked.setdefault(row["employee_id"], []).append((row["start_date"], row["end_date"]))
+
+    return PlanningSnapshot(
+        start_date=period.start,
+        end_date=period.last_day,
+        duty_types=[duty_types[duty_type_id] for duty_type_id in sorted(qualified)],
+        employees=employees,
+        qualified=qualified,
+        calendar=calendar,
+        period_counts={},
+        last_duty_by_type=last_duty_by_type,
+        last_duty_any=last_duty_any,
+        preferences=preferences,
+        blocked=blocked,
+        existing_records=set(),
+    )
+
+
+def plan_quality(snapshot: PlanningSnapshot, duties: list) -> dict:
+    """Незаполненные места (по дням и типам нарядов) и разброс нагрузки между сотрудниками"""
+    assigned = {}
+    per_employee = dict.fromkeys(snapshot.employees, 0)
+    for duty in duties:
+        key = (duty["duty_type_id"], duty["date"])
+        assigned[key] = assigned.get(key, 0) + 1
+        per_employee[duty["employee_id"]] += 1
+
+    slots = 0
+    unfilled = 0
+    current_date = snapshot.start_date
+    while current_date <= snapshot.end_date:
+        for duty_type in snapshot.duty_types:
+            if duty_type.duty_category == "academic":
+                needed = duty_type.people_per_day * len(snapshot.calendar.get((duty_type.id, current_date), ()))
+            else:
+                needed = duty_type.people_per_day
+            slots += needed
+            unfilled += max(0, needed - assigned.get((duty_type.id, current_date.isoformat()), 0))
+        current_date += timedelta(days=1)
+
+    # Равномерность с учетом уже отработанных нарядов (duty_count)
+    totals = [count + snapshot.employees[employee_id].duty_count for employee_id, count in per_employee.items()]
+    return {
+        "duties": len(duties),
+        "slots": slots,
+        "unfilled_slots": unfilled,
+        "fairness_spread": max(totals) - min(totals) if totals else 0,
+        "fairness_stdev": round(statistics.pstdev(totals), 3) if totals else 0.0,
+    }
+
+
+def run_engine(organization: dict) -> dict:
+    started = time.perf_counter()
+    snapshot = build_snapshot(organization)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    duties = plan_snapshot(snapshot)
+    records = plan_records(snapshot, duties)
+    plan_seconds = time.perf_counter() - started
+
+    # Память измеряется отдельным прогоном: tracemalloc заметно замедляет движок
+    tracemalloc.start()
+    plan_snapshot(snapshot)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "timings": {"snapshot": round(build_seconds, 4), "plan": round(plan_seconds, 4)},
+        "wall_seconds": round(plan_seconds, 4),
+        "queries": 0,
+        "records": len(records),
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+        **plan_quality(snapshot, duties),
+    }
+
+
+async def run_database(organization: dict, database_url: str) -> dict:
+    from sqlalchemy import event, insert
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from database import Base
+    from models.models import (
+        Department, DepartmentDutyDay, DutyRecord, DutyType, Employee, EmployeeDutyPreference,
+        EmployeeDutyType, EmployeeStatusSchedule
+    )
+    from services.duty_planner import load_planning_snapshot, write_plan_records
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        for model, rows in (
+            (Department, organization["structures"]),
+            (Department, organization["departments"]),
+            (DutyType, organization["duty_types"]),
+            (Employee, organization["employees"]),
+            (EmployeeDutyType, organization["employee_duty_types"]),
+            (EmployeeStatusSchedule, organization["status_schedules"]),
+            (EmployeeDutyPreference, organization["preferences"]),
+            (DepartmentDutyDay, organization["department_duty_days"]),
+            (DutyRecord, organization["duty_records"]),
+        ):
+            if rows:
+                await session.execute(insert(model), rows)
+        await session.commit()
+
+    queries = 0
+
+    def count_query(*args):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+    period = organization["period"]
+    tracemalloc.start()
+    try:
+        async with AsyncSession(engine) as session:
+            started = time.perf_counter()
+            snapshot = await load_planning_snapshot(session, period.start, period.last_day)
+            loaded = time.perf_counter()
+            duties = plan_snapshot(snapshot)
+            planned = time.perf_counter()
+            records = plan_records(snapshot, duties)
+            await write_plan_records(session, records)
+            await session.commit()
+            written = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        event.remove(engine.sync_engine, "before_cursor_execute", count_query)
+        await engine.dispose()
+
+    return {
+        "timings": {
+            "snapshot": round(loaded - started, 4),
+            "plan": round(planned - loaded, 4),
+            "write": round(written - planned, 4),
+        },
+        "wall_seconds": round(written - started, 4),
+        "queries": queries,
+        "records": len(records),
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+        **plan_quality(snapshot, duties),
+    }
+
+
+
+def compare(current: dict, baseline_path: str):
+    """Сравнить время и качество с сохраненным результатом"""
+    with open(baseline_path, encoding="utf-8") as stream:
+        baseline = {item["employees"]: item for item in json.load(stream)["results"]}
+    print(f"\nСравнение с {baseline_path}:")
+    for item in current["results"]:
+        old = baseline.get(item["employees"])
+        if not old:
+            continue
+        ratio = item["wall_seconds"] / old["wall_seconds"] if old["wall_seconds"] else float("nan")
+        print(
+            f"{item['employees']:>7} время x{ratio:.2f}, запросы {old['queries']} -> {item['queries']}, "
+            f"незаполнено {old['unfilled_slots']} -> {item['unfilled_slots']}, "
+            f"разброс {old['fairness_spread']} -> {item['fairness_spread']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк распределения нарядов")
+    parser.add_argument("--mode", choices=("engine", "database"), default="engine")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Количества сотрудников через запятую")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="База для режима database (будет очищена)")
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/planner-<mode>-<commit>.json)")
+    parser.add_argument("--compare", help="Файл результатов для сравнения")
+    args = parser.parse_args()
+
+    if args.mode == "database" and not args.database_url:
+        parser.error("для режима database укажите --database-url (база будет очищена)")
+
+    revision = git_revision()
+    report = {
+        "benchmark": "planner",
+        "mode": args.mode,
+        "commit": revision,
+        "python": platform.python_version(),
+        "year": args.year,
+        "month": args.month,
+        "seed": args.seed,
+        "results": [],
+    }
+    print(f"{'сотрудников':>11} {'время, с':>9} {'запросы':>8} {'память, МБ':>11} {'наряды':>7} {'незаполнено':>12} {'разброс':>8}")
+    for size in (int(value) for value in args.sizes.split(",")):
+        organization = generate_organization(size, args.year, args.month, args.seed)
+        if args.mode == "engine":
+            result = run_engine(organization)
+        else:
+            result = asyncio.run(run_database(organization, args.database_url))
+        result = {"employees": size, "departments": len(organization["departments"]), **result}
+        report["results"].append(result)
+        print(
+            f"{size:>11} {result['wall_seconds']:>9.3f} {result['queries']:>8} {result['peak_memory_mb']:>11.1f} "
+            f"{result['duties']:>7} {result['unfilled_slots']:>12} {result['fairness_spread']:>8}"
+        )
+
+    write_report(report, f"planner-{args.mode}", args.output)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
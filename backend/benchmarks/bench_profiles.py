@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Бенчмарк пропускной способности API в профилях development и production.
+
+Для каждого профиля запускается сервер (python run.py) с ENVIRONMENT=<профиль>, затем
+несколько параллельных клиентов в течение заданного времени запрашивают типичные
+GET-эндпоинты. Выводятся запросы в секунду, задержки p50/p95 и ошибки; результаты
+пишутся в JSON (benchmarks/results/profiles-<commit>.json).
+
+База берется из DATABASE_URL и должна содержать данные (например, после fill_database).
+
+Запуск из каталога backend:
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_profiles.py --duration 20
+"""
+import argparse
+import asyncio
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from common import BACKEND_DIR, git_revision, percentile, write_report
+
+ENDPOINTS = [
+    "/api/departments/",
+    "/api/employees/",
+    "/api/duty-types/",
+    "/api/duty-distribution/all?year=2025&month=3",
+]
+
+
+async def wait_ready(base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Сервер {base_url} не запустился за {timeout} с")
+
+
+async def load(base_url: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def worker(index: int, client: httpx.AsyncClient):
+        nonlocal errors
+        position = index
+        while time.monotonic() < deadline:
+            path = ENDPOINTS[position % len(ENDPOINTS)]
+            position += 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(worker(index, client) for index in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2) if latencies else 0.0,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def run_profile(profile: str, args) -> dict:
+    port = args.port
+    env = {**os.environ, "ENVIRONMENT": profile, "PORT": str(port), "HOST": "127.0.0.1", "RELOAD": "false"}
+    if args.workers:
+        env["WORKERS"] = str(args.workers)
+    server = subprocess.Popen(
+        [sys.executable, "run.py"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL if args.quiet else None, stderr=subprocess.DEVNULL if args.quiet else None
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base_url, args.startup_timeout))
+        # Прогрев: соединения пула и кэши выражений
+        asyncio.run(load(base_url, args.concurrency, 2))
+        return asyncio.run(load(base_url, args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность API по профилям")
+    parser.add_argument("--profiles", default="development,production")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="Число процессов uvicorn (по умолчанию - из профиля)")
+    parser.add_argument("--startup-timeout", type=float, default=90)
+    parser.add_argument("--quiet", action="store_true", help="Не выводить лог сервера")
+    parser.add_argument("--output", help="Файл результатов")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "profiles",
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "endpoints": ENDPOINTS,
+        "results": [],
+    }
+    for profile in args.profiles.split(","):
+        result = {"profile": profile, **run_profile(profile, args)}
+        report["results"].append(result)
+        print(
+            f"{profile:<12} {result['requests_per_second']:>8.1f} req/s  p50 {result['p50_ms']:>7.1f} мс  "
+            f"p95 {result['p95_ms']:>7.1f} мс  ошибок {result['errors']}"
+        )
+
+    write_report(report, "profiles", args.output)
+
+
+if __name__ == "__main__":
+    main()
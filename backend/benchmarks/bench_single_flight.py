@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Бенчмарк объединения одинаковых запросов (single-flight) на пике нагрузки.
+
+Имитирует «утро понедельника»: --users клиентов одновременно открывают одни и те же
+панели (эндпоинты с @single_flight). Приложение вызывается в процессе (ASGI, без сети);
+для режимов с объединением и без выводятся число SQL-запросов, максимум одновременно
+занятых соединений пула и время волны. Результаты пишутся в JSON
+(benchmarks/results/single-flight-<commit>.json).
+
+База берется из DATABASE_URL и должна содержать данные (например, после fill_database).
+
+Запуск из каталога backend:
+    DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_single_flight.py --users 50
+"""
+import argparse
+import asyncio
+import platform
+import time
+
+import httpx
+from sqlalchemy import event
+
+from common import git_revision, write_report
+
+import main  # noqa: E402
+from database import engine  # noqa: E402
+from services.single_flight import SingleFlightMiddleware  # noqa: E402
+
+
+class PoolLoad:
+    """SQL-запросы и максимум одновременно выданных соединений"""
+
+    def __init__(self, sync_engine):
+        self.pool = sync_engine.pool
+        self.queries = 0
+        self.peak_connections = 0
+        event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, *args):
+        self.queries += 1
+        self.peak_connections = max(self.peak_connections, self.pool.checkedout())
+
+    def reset(self):
+        self.queries = 0
+        self.peak_connections = 0
+
+
+def find_single_flight(app) -> SingleFlightMiddleware:
+    layer = app.middleware_stack
+    while layer is not None and not isinstance(layer, SingleFlightMiddleware):
+        layer = getattr(layer, "app", None)
+    if layer is None:
+        raise RuntimeError("SingleFlightMiddleware не подключен")
+    return layer
+
+
+async def resolve_paths(client: httpx.AsyncClient, year: int, month: int) -> list:
+    structures = (await client.get("/api/departments/with-stats")).json()
+    paths = ["/api/departments/with-stats", f"/api/duty-distribution/all?year={year}&month={month}"]
+    paths.extend(f"/api/employees/structure/{structure['id']}/with-status" for structure in structures[:3])
+    return paths
+
+
+async def wave(client: httpx.AsyncClient, paths: list, users: int) -> dict:
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.get(path) for _ in range(users) for path in paths))
+    return {
+        "requests": len(responses),
+        "errors": sum(response.status_code >= 400 for response in responses),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+async def run(args) -> dict:
+    load = PoolLoad(engine.sync_engine)
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            paths = await resolve_paths(client, args.year, args.month)
+            middleware = find_single_flight(main.app)
+            for enabled in (False, True):
+                middleware.enabled = enabled
+                # Прогрев соединений пула и кэша выражений
+                await wave(client, paths, 1)
+                load.reset()
+                result = await wave(client, paths, args.users)
+                results.append({
+                    "single_flight": enabled,
+                    **result,
+                    "sql_queries": load.queries,
+                    "peak_connections": load.peak_connections,
+                })
+                print(
+                    f"single-flight {'вкл ' if enabled else 'выкл'}  запросов API {result['requests']:>5}  "
+                    f"SQL {load.queries:>6}  соединений {load.peak_connections:>3}  {result['seconds']:>7.3f} с"
+                )
+    return {"paths": paths, "results": results}
+
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Объединение одинаковых запросов на пике нагрузки")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=3)
+    parser.add_argument("--output", help="Файл результатов")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "single_flight",
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "users": args.users,
+        **asyncio.run(run(args)),
+    }
+    write_report(report, "single-flight", args.output)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Бенчмарк холодного запуска процесса API.
+
+Каждый прогон - отдельный процесс Python (как новый процесс uvicorn): импорт main,
+выполнение lifespan (подключение к базе, проверка схемы, Redis) и первый ответ
+/health/ready. Выводятся медиана и максимум по прогонам; результаты пишутся в JSON
+(benchmarks/results/startup-<commit>.json).
+
+Запуск из каталога backend:
+    DATABASE_URL=postgresql+asyncpg://... ENVIRONMENT=production python benchmarks/bench_startup.py --runs 5
+
+Для сравнения с другой версией кода укажите --backend-dir (например, git worktree).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+from common import BACKEND_DIR, git_revision, write_report
+
+# Выполняется в дочернем процессе, печатает JSON с длительностями этапов
+PROBE = r"""
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import httpx
+
+async def probe():
+    async with main.app.router.lifespan_context(main.app):
+        lifespan_done = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            path = "/health/ready" if any(getattr(r, "path", "") == "/health/ready" for r in main.app.routes) else "/health"
+            status = (await client.get(path)).status_code
+        ready = time.perf_counter()
+    print(json.dumps({
+        "import_s": imported - started,
+        "lifespan_s": lifespan_done - imported,
+        "ready_s": ready - started,
+        "status": status,
+    }))
+
+asyncio.run(probe())
+"""
+
+
+def run_once(backend_dir: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=backend_dir, capture_output=True, text=True, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного запуска процесса API")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend-dir", default=BACKEND_DIR, help="Каталог backend проверяемой версии")
+    parser.add_argument("--output", help="Файл результатов")
+    args = parser.parse_args()
+
+    runs = [run_once(args.backend_dir) for _ in range(args.runs)]
+    summary = {}
+    for key in ("import_s", "lifespan_s", "ready_s"):
+        values = [run[key] for run in runs]
+        summary[key] = {"median": round(statistics.median(values), 3), "max": round(max(values), 3)}
+        print(f"{key:<12} медиана {summary[key]['median']:>7.3f} с  максимум {summary[key]['max']:>7.3f} с")
+
+    report = {
+        "benchmark": "startup",
+        "commit": git_revision(args.backend_dir),
+        "python": platform.python_version(),
+        "environment": os.environ.get("ENVIRONMENT", "development"),
+        "runs": runs,
+        "summary": summary,
+    }
+    write_report(report, "startup", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Общие функции бенчмарков: версия кода, замер повторяющихся вызовов и запись результатов.
+
+Импорт модуля добавляет каталог backend в sys.path: после него скрипты импортируют
+модули приложения (main, services.*) напрямую. Результаты пишутся в JSON
+(benchmarks/results/<имя>-<commit>.json), чтобы сравнивать их между коммитами.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def git_revision(cwd: str = BACKEND_DIR) -> str:
+    """Короткий хеш коммита каталога cwd (unknown вне git)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=cwd
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def timed_calls(
+    call: Callable[[], Awaitable],
+    repeat: int,
+    cleanup: Optional[Callable[[], Awaitable]] = None,
+    warmup: bool = True
+) -> Tuple[List[float], list]:
+    """Выполнить call() repeat раз (и один прогрев): длительности в секундах и результаты.
+
+    cleanup() вызывается после каждого вызова вне замера (например, удаление созданных записей).
+    """
+    latencies = []
+    results = []
+    for index in range(repeat + 1 if warmup else repeat):
+        started = time.perf_counter()
+        result = await call()
+        elapsed = time.perf_counter() - started
+        if cleanup is not None:
+            await cleanup()
+        if index or not warmup:
+            latencies.append(elapsed)
+            results.append(result)
+    return latencies, results
+
+
+def write_report(report: dict, name: str, output: Optional[str] = None) -> str:
+    """Записать отчет в output или benchmarks/results/<name>-<commit>.json"""
+    output = output or os.path.join(RESULTS_DIR, f"{name}-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as stream:
+        json.dump(report, stream, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+    return output
@@ -0,0 +1,48 @@
+"""Общие фикстуры тестов (запуск из каталога backend: python -m pytest).
+
+Асинхронные тесты отмечаются pytest.mark.anyio. Тестам с PostgreSQL нужна база
+из DATABASE_URL со схемой на головной ревизии (python migrate.py); если база
+недоступна, тесты пропускаются. Каждый тест выполняется в транзакции, которая
+откатывается: данные в базе не меняются. Фикстура query_budget - из services/query_stats.py.
+"""
+import pytest
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from settings import settings
+
+pytest_plugins = ["services.query_stats"]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db_connection(anyio_backend):
+    """Соединение с PostgreSQL внутри откатываемой транзакции"""
+    engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    try:
+        connection = await engine.connect()
+    except (OSError, DBAPIError) as e:
+        await engine.dispose()
+        pytest.skip(f"PostgreSQL недоступна: {e}")
+    transaction = await connection.begin()
+    try:
+        yield connection
+    finally:
+        await transaction.rollback()
+        await connection.close()
+        await engine.dispose()
+
+
+@pytest.fixture
+async def db_session(db_connection):
+    """Сессия поверх db_connection: commit() в тестируемом коде фиксирует только точку сохранения"""
+    session = AsyncSession(bind=db_connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -2,65 +2,93 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from database import engine, Base
-from routers import departments, employees, duty_types, duty_distribution, employee_duty_types, academic_duty, groups, employee_status_schedules, employee_duty_preferences, auto_sync
+from settings import configure_logging, settings
+from routers import departments, employees, duty_types, duty_distribution, employee_duty_types, academic_duty, groups, employee_status_schedules, employee_duty_preferences, auto_sync, admin
+from services.process_pool import shutdown_process_pool
+from services.schema_version import check_schema
+from services.slow_queries import install_slow_query_log
+from services.single_flight import SingleFlightMiddleware
+from services.compression import CompressionMiddleware
+from services.query_stats import QueryStatsMiddleware, install_query_stats
+from services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, bind_pool, registry as metrics_registry
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
 import redis.asyncio as redis
 import asyncio
 import logging
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Настройка логирования (уровни по профилю settings)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Создание таблиц при запуске
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Ожидание готовности базы данных с повторными попытками
-    max_retries = 30
-    retry_delay = 2
-    
-    for attempt in range(max_retries):
+async def connect_database(app: FastAPI):
+    """Ожидание базы данных и проверка версии схемы.
+
+    В production схему создает и обновляет отдельный шаг migrate.py (один раз на
+    развертывание), процесс API только сверяет версию. В development по умолчанию
+    таблицы создаются по моделям (DB_CREATE_ALL), проверка версии не выполняется.
+    """
+    for attempt in range(1, settings.startup_db_retries + 1):
         try:
-            logger.info(f"Попытка подключения к базе данных {attempt + 1}/{max_retries}")
             async with engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
-            logger.info("✅ Успешное подключение к базе данных")
+                if settings.db_create_all:
+                    await conn.run_sync(Base.metadata.create_all)
+                    app.state.schema = None
+                else:
+                    app.state.schema = await check_schema(conn)
             break
-        except Exception as e:
-            logger.warning(f"❌ Ошибка подключения к БД (попытка {attempt + 1}): {e}")
-            if attempt < max_retries - 1:
-                logger.info(f"⏳ Ожидание {retry_delay} секунд перед следующей попыткой...")
-                await asyncio.sleep(retry_delay)
-            else:
+        except (OSError, DBAPIError) as e:
+            if attempt == settings.startup_db_retries:
                 logger.error("❌ Не удалось подключиться к базе данных после всех попыток")
                 raise
-    
-    # Инициализация Redis с повторными попытками
-    redis_retries = 10
-    for attempt in range(redis_retries):
-        try:
-            logger.info(f"Попытка подключения к Redis {attempt + 1}/{redis_retries}")
-            app.state.redis = redis.from_url("redis://redis:6379", encoding="utf-8", decode_responses=True)
-            # Проверка подключения
-            await app.state.redis.ping()
-            logger.info("✅ Успешное подключение к Redis")
-            break
-        except Exception as e:
-            logger.warning(f"❌ Ошибка подключения к Redis (попытка {attempt + 1}): {e}")
-            if attempt < redis_retries - 1:
-                await asyncio.sleep(1)
-            else:
-                logger.error("❌ Не удалось подключиться к Redis, продолжаем без кэширования")
-                app.state.redis = None
-    
+            logger.warning(f"❌ Ошибка подключения к БД (попытка {attempt}): {e}")
+            await asyncio.sleep(settings.startup_db_retry_delay)
+
+    schema = app.state.schema
+    if schema is not None and not schema.ok:
+        logger.error(
+            "❌ Версия схемы базы (%s) не совпадает с миграциями (%s), выполните python migrate.py",
+            ", ".join(sorted(schema.current)) or "нет", ", ".join(sorted(schema.expected))
+        )
+    logger.info("✅ Успешное подключение к базе данных")
+
+
+async def connect_redis(app: FastAPI):
+    """Одна попытка подключения к Redis: без него кэширование отключается, запуск не задерживается"""
+    client = redis.from_url(
+        settings.redis_url, encoding="utf-8", decode_responses=True,
+        socket_connect_timeout=settings.redis_connect_timeout
+    )
+    try:
+        await asyncio.wait_for(client.ping(), settings.redis_connect_timeout)
+        app.state.redis = client
+        logger.info("✅ Успешное подключение к Redis")
+    except Exception as e:
+        logger.warning(f"❌ Redis недоступен, продолжаем без кэширования: {e}")
+        await client.close()
+        app.state.redis = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # База данных и Redis проверяются параллельно
+    await asyncio.gather(connect_database(app), connect_redis(app))
+
     # Запуск автоматической синхронизации статусов
     logger.info("🚀 Запуск автоматической синхронизации статусов сотрудников")
-    asyncio.create_task(auto_sync.start_auto_sync())
+    auto_sync_task = asyncio.create_task(auto_sync.start_auto_sync())
     
     yield
     
+    auto_sync_task.cancel()
+
     # Закрытие соединений
     if hasattr(app.state, 'redis') and app.state.redis:
         await app.state.redis.close()
+    
+    # Остановка пула процессов (экспорт, планирование)
+    shutdown_process_pool()
 
 app = FastAPI(
     title="Система распределения нарядов",
@@ -69,6 +97,25 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Объединение одинаковых одновременных GET-запросов к эндпоинтам с @single_flight
+# (внутренний слой: учет запросов, метрики и CORS применяются к каждому ответу)
+app.add_middleware(SingleFlightMiddleware)
+
+# Сжатие ответов по Accept-Encoding (снаружи single-flight: общий ответ хранится несжатым
+# и сжимается для каждого клиента своим алгоритмом; время сжатия входит в метрики)
+app.add_middleware(CompressionMiddleware)
+
+# Учет SQL-запросов на каждый запрос API (заголовки Server-Timing, X-DB-Query-Count)
+install_query_stats(engine)
+app.add_middleware(QueryStatsMiddleware)
+
+# Журнал медленных запросов с выборочным EXPLAIN (/api/admin/slow-queries)
+install_slow_query_log(engine)
+
+# Метрики в формате Prometheus (/metrics)
+bind_pool(engine)
+app.add_middleware(MetricsMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -76,6 +123,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Query-Count"],
 )
 
 # Подключение роутеров
@@ -89,6 +137,7 @@ app.include_router(groups.router, prefix="/api/groups", tags=["Группы"])
 app.include_router(employee_status_schedules.router, prefix="/api", tags=["Статусы сотрудников"])
 app.include_router(employee_duty_preferences.router, prefix="/api", tags=["Предпочтения сотрудников по дежурствам"])
 app.include_router(auto_sync.router, prefix="/api/auto-sync", tags=["Автоматическая синхронизация"])
+app.include_router(admin.router, prefix="/api/admin", tags=["Администрирование"])
 
 @app.get("/")
 async def root():
@@ -96,4 +145,38 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/health/live")
+async def liveness_check():
+    """Процесс запущен и обрабатывает запросы"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Готовность принимать трафик: база доступна, версия схемы совпадает с миграциями (Redis не обязателен)"""
+    checks = {}
+    try:
+        async with engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), 2)
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e.__class__.__name__}"
+
+    schema = getattr(app.state, "schema", None)
+    if schema is None:
+        checks["schema"] = "create_all"
+    elif schema.ok:
+        checks["schema"] = "ok"
+    else:
+        checks["schema"] = "mismatch: " + (", ".join(sorted(schema.current)) or "нет") + " != " + ", ".join(sorted(schema.expected))
+
+    checks["redis"] = "ok" if getattr(app.state, "redis", None) else "disabled"
+
+    ready = checks["database"] == "ok" and not checks["schema"].startswith("mismatch")
+    return JSONResponse({"status": "ready" if ready else "not_ready", "checks": checks}, status_code=200 if ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики приложения в текстовом формате Prometheus"""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
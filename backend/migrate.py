@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Одноразовый шаг перед запуском процессов API: миграции и проверка версии схемы.
+
+Выполняется один раз на развертывание (а не в каждом процессе uvicorn):
+    python migrate.py && python run.py
+
+- пустая база: таблицы создаются по моделям, версия помечается головной ревизией
+  (alembic stamp head);
+- таблицы есть, но нет alembic_version (схема создана create_all до появления рабочих
+  миграций): версия помечается исходными ревизиями BASELINE_HEADS, затем применяются
+  миграции после них (индексы периодов, уникальность назначений и т.д.);
+- иначе применяются миграции (alembic upgrade head);
+- в конце версия схемы сверяется с головными ревизиями, при расхождении код выхода 1.
+
+    python migrate.py --check   - только проверить версию схемы (код выхода 0/1)
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from database import Base, engine
+from services.schema_version import check_schema, database_revisions, migration_heads
+from settings import configure_logging, settings
+import models.models  # noqa: F401 - регистрация моделей в Base.metadata
+
+logger = logging.getLogger("migrate")
+
+# Ревизии, которым соответствует схема, созданная create_all до рабочих миграций
+BASELINE_HEADS = ("004_add_employee_duty_preferences", "41c538533fd1")
+
+
+def alembic_config() -> Config:
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", settings.database_url)
+    return config
+
+
+async def wait_for_database():
+    for attempt in range(1, settings.startup_db_retries + 1):
+        try:
+            async with engine.connect() as connection:
+                return await database_revisions(connection)
+        except OSError as e:
+            if attempt == settings.startup_db_retries:
+                raise
+            logger.warning("База данных недоступна (попытка %d): %s", attempt, e)
+            await asyncio.sleep(settings.startup_db_retry_delay)
+
+
+async def has_application_tables() -> bool:
+    async with engine.connect() as connection:
+        return await connection.run_sync(lambda sync_connection: inspect(sync_connection).has_table("departments"))
+
+
+async def create_schema():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def verify() -> bool:
+    async with engine.connect() as connection:
+        status = await check_schema(connection)
+    if status.ok:
+        logger.info("Версия схемы: %s", ", ".join(sorted(status.current)))
+    else:
+        logger.error(
+            "Версия схемы %s не совпадает с миграциями %s",
+            ", ".join(sorted(status.current)) or "(нет)", ", ".join(sorted(status.expected))
+        )
+    return status.ok
+
+
+async def migrate(config: Config, check_only: bool) -> bool:
+    try:
+        if not check_only:
+            # Команды Alembic запускают свой цикл событий (alembic/env.py), поэтому - в отдельном потоке
+            if await wait_for_database():
+                await asyncio.to_thread(command.upgrade, config, "head")
+            elif await has_application_tables():
+                logger.info("Схема без alembic_version: stamp %s и upgrade head", ", ".join(BASELINE_HEADS))
+                await asyncio.to_thread(command.stamp, config, list(BASELINE_HEADS))
+                await asyncio.to_thread(command.upgrade, config, "head")
+            else:
+                logger.info("Пустая база: создание схемы по моделям и stamp head")
+                await create_schema()
+                await asyncio.to_thread(command.stamp, config, "head")
+        return await verify()
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Миграции и проверка версии схемы")
+    parser.add_argument("--check", action="store_true", help="Только проверить версию схемы")
+    args = parser.parse_args()
+    configure_logging()
+
+    config = alembic_config()
+    heads = frozenset(ScriptDirectory.from_config(config).get_heads())
+    if heads != migration_heads():
+        logger.error("Головные ревизии Alembic %s не совпадают с разбором файлов %s", sorted(heads), sorted(migration_heads()))
+        return 1
+
+    return 0 if asyncio.run(migrate(config, args.check)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Date, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Date, Text, Index, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -88,6 +88,9 @@ class DutyType(Base):
 class EmployeeDutyType(Base):
     """Связующая таблица сотрудник-тип наряда"""
     __tablename__ = "employee_duty_types"
+    __table_args__ = (
+        UniqueConstraint("employee_id", "duty_type_id", name="uq_employee_duty_types_employee_id_duty_type_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
@@ -102,11 +105,14 @@ class EmployeeDutyType(Base):
 class DutyRecord(Base):
     """Модель записи о наряде"""
     __tablename__ = "duty_records"
+    __table_args__ = (
+        Index("ix_duty_records_employee_id_duty_date", "employee_id", "duty_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
     duty_type_id = Column(Integer, ForeignKey("duty_types.id"), nullable=False)
-    duty_date = Column(Date, nullable=False)
+    duty_date = Column(Date, nullable=False, index=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -136,16 +142,64 @@ class DepartmentDutyDay(Base):
     id = Column(Integer, primary_key=True, index=True)
     department_id = Column(Integer, ForeignKey("departments.id"), nullable=False)
     duty_type_id = Column(Integer, ForeignKey("duty_types.id"), nullable=False)
-    duty_date = Column(Date, nullable=False)
+    duty_date = Column(Date, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Связи
     department = relationship("Department")
     duty_type = relationship("DutyType")
 
+class DepartmentDutyRule(Base):
+    """Правило повторения дней дежурства подразделения (RRULE) в академическом наряде"""
+    __tablename__ = "department_duty_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=False, index=True)
+    duty_type_id = Column(Integer, ForeignKey("duty_types.id"), nullable=False)
+    rrule = Column(String(500), nullable=False)  # Например: FREQ=WEEKLY;INTERVAL=2;BYDAY=FR
+    start_date = Column(Date, nullable=False)  # DTSTART правила
+    end_date = Column(Date, nullable=True)  # Последний возможный день (включительно)
+    exdates = Column(JSON, nullable=True)  # Исключенные даты в формате YYYY-MM-DD
+    notes = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Связи
+    department = relationship("Department")
+    duty_type = relationship("DutyType")
+
+class PlanningState(Base):
+    """Сохраненное состояние планировщика нарядов на конец спланированного горизонта"""
+    __tablename__ = "planning_states"
+    __table_args__ = (
+        Index("ix_planning_states_scope_planned_through", "scope", "planned_through"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(50), nullable=False)  # all, structure:<id> или department:<id>
+    planned_through = Column(Date, nullable=False)  # Последний спланированный день
+    state = Column(JSON, nullable=False)  # Счетчики, последние наряды по типам, дни отдыха
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class DepartmentDeleteJob(Base):
+    """Фоновое удаление подразделения (состояние общее для всех процессов API)"""
+    __tablename__ = "department_delete_jobs"
+    
+    id = Column(String(32), primary_key=True)
+    department_id = Column(Integer, nullable=False)  # Без внешнего ключа: подразделение удаляется
+    status = Column(String(20), nullable=False)  # scheduled, running, done, failed
+    counts = Column(JSON, nullable=False)  # Предварительный подсчет строк
+    deleted = Column(JSON)  # Фактически удаленные строки (status=done)
+    error = Column(Text)  # status=failed
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class EmployeeStatusSchedule(Base):
     """Модель расписания статусов сотрудника"""
     __tablename__ = "employee_status_schedules"
+    __table_args__ = (
+        Index("ix_employee_status_schedules_employee_id_start_date", "employee_id", "start_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
@@ -163,6 +217,9 @@ class EmployeeStatusSchedule(Base):
 class EmployeeDutyPreference(Base):
     """Модель предпочтений сотрудника по дежурствам"""
     __tablename__ = "employee_duty_preferences"
+    __table_args__ = (
+        Index("ix_employee_duty_preferences_employee_id_date", "employee_id", "date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
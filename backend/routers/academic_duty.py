@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, insert, and_
 from typing import List, Optional
 from database import get_db
-from models.models import DutyType, Department, Employee, DutyRecord, DepartmentDutyDay
+from services.academic_calendar import expand_duty_rule, parse_rrule
+from services.periods import date_in_period, date_range_period, month_period
+from models.models import DutyType, Department, Employee, DutyRecord, DepartmentDutyDay, DepartmentDutyRule
 from pydantic import BaseModel
 from datetime import date
+import re
 
 router = APIRouter()
 
@@ -31,6 +34,25 @@ class DepartmentDutyDayResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DepartmentDutyRuleCreate(BaseModel):
+    department_id: int
+    duty_type_id: int
+    rrule: str  # Например: FREQ=WEEKLY;BYDAY=TU или FREQ=WEEKLY;INTERVAL=2;BYDAY=FR
+    start_date: date
+    end_date: Optional[date] = None
+    exdates: List[date] = []
+    notes: Optional[str] = None
+
+class DepartmentDutyRuleResponse(BaseModel):
+    id: int
+    department_id: int
+    duty_type_id: int
+    rrule: str
+    start_date: date
+    end_date: Optional[date] = None
+    exdates: List[str] = []
+    notes: Optional[str] = None
+
 class AcademicDutyResponse(BaseModel):
     id: int
     employee_id: int
@@ -193,17 +215,7 @@ async def get_academic_duty_records(
     
     # Фильтр по году и месяцу
     if year is not None and month is not None:
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - date.resolution
-        else:
-            end_date = date(year, month + 1, 1) - date.resolution
-        query = query.where(
-            and_(
-                DutyRecord.duty_date >= start_date,
-                DutyRecord.duty_date <= end_date
-            )
-        )
+        query = query.where(date_in_period(DutyRecord.duty_date, month_period(year, month)))
     
     result = await db.execute(query.order_by(DutyRecord.duty_date))
     records = result.all()
@@ -337,17 +349,7 @@ async def get_department_duty_days(
     
     # Фильтр по году и месяцу
     if year is not None and month is not None:
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - date.resolution
-        else:
-            end_date = date(year, month + 1, 1) - date.resolution
-        query = query.where(
-            and_(
-                DepartmentDutyDay.duty_date >= start_date,
-                DepartmentDutyDay.duty_date <= end_date
-            )
-        )
+        query = query.where(date_in_period(DepartmentDutyDay.duty_date, month_period(year, month)))
     
     result = await db.execute(query.order_by(DepartmentDutyDay.duty_date))
     records = result.all()
@@ -384,4 +386,152 @@ async def delete_department_duty_day(day_id: int, db: AsyncSession = Depends(get
     await db.delete(record_data.DepartmentDutyDay)
     await db.commit()
     
-    return {"message": "День дежурства подразделения удален"} 
\ No newline at end of file
+    return {"message": "День дежурства подразделения удален"} 
+
+# Допустимая частота правил: дежурства назначаются на целые дни
+RRULE_PATTERN = re.compile(r"^(RRULE:)?FREQ=(DAILY|WEEKLY|MONTHLY|YEARLY)(;[A-Z]+=[-+,0-9A-Z]+)*$")
+
+def _rule_response(rule: DepartmentDutyRule) -> dict:
+    return {
+        "id": rule.id,
+        "department_id": rule.department_id,
+        "duty_type_id": rule.duty_type_id,
+        "rrule": rule.rrule,
+        "start_date": rule.start_date,
+        "end_date": rule.end_date,
+        "exdates": rule.exdates or [],
+        "notes": rule.notes
+    }
+
+async def _get_rule(rule_id: int, db: AsyncSession) -> DepartmentDutyRule:
+    result = await db.execute(select(DepartmentDutyRule).where(DepartmentDutyRule.id == rule_id))
+    rule = result.scalar_one_or_none()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Правило повторения не найдено")
+    return rule
+
+def _rule_period(rule: DepartmentDutyRule, start_date: Optional[date], end_date: Optional[date]):
+    start_date = start_date or rule.start_date
+    end_date = end_date or rule.end_date
+    if end_date is None:
+        raise HTTPException(status_code=400, detail="Не указана дата окончания периода")
+    try:
+        return date_range_period(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/department-rules", response_model=DepartmentDutyRuleResponse)
+async def create_department_duty_rule(rule_data: DepartmentDutyRuleCreate, db: AsyncSession = Depends(get_db)):
+    """Создать правило повторения дней дежурства подразделения (RRULE)"""
+    rrule = rule_data.rrule.strip().upper()
+    if not RRULE_PATTERN.match(rrule):
+        raise HTTPException(status_code=400, detail="Неверное правило повторения. Пример: FREQ=WEEKLY;BYDAY=TU")
+    try:
+        parse_rrule(rrule, rule_data.start_date)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Неверное правило повторения. Пример: FREQ=WEEKLY;BYDAY=TU")
+    
+    if rule_data.end_date and rule_data.end_date < rule_data.start_date:
+        raise HTTPException(status_code=400, detail="Дата начала не может быть позже даты окончания")
+    
+    department_result = await db.execute(select(Department.id).where(Department.id == rule_data.department_id))
+    if department_result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Подразделение не найдено")
+    
+    duty_type_result = await db.execute(select(DutyType).where(DutyType.id == rule_data.duty_type_id))
+    duty_type = duty_type_result.scalar_one_or_none()
+    if not duty_type:
+        raise HTTPException(status_code=404, detail="Тип наряда не найден")
+    if duty_type.duty_category != "academic":
+        raise HTTPException(status_code=400, detail="Тип наряда не является академическим")
+    
+    rule = DepartmentDutyRule(
+        department_id=rule_data.department_id,
+        duty_type_id=rule_data.duty_type_id,
+        rrule=rrule,
+        start_date=rule_data.start_date,
+        end_date=rule_data.end_date,
+        exdates=sorted({day.isoformat() for day in rule_data.exdates}),
+        notes=rule_data.notes
+    )
+    db.add(rule)
+    await db.commit()
+    await db.refresh(rule)
+    return _rule_response(rule)
+
+@router.get("/department-rules", response_model=List[DepartmentDutyRuleResponse])
+async def get_department_duty_rules(
+    department_id: Optional[int] = None,
+    duty_type_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Получить правила повторения дней дежурства подразделений"""
+    query = select(DepartmentDutyRule)
+    if department_id:
+        query = query.where(DepartmentDutyRule.department_id == department_id)
+    if duty_type_id:
+        query = query.where(DepartmentDutyRule.duty_type_id == duty_type_id)
+    result = await db.execute(query.order_by(DepartmentDutyRule.department_id, DepartmentDutyRule.start_date))
+    return [_rule_response(rule) for rule in result.scalars().all()]
+
+@router.delete("/department-rules/{rule_id}")
+async def delete_department_duty_rule(rule_id: int, db: AsyncSession = Depends(get_db)):
+    """Удалить правило повторения (уже созданные дни дежурства не удаляются)"""
+    rule = await _get_rule(rule_id, db)
+    await db.delete(rule)
+    await db.commit()
+    return {"message": "Правило повторения удалено"}
+
+@router.get("/department-rules/{rule_id}/occurrences", response_model=List[str])
+async def get_department_duty_rule_occurrences(
+    rule_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Даты дежурства по правилу за период (по умолчанию - весь срок действия правила)"""
+    rule = await _get_rule(rule_id, db)
+    period = _rule_period(rule, start_date, end_date)
+    return [day.isoformat() for day in expand_duty_rule(rule, period)]
+
+@router.post("/department-rules/{rule_id}/materialize")
+async def materialize_department_duty_rule(
+    rule_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Создать дни дежурства подразделения по правилу за период одним INSERT.
+
+    Уже существующие дни пропускаются.
+    """
+    rule = await _get_rule(rule_id, db)
+    period = _rule_period(rule, start_date, end_date)
+    
+    existing_result = await db.execute(
+        select(DepartmentDutyDay.duty_date)
+        .where(DepartmentDutyDay.department_id == rule.department_id)
+        .where(DepartmentDutyDay.duty_type_id == rule.duty_type_id)
+        .where(date_in_period(DepartmentDutyDay.duty_date, period))
+    )
+    existing = set(existing_result.scalars().all())
+    rule_dates = list(expand_duty_rule(rule, period))
+    new_days = [day for day in rule_dates if day not in existing]
+    
+    if new_days:
+        await db.execute(
+            insert(DepartmentDutyDay),
+            [
+                {"department_id": rule.department_id, "duty_type_id": rule.duty_type_id, "duty_date": day}
+                for day in new_days
+            ]
+        )
+        await db.commit()
+    
+    return {
+        "message": f"Создано дней дежурства: {len(new_days)}",
+        "created_count": len(new_days),
+        # Пропущены только дни правила: прочие дни подразделения в периоде не считаются
+        "skipped_count": len(set(rule_dates) & existing),
+        "dates": [day.isoformat() for day in new_days]
+    }
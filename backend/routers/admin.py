@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Query
+from typing import Optional
+
+from services.slow_queries import slow_query_log
+
+router = APIRouter()
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    route: Optional[str] = Query(None, description="Маршрут, например 'GET /api/employees/'")
+):
+    """Медленные SQL-запросы из кольцевого буфера (последние первыми)"""
+    return {
+        "enabled": slow_query_log.enabled,
+        "threshold_ms": slow_query_log.threshold * 1000,
+        "explain_sample_rate": slow_query_log.explain_sample_rate,
+        "entries": slow_query_log.entries(limit, route),
+    }
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    """Очистить буфер медленных запросов (файл журнала не изменяется)"""
+    slow_query_log.clear()
+    return {"message": "Буфер медленных запросов очищен"}
@@ -7,9 +7,10 @@ from models.models import Employee, EmployeeStatusSchedule
 from datetime import datetime, date
 import asyncio
 import logging
+import time
+
+from services.metrics import auto_sync_changed_rows_total, auto_sync_duration_seconds, auto_sync_runs_total
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -59,6 +60,7 @@ async def sync_employee_status_auto(employee_id: int, db: AsyncSession):
 
 async def sync_all_employees_status_auto(db: AsyncSession):
     """Автоматическая синхронизация статусов всех сотрудников"""
+    started = time.perf_counter()
     try:
         logger.info("Начало автоматической синхронизации статусов всех сотрудников")
         
@@ -101,10 +103,15 @@ async def sync_all_employees_status_auto(db: AsyncSession):
         
         await db.commit()
         logger.info(f"Автоматическая синхронизация завершена. Обновлено {updated_count} сотрудников")
+        auto_sync_runs_total.inc(result="success")
+        auto_sync_changed_rows_total.inc(updated_count)
         
     except Exception as e:
         logger.error(f"Ошибка при автоматической синхронизации: {str(e)}")
         await db.rollback()
+        auto_sync_runs_total.inc(result="error")
+    finally:
+        auto_sync_duration_seconds.observe(time.perf_counter() - started)
 
 @router.post("/sync-all")
 async def trigger_sync_all_employees(db: AsyncSession = Depends(get_db)):
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text
+from sqlalchemy import select, update
 from typing import List, Optional
-from database import get_db
-from models.models import Department
+from database import get_db, AsyncSessionLocal
+from models.models import Department, DepartmentDeleteJob
+from services.department_cascade import count_department_subtree, delete_department_subtree
+from services.single_flight import single_flight
 from pydantic import BaseModel
+import logging
+import uuid
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -29,6 +38,7 @@ async def get_departments(db: AsyncSession = Depends(get_db)):
     return departments
 
 @router.get("/with-stats", response_model=List[dict])
+@single_flight()
 async def get_departments_with_stats(db: AsyncSession = Depends(get_db)):
     """Получить список всех структур с статистикой"""
     from models.models import Employee, EmployeeDutyType, DutyType
@@ -207,70 +217,73 @@ async def update_department(
     await db.refresh(db_department)
     return db_department
 
+# Поддеревья больше этого числа строк удаляются в фоновой задаче
+DELETE_BACKGROUND_THRESHOLD = settings.department_delete_background_threshold
+
+# Состояние фоновых удалений хранится в базе (department_delete_jobs), поэтому
+# запрос состояния может прийти в любой процесс API
+async def _set_delete_job(session: AsyncSession, job_id: str, **values):
+    await session.execute(update(DepartmentDeleteJob).where(DepartmentDeleteJob.id == job_id).values(**values))
+
+async def _run_delete_job(job_id: str, department_id: int):
+    """Фоновое удаление подразделения в отдельной сессии"""
+    async with AsyncSessionLocal() as session:
+        await _set_delete_job(session, job_id, status="running")
+        await session.commit()
+        try:
+            deleted = await delete_department_subtree(session, department_id)
+            # Состояние фиксируется в одной транзакции с удалением
+            await _set_delete_job(session, job_id, status="done", deleted=deleted)
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Ошибка при удалении подразделения {department_id}: {str(e)}")
+            await _set_delete_job(session, job_id, status="failed", error=str(e))
+            await session.commit()
+
+@router.get("/delete-jobs/{job_id}")
+async def get_department_delete_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Получить состояние фонового удаления подразделения"""
+    job = await db.get(DepartmentDeleteJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача удаления не найдена")
+    result = {"status": job.status, "department_id": job.department_id, "counts": job.counts}
+    if job.deleted is not None:
+        result["deleted"] = job.deleted
+    if job.error is not None:
+        result["error"] = job.error
+    return result
+
 @router.delete("/{department_id}")
-async def delete_department(department_id: int, db: AsyncSession = Depends(get_db)):
-    """Удалить подразделение"""
-    from models.models import Employee, EmployeeDutyType
-    
+async def delete_department(
+    department_id: int,
+    background_tasks: BackgroundTasks,
+    dry_run: bool = Query(False, description="Только посчитать, что будет удалено"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Удалить подразделение вместе с дочерними подразделениями, группами, сотрудниками и их данными"""
     result = await db.execute(select(Department).where(Department.id == department_id))
     department = result.scalar_one_or_none()
     
     if not department:
         raise HTTPException(status_code=404, detail="Подразделение не найдено")
     
-    # Если это структура (родительское подразделение), удаляем все дочерние подразделения
-    if department.parent_id is None:
-        # Получаем все дочерние подразделения
-        subdepartments_result = await db.execute(
-            select(Department).where(Department.parent_id == department_id)
-        )
-        subdepartments = subdepartments_result.scalars().all()
-        
-        # Удаляем сотрудников и их связи с типами нарядов для всех дочерних подразделений
-        for subdept in subdepartments:
-            # Получаем сотрудников подразделения
-            employees_result = await db.execute(
-                select(Employee).where(Employee.department_id == subdept.id)
-            )
-            employees = employees_result.scalars().all()
-            
-            # Удаляем связи сотрудников с типами нарядов
-            for employee in employees:
-                await db.execute(
-                    text("DELETE FROM employee_duty_types WHERE employee_id = :employee_id"),
-                    {"employee_id": employee.id}
-                )
-            
-            # Удаляем сотрудников подразделения
-            await db.execute(
-                text("DELETE FROM employees WHERE department_id = :department_id"),
-                {"department_id": subdept.id}
-            )
-            
-            # Удаляем дочернее подразделение
-            await db.delete(subdept)
+    counts = await count_department_subtree(db, department_id)
+    if dry_run:
+        return {"message": "Предварительный подсчет удаления", "dry_run": True, "counts": counts}
     
-    # Удаляем сотрудников и их связи с типами нарядов для самого подразделения
-    employees_result = await db.execute(
-        select(Employee).where(Employee.department_id == department_id)
-    )
-    employees = employees_result.scalars().all()
-    
-    # Удаляем связи сотрудников с типами нарядов
-    for employee in employees:
-        await db.execute(
-            text("DELETE FROM employee_duty_types WHERE employee_id = :employee_id"),
-            {"employee_id": employee.id}
+    # Большие поддеревья удаляются в фоне, чтобы не держать запрос
+    if sum(counts.values()) > DELETE_BACKGROUND_THRESHOLD:
+        job_id = uuid.uuid4().hex
+        db.add(DepartmentDeleteJob(id=job_id, department_id=department_id, status="scheduled", counts=counts))
+        await db.commit()
+        background_tasks.add_task(_run_delete_job, job_id, department_id)
+        return JSONResponse(
+            status_code=202,
+            content={"message": "Удаление подразделения запущено в фоне", "job_id": job_id, "counts": counts}
         )
     
-    # Удаляем сотрудников подразделения
-    await db.execute(
-        text("DELETE FROM employees WHERE department_id = :department_id"),
-        {"department_id": department_id}
-    )
-    
-    # Удаляем само подразделение
-    await db.delete(department)
+    deleted = await delete_department_subtree(db, department_id)
     await db.commit()
     
-    return {"message": "Подразделение удалено"} 
\ No newline at end of file
+    return {"message": "Подразделение удалено", "deleted": deleted}
@@ -1,25 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from typing import List, Dict, Any, Optional
-from database import get_db
-from models.models import Department, Employee, DutyType, DutyRecord, EmployeeDutyType, DepartmentDutyDay, EmployeeDutyPreference, EmployeeStatusSchedule
+from sqlalchemy import and_, select, delete
+from typing import List, Dict, Any, Optional, Union
+from database import get_db, AsyncSessionLocal
+from models.models import Department, Employee, DutyType, DutyRecord, PlanningState
 from pydantic import BaseModel
 from datetime import datetime, date, timedelta
-import calendar
-import random
+import asyncio
+import time
 from fastapi.responses import StreamingResponse
 import io
 import logging
-import traceback
 
-try:
-    import openpyxl
-except ImportError:
-    openpyxl = None
+from services.excel_export import DutyExportRow, XLSX_MEDIA_TYPE, render_month_workbook, render_department_workbook
+from services.export_writers import ExportWriter, get_export_writer
+from services.export_bundle import partition_by_department, stream_department_bundle
+from services.duty_planner import (
+    PlanningSnapshot, carry_state_from_json, carry_state_to_json, load_planning_snapshot, plan_horizon,
+    plan_horizon_records, plan_records, plan_snapshot, plan_snapshot_traced, write_plan_records
+)
+from services.tracing import current_tracer, span, tracing
+from services.single_flight import single_flight
+from services.fast_json import FastJSONResponse, json_response
+from services.compact_duties import (
+    DEPARTMENT_COLUMNS, DUTY_TYPE_COLUMNS, EMPLOYEE_COLUMNS, columns, compact_duties, day_offsets
+)
+from services.process_pool import get_process_pool
+from services.metrics import record_generation
+from services.replacement import ReplacementError, find_replacement_candidates, load_duty_block, replace_duty_employee
+from services.periods import date_in_period, date_range_period, month_period, parse_date_range, resolve_period
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -30,503 +40,438 @@ class DutyDistributionRequest(BaseModel):
     department_id: Optional[int] = None
     structure_id: Optional[int] = None
 
+class OrganizationDistributionRequest(BaseModel):
+    start_date: str
+    end_date: str
+    structure_ids: Optional[List[int]] = None
+
+class HorizonDistributionRequest(BaseModel):
+    start_year: int
+    start_month: int
+    months: int = 3
+    department_id: Optional[int] = None
+    structure_id: Optional[int] = None
+    use_saved_state: bool = True
+
+class DutyReplacementRequest(BaseModel):
+    employee_id: int
+
 class DutyDistributionResponse(BaseModel):
     department_id: int
     department_name: str
     duties: List[Dict[str, Any]]
 
-@router.post("/generate", response_model=List[DutyDistributionResponse])
+class CompactDutiesResponse(BaseModel):
+    # Справочники и наряды столбцами (services/compact_duties.py)
+    format: str
+    start_date: str
+    employees: Dict[str, List[Any]]
+    departments: Dict[str, List[Any]]
+    duty_types: Dict[str, List[Any]]
+    duties: Dict[str, List[Any]]
+
+class TracedDutyDistributionResponse(BaseModel):
+    plan: Union[List[DutyDistributionResponse], CompactDutiesResponse]
+    # Трасса в формате Chrome trace events (chrome://tracing, ui.perfetto.dev)
+    trace: Dict[str, Any]
+
+class HorizonMonthResponse(BaseModel):
+    year: int
+    month: int
+    departments: List[DutyDistributionResponse]
+
+class HorizonDistributionResponse(BaseModel):
+    state_id: int
+    planned_through: str
+    from_saved_state: bool
+    records_created: int
+    months: List[HorizonMonthResponse]
+
+async def _planning_scope(db: AsyncSession, department_id: Optional[int], structure_id: Optional[int]) -> Optional[List[int]]:
+    """Подразделения, в которых распределяются наряды (None - все)"""
+    if department_id:
+        return [department_id]
+    if structure_id:
+        # Получаем все подразделения структуры
+        subdepts_result = await db.execute(
+            select(Department.id).where(Department.parent_id == structure_id)
+        )
+        return [row[0] for row in subdepts_result.all()] or [structure_id]
+    return None
+
+async def _group_duties_by_department(db: AsyncSession, duties: List[Dict[str, Any]], employees: Dict[int, Any]) -> List[Dict[str, Any]]:
+    """Сгруппировать наряды по подразделениям для ответа"""
+    by_department: Dict[int, List[Dict[str, Any]]] = {}
+    for duty in duties:
+        by_department.setdefault(employees[duty['employee_id']].department_id, []).append(duty)
+    if not by_department:
+        return []
+    
+    dept_result = await db.execute(
+        select(Department.id, Department.name).where(Department.id.in_(by_department)).order_by(Department.id)
+    )
+    return [
+        {'department_id': dept_id, 'department_name': dept_name, 'duties': by_department[dept_id]}
+        for dept_id, dept_name in dept_result.all()
+    ]
+
+async def _compact_plan(db: AsyncSession, duties: List[Dict[str, Any]], snapshot: PlanningSnapshot, start_date: date) -> Dict[str, Any]:
+    """Наряды планировщика в компактном формате (services/compact_duties.py)"""
+    employee_ids = sorted({duty['employee_id'] for duty in duties})
+    employees = [snapshot.employees[employee_id] for employee_id in employee_ids]
+    department_ids = sorted({employee.department_id for employee in employees})
+    dept_rows = (await db.execute(
+        select(Department.id, Department.name).where(Department.id.in_(department_ids)).order_by(Department.id)
+    )).tuples().all() if department_ids else []
+    duty_type_ids = {duty['duty_type_id'] for duty in duties}
+    return compact_duties(
+        start_date,
+        duties={
+            'day': day_offsets((date.fromisoformat(duty['date']) for duty in duties), start_date),
+            'employee_id': [duty['employee_id'] for duty in duties],
+            'duty_type_id': [duty['duty_type_id'] for duty in duties],
+        },
+        employees=columns(
+            ((employee.id, f"{employee.last_name} {employee.first_name}", employee.department_id, employee.duty_count)
+             for employee in employees),
+            EMPLOYEE_COLUMNS
+        ),
+        departments=columns(dept_rows, DEPARTMENT_COLUMNS),
+        duty_types=columns(
+            ((duty_type.id, duty_type.name, duty_type.people_per_day, duty_type.days_duration)
+             for duty_type in snapshot.duty_types if duty_type.id in duty_type_ids),
+            DUTY_TYPE_COLUMNS
+        ),
+    )
+
+async def _load_compact_duties(db: AsyncSession, condition, start_date: Optional[date]) -> Dict[str, Any]:
+    """Наряды из базы в компактном формате: без повторения ФИО и названий в каждой строке"""
+    duty_rows = (await db.execute(
+        select(
+            DutyRecord.id, DutyRecord.duty_date, DutyRecord.duty_type_id,
+            Employee.id, Employee.last_name, Employee.first_name, Employee.department_id, Employee.duty_count
+        )
+        .join(Employee, DutyRecord.employee_id == Employee.id)
+        .where(condition)
+        .order_by(DutyRecord.duty_date, Employee.last_name, Employee.first_name)
+    )).tuples().all()
+    if start_date is None:
+        start_date = duty_rows[0][1] if duty_rows else date.today()
+    
+    # Справочники - только для встречающихся в нарядах сотрудников, подразделений и типов
+    employees = {}
+    for _, _, _, employee_id, last_name, first_name, department_id, duty_count in duty_rows:
+        if employee_id not in employees:
+            employees[employee_id] = (employee_id, f"{last_name} {first_name}", department_id, duty_count or 0)
+    department_ids = {employee[2] for employee in employees.values()}
+    duty_type_ids = {row[2] for row in duty_rows}
+    dept_rows = (await db.execute(
+        select(Department.id, Department.name).where(Department.id.in_(department_ids)).order_by(Department.id)
+    )).tuples().all() if department_ids else []
+    duty_type_rows = (await db.execute(
+        select(DutyType.id, DutyType.name, DutyType.people_per_day, DutyType.days_duration)
+        .where(DutyType.id.in_(duty_type_ids))
+        .order_by(DutyType.id)
+    )).tuples().all() if duty_type_ids else []
+    
+    return compact_duties(
+        start_date,
+        duties={
+            'id': [row[0] for row in duty_rows],
+            'day': day_offsets((row[1] for row in duty_rows), start_date),
+            'employee_id': [row[3] for row in duty_rows],
+            'duty_type_id': [row[2] for row in duty_rows],
+        },
+        employees=columns(sorted(employees.values()), EMPLOYEE_COLUMNS),
+        departments=columns(dept_rows, DEPARTMENT_COLUMNS),
+        duty_types=columns(duty_type_rows, DUTY_TYPE_COLUMNS),
+    )
+
+@router.post(
+    "/generate",
+    response_model=Union[List[DutyDistributionResponse], CompactDutiesResponse, TracedDutyDistributionResponse],
+    response_class=FastJSONResponse
+)
 async def generate_duty_distribution(
     request: DutyDistributionRequest, 
+    trace: bool = Query(False, description="Вернуть вместе с планом трассу выполнения (Chrome trace events)"),
+    compact: bool = Query(False, description="Компактный формат: справочники и наряды столбцами идентификаторов"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Генерировать распределение нарядов на выбранный период для конкретного подразделения"""
-    
-    logger.debug(f"Начало генерации нарядов")
-    logger.debug(f"Параметры: start_date={request.start_date}, end_date={request.end_date}, department_id={request.department_id}")
+    """Генерировать распределение нарядов на выбранный период для конкретного подразделения.
+
+    Данные загружаются одним снимком, распределение считается в пуле процессов
+    (services.duty_planner), результат сохраняется одним INSERT. С trace=true ответ -
+    {"plan": [...], "trace": {...}} с интервалами загрузки, планирования по дням,
+    сохранения и построения ответа. С compact=true план - в компактном формате
+    (services/compact_duties.py).
+    """
+    logger.debug(
+        "Параметры: start_date=%s, end_date=%s, department_id=%s",
+        request.start_date, request.end_date, request.department_id
+    )
     
     # Парсим даты
-    start_date = datetime.strptime(request.start_date, "%Y-%m-%d").date()
-    end_date = datetime.strptime(request.end_date, "%Y-%m-%d").date()
-    
-    # Получаем все типы нарядов
-    duty_types_result = await db.execute(select(DutyType))
-    duty_types = duty_types_result.scalars().all()
-    
-    logger.debug(f"Найдено типов нарядов: {len(duty_types)}")
-    for dt in duty_types:
-        logger.debug(f"Тип наряда {dt.id}: {dt.name} (категория: {dt.duty_category})")
-    
-    # Формируем запрос для получения сотрудников
-    employee_query = (
-            select(Employee, EmployeeDutyType, DutyType)
-            .join(EmployeeDutyType, Employee.id == EmployeeDutyType.employee_id)
-            .join(DutyType, EmployeeDutyType.duty_type_id == DutyType.id)
-            .where(Employee.is_active == True)
-            .where(EmployeeDutyType.is_active == True)
-        )
-        
-    # Если указано конкретное подразделение
-    if request.department_id:
-        employee_query = employee_query.where(Employee.department_id == request.department_id)
-    # Если указана структура (но не подразделение)
-    elif request.structure_id:
-        # Получаем все подразделения структуры
-        subdepts_result = await db.execute(
-            select(Department.id).where(Department.parent_id == request.structure_id)
-        )
-        subdept_ids = [row[0] for row in subdepts_result.all()]
-        if subdept_ids:
-            employee_query = employee_query.where(Employee.department_id.in_(subdept_ids))
-    
-    employees_result = await db.execute(employee_query)
-    employees_data = employees_result.all()
-    
-    # Группируем сотрудников по типам нарядов
-    duty_types_employees = {}
-    for emp, emp_duty, duty_type in employees_data:
-        if duty_type.id not in duty_types_employees:
-            duty_types_employees[duty_type.id] = {
-                'duty_type': duty_type,
-                'employees': []
-            }
-        duty_types_employees[duty_type.id]['employees'].append(emp)
-        
-    # Словарь для отслеживания занятости сотрудников по дням и типам нарядов
-    # Формат: {employee_id: {date_key: {duty_type_id, ...}}}
-    employee_busy_dates = {}
-    
-    # Собираем все наряды
-    all_duties = []
-    
-    # Генерируем наряды по дням, а не по типам
-    current_date = start_date
-    while current_date <= end_date:
-        duty_date = current_date
-        date_key = duty_date.isoformat()
-        
-        # Для каждого типа наряда в этот день
-        for duty_type_id, data in duty_types_employees.items():
-            duty_type = data['duty_type']
-            employees = data['employees']
-            
-            # Проверяем, нужно ли назначать академический наряд в этот день
-            if duty_type.duty_category == "academic":
-                logger.debug(f"Проверяем академический наряд {duty_type.name} для даты {duty_date}")
-                
-                # Проверяем, есть ли запись в календаре для этого типа наряда и подразделения
-                calendar_query = (
-                    select(DepartmentDutyDay)
-                    .where(DepartmentDutyDay.duty_type_id == duty_type_id)
-                    .where(DepartmentDutyDay.duty_date == duty_date)
-                )
-                
-                # Если указано конкретное подразделение
-                if request.department_id:
-                    calendar_query = calendar_query.where(DepartmentDutyDay.department_id == request.department_id)
-                    logger.debug(f"Фильтруем по подразделению {request.department_id}")
-                # Если указана структура, проверяем все подразделения структуры
-                elif request.structure_id:
-                    subdepts_result = await db.execute(
-                        select(Department.id).where(Department.parent_id == request.structure_id)
-                    )
-                    subdept_ids = [row[0] for row in subdepts_result.all()]
-                    if subdept_ids:
-                        calendar_query = calendar_query.where(DepartmentDutyDay.department_id.in_(subdept_ids))
-                        logger.debug(f"Фильтруем по подразделениям структуры {subdept_ids}")
-                    else:
-                        # Если нет подразделений в структуре, пропускаем
-                        logger.debug(f"Нет подразделений в структуре {request.structure_id}")
-                        continue
-                
-                calendar_check_result = await db.execute(calendar_query)
-                calendar_records = calendar_check_result.scalars().all()
-                
-                logger.debug(f"Найдено записей в календаре: {len(calendar_records)}")
-                
-                # Если нет записей в календаре, пропускаем этот день для академического наряда
-                if not calendar_records:
-                    logger.debug(f"Нет записей в календаре, пропускаем")
-                    continue
-                else:
-                    logger.debug(f"Обрабатываем записи календаря")
-                    # Для каждого дня из календаря выбираем сотрудников подразделения
-                    for calendar_record in calendar_records:
-                        department_id = calendar_record.department_id
-                        logger.debug(f"Обрабатываем подразделение {department_id}")
-                        
-                        # Получаем сотрудников подразделения, которые могут заступать в этот тип наряда
-                        department_employees_result = await db.execute(
-                            select(Employee)
-                            .join(EmployeeDutyType, Employee.id == EmployeeDutyType.employee_id)
-                            .where(Employee.department_id == department_id)
-                            .where(EmployeeDutyType.duty_type_id == duty_type_id)
-                            .where(EmployeeDutyType.is_active == True)
-                            .where(Employee.is_active == True)
-                        )
-                        department_employees = department_employees_result.scalars().all()
-                        
-                        logger.debug(f"Найдено сотрудников в подразделении {department_id}: {len(department_employees)}")
-                        
-                        if not department_employees:
-                            logger.debug(f"Нет сотрудников в подразделении {department_id}")
-                            continue
-                        
-                        # Выбираем сотрудников для наряда
-                        selected_employees = await select_employees_for_duty(
-                            department_employees, duty_date, duty_type.people_per_day, 
-                            employee_busy_dates, duty_type_id, db, start_date, end_date
-                        )
-                        
-                        logger.debug(f"Выбрано сотрудников для наряда: {len(selected_employees)}")
-                        
-                        # Назначаем выбранных сотрудников
-                        for selected_employee in selected_employees:
-                            # Блокируем сотрудника на все дни длительности наряда
-                            for day_offset in range(duty_type.days_duration):
-                                duty_day = duty_date + timedelta(days=day_offset)
-                                duty_day_key = duty_day.isoformat()
-                                
-                                # Проверяем, не выходит ли день за пределы периода
-                                if duty_day > end_date:
-                                    break
-                                
-                                if selected_employee.id not in employee_busy_dates:
-                                    employee_busy_dates[selected_employee.id] = {}
-                                if duty_day_key not in employee_busy_dates[selected_employee.id]:
-                                    employee_busy_dates[selected_employee.id][duty_day_key] = set()
-                                employee_busy_dates[selected_employee.id][duty_day_key].add(duty_type_id)
-                                
-                                # Добавляем наряд только для первого дня (начало наряда)
-                                if day_offset == 0:
-                                    all_duties.append({
-                                        'date': duty_day_key,
-                                        'employee_id': selected_employee.id,
-                                        'employee_name': f"{selected_employee.last_name} {selected_employee.first_name}",
-                                        'duty_type_id': duty_type.id,
-                                        'duty_type_name': duty_type.name,
-                                        'people_per_day': duty_type.people_per_day,
-                                        'days_duration': duty_type.days_duration
-                                    })
-                            logger.debug(f"Добавлен наряд для {selected_employee.last_name} {selected_employee.first_name}")
-                    
-                    # Пропускаем автоматический выбор сотрудников для академических нарядов
-                    continue
-            
-            # Для каждого типа наряда должно заступить столько людей, сколько указано в people_per_day
-            people_needed = duty_type.people_per_day
-            
-            # Выбираем сотрудников для наряда
-            selected_employees = await select_employees_for_duty(
-                employees, duty_date, people_needed, employee_busy_dates, duty_type_id, db, start_date, end_date
-            )
-            
-            # Назначаем выбранных сотрудников
-            for selected_employee in selected_employees:
-                # Блокируем сотрудника на все дни длительности наряда
-                for day_offset in range(duty_type.days_duration):
-                    duty_day = duty_date + timedelta(days=day_offset)
-                    duty_day_key = duty_day.isoformat()
-                    
-                    # Проверяем, не выходит ли день за пределы периода
-                    if duty_day > end_date:
-                        break
-                    
-                    if selected_employee.id not in employee_busy_dates:
-                        employee_busy_dates[selected_employee.id] = {}
-                    if duty_day_key not in employee_busy_dates[selected_employee.id]:
-                        employee_busy_dates[selected_employee.id][duty_day_key] = set()
-                    employee_busy_dates[selected_employee.id][duty_day_key].add(duty_type_id)
-                    
-                    # Добавляем наряд только для первого дня (начало наряда)
-                    if day_offset == 0:
-                        all_duties.append({
-                            'date': duty_day_key,
-                        'employee_id': selected_employee.id,
-                        'employee_name': f"{selected_employee.last_name} {selected_employee.first_name}",
-                        'duty_type_id': duty_type.id,
-                            'duty_type_name': duty_type.name,
-                            'people_per_day': duty_type.people_per_day,
-                            'days_duration': duty_type.days_duration
-                        })
-        
-        current_date += timedelta(days=1)
-    
-    # Группируем по подразделениям для ответа
-    dept_result = await db.execute(select(Department))
-    departments = dept_result.scalars().all()
-    
-    distribution = []
-    for dept in departments:
-        # Получаем сотрудников подразделения для проверки
-        dept_employees_result = await db.execute(
-            select(Employee.id, Employee.duty_count).where(Employee.department_id == dept.id)
-        )
-        dept_employees_data = dept_employees_result.all()
-        dept_employee_ids = [row[0] for row in dept_employees_data]
-        dept_employee_duty_counts = {row[0]: row[1] or 0 for row in dept_employees_data}
-        
-        # Фильтруем наряды для этого подразделения
-        dept_duties = [d for d in all_duties if d['employee_id'] in dept_employee_ids]
-        
-        # Добавляем duty_count к каждому наряду
-        for duty in dept_duties:
-            duty['duty_count'] = dept_employee_duty_counts.get(duty['employee_id'], 0)
-        
-        if dept_duties:
-            distribution.append({
-                'department_id': dept.id,
-                'department_name': dept.name,
-                'duties': dept_duties
-            })
+    try:
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный формат даты. Используйте YYYY-MM-DD")
+    
+    # Ответ собирается из данных планировщика: проверка response_model не нужна
+    if not trace:
+        return json_response(await _generate_distribution(db, request, start_date, end_date, compact))
+    
+    with tracing("generate") as tracer:
+        with span("generate", start_date=request.start_date, end_date=request.end_date):
+            plan = await _generate_distribution(db, request, start_date, end_date, compact)
+    return json_response({"plan": plan, "trace": tracer.to_chrome()})
+
+async def _generate_distribution(
+    db: AsyncSession, request: DutyDistributionRequest, start_date: date, end_date: date, compact: bool = False
+):
+    with span("scope"):
+        department_ids = await _planning_scope(db, request.department_id, request.structure_id)
+    with span("load_snapshot") as current:
+        snapshot = await load_planning_snapshot(db, start_date, end_date, department_ids)
+        current.count("employees", len(snapshot.employees))
+    
+    loop = asyncio.get_running_loop()
+    tracer = current_tracer()
+    with span("plan"):
+        started = time.perf_counter()
+        if tracer is None:
+            duties = await loop.run_in_executor(get_process_pool(), plan_snapshot, snapshot)
+        else:
+            # Интервалы планировщика записываются в процессе пула и добавляются в трассу запроса
+            duties, planner_trace = await loop.run_in_executor(get_process_pool(), plan_snapshot_traced, snapshot)
+            tracer.merge(planner_trace)
+        record_generation("period", time.perf_counter() - started, (end_date - start_date).days + 1, len(duties))
     
     # Сохраняем все наряды в базу
-    for duty in all_duties:
-        # Получаем длительность наряда
-        duty_duration = duty.get('days_duration', 1)
-        start_date_duty = date.fromisoformat(duty['date'])
+    with span("persist") as current:
+        records = plan_records(snapshot, duties)
+        await write_plan_records(db, records)
+        await db.commit()
+        current.count("records", len(records))
+    
+    with span("build_response"):
+        if compact:
+            return await _compact_plan(db, duties, snapshot, start_date)
+        return await _group_duties_by_department(db, duties, snapshot.employees)
+
+@router.post("/generate/organization", response_model=List[DutyDistributionResponse])
+async def generate_organization_duty_distribution(request: OrganizationDistributionRequest):
+    """Распределить наряды по всем структурам (или по выбранным) параллельно.
+
+    Структуры не имеют общих сотрудников и календарей, поэтому планируются независимо:
+    снимки загружаются одновременно в отдельных сессиях, распределение считается
+    в пуле процессов, а все записи сохраняются одним INSERT.
+    """
+    try:
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d").date()
+        end_date = datetime.strptime(request.end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный формат даты. Используйте YYYY-MM-DD")
+    
+    async with AsyncSessionLocal() as session:
+        query = select(Department.id).where(Department.parent_id == None)
+        if request.structure_ids:
+            query = query.where(Department.id.in_(request.structure_ids))
+        structure_ids = (await session.execute(query.order_by(Department.id))).scalars().all()
+        if not structure_ids:
+            raise HTTPException(status_code=404, detail="Структуры не найдены")
         
-        # Создаем записи для всех дней длительности наряда
-        for day_offset in range(duty_duration):
-            duty_day = start_date_duty + timedelta(days=day_offset)
-            
-            # Проверяем, не выходит ли день за пределы периода
-            if duty_day > end_date:
-                break
-            
-            # Проверяем, не существует ли уже такая запись
-            existing_record = await db.execute(
-                select(DutyRecord)
-                .where(DutyRecord.employee_id == duty['employee_id'])
-                .where(DutyRecord.duty_type_id == duty['duty_type_id'])
-                .where(DutyRecord.duty_date == duty_day)
-            )
-            existing_record = existing_record.scalar_one_or_none()
-            
-            if not existing_record:
-                # Создаем новую запись
-                db.add(DutyRecord(
-                    employee_id=duty['employee_id'],
-                    duty_type_id=duty['duty_type_id'],
-                    duty_date=duty_day
-                ))
+        children = (await session.execute(
+            select(Department.parent_id, Department.id).where(Department.parent_id.in_(structure_ids))
+        )).all()
+    
+    partitions: Dict[int, List[int]] = {structure_id: [] for structure_id in structure_ids}
+    for parent_id, department_id in children:
+        partitions[parent_id].append(department_id)
+    
+    async def load_partition(department_ids: List[int]):
+        # Каждая структура загружается в своей сессии (отдельное соединение из пула)
+        async with AsyncSessionLocal() as session:
+            return await load_planning_snapshot(session, start_date, end_date, department_ids)
+    
+    snapshots = await asyncio.gather(*(
+        load_partition(department_ids or [structure_id]) for structure_id, department_ids in partitions.items()
+    ))
+    
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    started = time.perf_counter()
+    plans = await asyncio.gather(*(loop.run_in_executor(pool, plan_snapshot, snapshot) for snapshot in snapshots))
+    record_generation(
+        "organization", time.perf_counter() - started,
+        (end_date - start_date).days + 1, sum(len(plan) for plan in plans)
+    )
     
-    await db.commit()
-    return distribution
+    duties = []
+    records = []
+    employees = {}
+    for snapshot, plan in zip(snapshots, plans):
+        duties.extend(plan)
+        records.extend(plan_records(snapshot, plan))
+        employees.update(snapshot.employees)
+    
+    async with AsyncSessionLocal() as session:
+        await write_plan_records(session, records)
+        await session.commit()
+        return await _group_duties_by_department(session, duties, employees)
 
-async def select_employees_for_duty(
-    employees: List[Employee],
-    duty_date: date,
-    people_needed: int,
-    employee_busy_dates: Dict[int, Dict[str, set]],
-    duty_type_id: int,
-    db: AsyncSession,
-    start_date: date,
-    end_date: date
-) -> List[Employee]:
-    """Выбирает сотрудников для наряда с учетом количества нарядов за период и ограничения интервалов между нарядами"""
-    date_key = duty_date.isoformat()
-    
-    # Получаем количество нарядов каждого сотрудника за выбранный период
-    employee_duty_counts = {}
-    employee_last_duty_dates_by_type = {}
-    employee_last_duty_info = {}  # Информация о последнем наряде (дата и длительность)
-    
-    for employee in employees:
-        # Количество нарядов за выбранный период (из базы)
-        count_result = await db.execute(
-            select(func.count(DutyRecord.id))
-            .where(DutyRecord.employee_id == employee.id)
-            .where(DutyRecord.duty_date >= start_date)
-            .where(DutyRecord.duty_date <= end_date)
-        )
-        count_in_db = count_result.scalar() or 0
-        
-        # Количество нарядов в памяти (уже назначенных в этой сессии)
-        count_in_memory = 0
-        if employee.id in employee_busy_dates:
-            for date_str in employee_busy_dates[employee.id]:
-                count_in_memory += len(employee_busy_dates[employee.id][date_str])
-        
-        # Общее количество нарядов = наряды в выбранном периоде + duty_count
-        total_duty_count = count_in_db + count_in_memory + (employee.duty_count or 0)
-        employee_duty_counts[employee.id] = total_duty_count
-        
-        # Дата последнего наряда этого типа
-        last_duty_result = await db.execute(
-            select(DutyRecord.duty_date)
-            .where(DutyRecord.employee_id == employee.id)
-            .where(DutyRecord.duty_type_id == duty_type_id)
-            .order_by(DutyRecord.duty_date.desc())
-            .limit(1)
-        )
-        last_duty_date = last_duty_result.scalar_one_or_none()
-        
-        # Учитываем наряды в памяти
-        all_dates = set()
-        if last_duty_date:
-            all_dates.add(last_duty_date)
-        if employee.id in employee_busy_dates:
-            for date_str in employee_busy_dates[employee.id]:
-                if duty_type_id in employee_busy_dates[employee.id][date_str]:
-                    all_dates.add(date.fromisoformat(date_str))
-        
-        last_duty_date = max(all_dates) if all_dates else None
-        employee_last_duty_dates_by_type[(employee.id, duty_type_id)] = last_duty_date
-        
-        # Получаем информацию о последнем наряде любого типа (дата и длительность)
-        last_any_duty_result = await db.execute(
-            select(DutyRecord.duty_date, DutyType.days_duration)
-            .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
-            .where(DutyRecord.employee_id == employee.id)
-            .order_by(DutyRecord.duty_date.desc())
+def _planning_scope_key(department_id: Optional[int], structure_id: Optional[int]) -> str:
+    """Ключ области планирования для сохраненного состояния"""
+    if department_id:
+        return f"department:{department_id}"
+    if structure_id:
+        return f"structure:{structure_id}"
+    return "all"
+
+@router.post("/generate/horizon", response_model=HorizonDistributionResponse)
+async def generate_horizon_duty_distribution(
+    request: HorizonDistributionRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Распределить наряды на несколько месяцев за один проход.
+
+    Счетчики, последние наряды по типам и незавершенные многодневные наряды переносятся
+    из месяца в месяц, состояние на конец горизонта сохраняется. Если горизонт начинается
+    сразу после сохраненного состояния той же области, история нарядов не перечитывается.
+    """
+    if not 1 <= request.start_month <= 12:
+        raise HTTPException(status_code=400, detail="Месяц должен быть от 1 до 12")
+    if not 1 <= request.months <= 12:
+        raise HTTPException(status_code=400, detail="Горизонт планирования - от 1 до 12 месяцев")
+    
+    periods = []
+    year, month = request.start_year, request.start_month
+    for _ in range(request.months):
+        periods.append(month_period(year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    
+    scope = _planning_scope_key(request.department_id, request.structure_id)
+    department_ids = await _planning_scope(db, request.department_id, request.structure_id)
+    
+    saved = None
+    if request.use_saved_state:
+        saved_result = await db.execute(
+            select(PlanningState)
+            .where(PlanningState.scope == scope)
+            .where(PlanningState.planned_through == periods[0].start - timedelta(days=1))
+            .order_by(PlanningState.id.desc())
             .limit(1)
         )
-        last_any_duty_data = last_any_duty_result.first()
-        
-        # Учитываем наряды в памяти для любого типа
-        all_any_dates = set()
-        last_duty_duration = 1  # По умолчанию 1 день
-        
-        if last_any_duty_data:
-            all_any_dates.add(last_any_duty_data[0])
-            last_duty_duration = last_any_duty_data[1] or 1
-        
-        if employee.id in employee_busy_dates:
-            for date_str in employee_busy_dates[employee.id]:
-                all_any_dates.add(date.fromisoformat(date_str))
-                # Для нарядов в памяти считаем длительность 1 день (так как это текущая сессия)
-                last_duty_duration = 1
-        
-        last_any_duty_date = max(all_any_dates) if all_any_dates else None
-        employee_last_duty_info[employee.id] = {
-            'date': last_any_duty_date,
-            'duration': last_duty_duration
-        }
-    
-    # Получаем предпочтения сотрудников для данной даты
-    employee_preferences = {}
-    for employee in employees:
-        preference_result = await db.execute(
-            select(EmployeeDutyPreference)
-            .where(EmployeeDutyPreference.employee_id == employee.id)
-            .where(EmployeeDutyPreference.date == duty_date)
-        )
-        preference = preference_result.scalar_one_or_none()
-        employee_preferences[employee.id] = preference
-    
-    # Получаем статусы сотрудников для данной даты (Болен, Командировка, Отпуск)
-    employee_statuses = {}
-    for employee in employees:
-        status_result = await db.execute(
-            select(EmployeeStatusSchedule)
-            .where(EmployeeStatusSchedule.employee_id == employee.id)
-            .where(EmployeeStatusSchedule.start_date <= duty_date)
-            .where(EmployeeStatusSchedule.end_date >= duty_date)
-        )
-        status = status_result.scalar_one_or_none()
-        employee_statuses[employee.id] = status
-    
-    # Фильтруем доступных сотрудников
-    available_employees = []
-    preferred_employees = []  # Сотрудники с предпочтительными датами
-    
-    for employee in employees:
-        # Проверяем статусы сотрудника (Болен, Командировка, Отпуск)
-        status = employee_statuses.get(employee.id)
-        if status and status.status in ['Б', 'К', 'О']:  # Болен, Командировка, Отпуск
-            # Сотрудник не может заступать в эту дату из-за статуса
-            continue
-        
-        # Проверяем предпочтения сотрудника
-        preference = employee_preferences.get(employee.id)
-        if preference and preference.preference_type == 'unavailable':
-            # Сотрудник не может заступать в эту дату
-            continue
-        
-        # Проверяем, не занят ли сотрудник в этот тип наряда в эту дату
-        if (employee.id in employee_busy_dates and 
-            date_key in employee_busy_dates[employee.id] and 
-            duty_type_id in employee_busy_dates[employee.id][date_key]):
-            continue
-        
-        # Проверяем ограничение интервалов между нарядами в зависимости от длительности предыдущего наряда
-        last_duty_info = employee_last_duty_info[employee.id]
-        if last_duty_info['date'] is not None:
-            days_since_last_duty = (duty_date - last_duty_info['date']).days
-            last_duty_duration = last_duty_info['duration']
-            
-            # Вычисляем минимальный интервал в зависимости от длительности предыдущего наряда
-            # 1 день = следующий день (интервал 1 день)
-            # 2 дня = через день (интервал 2 дня)  
-            # 3 дня = через 2 дня (интервал 3 дня)
-            min_interval = last_duty_duration
-            
-            if days_since_last_duty < min_interval:
-                continue
-        
-        # Если у сотрудника предпочтительная дата, добавляем в отдельный список
-        if preference and preference.preference_type == 'preferred':
-            preferred_employees.append(employee)
-        else:
-            available_employees.append(employee)
-    
-    # Объединяем предпочтительных и обычных сотрудников
-    all_available_employees = preferred_employees + available_employees
-    
-    if not all_available_employees:
-        return []
+        saved = saved_result.scalars().first()
     
-    # Сортируем по общему количеству нарядов (приоритет тем, у кого меньше нарядов)
-    all_available_employees.sort(key=lambda emp: employee_duty_counts[emp.id])
-    
-    # Выбираем сотрудников с наименьшим общим количеством нарядов
-    selected_employees = []
-    current_count = employee_duty_counts[all_available_employees[0].id]
-    
-    # Сначала берем всех сотрудников с минимальным количеством нарядов
-    candidates = [emp for emp in all_available_employees if employee_duty_counts[emp.id] == current_count]
-    
-    # Если кандидатов больше, чем нужно, приоритет отдаем предпочтительным сотрудникам
-    if len(candidates) > people_needed:
-        # Сортируем: сначала предпочтительные, потом по дате последнего наряда
-        candidates.sort(key=lambda emp: (
-            emp not in preferred_employees,  # False (0) для предпочтительных, True (1) для обычных
-            employee_last_duty_dates_by_type[(emp.id, duty_type_id)] or date.min
+    snapshots = []
+    for index, period in enumerate(periods):
+        # История нужна только для первого месяца и только без сохраненного состояния
+        snapshots.append(await load_planning_snapshot(
+            db, period.start, period.last_day, department_ids, include_history=index == 0 and saved is None
         ))
     
-    selected_employees = candidates[:people_needed]
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    plans, carry = await loop.run_in_executor(
+        get_process_pool(), plan_horizon, snapshots, carry_state_from_json(saved.state) if saved else None
+    )
+    record_generation(
+        "horizon", time.perf_counter() - started,
+        (periods[-1].end - periods[0].start).days, sum(len(plan) for plan in plans)
+    )
     
-    # Если нужно больше сотрудников, берем следующих по количеству нарядов
-    if len(selected_employees) < people_needed:
-        remaining_needed = people_needed - len(selected_employees)
-        
-        # Берем следующих по количеству нарядов
-        next_candidates = [emp for emp in all_available_employees if employee_duty_counts[emp.id] > current_count]
-        next_candidates.sort(key=lambda emp: employee_duty_counts[emp.id])
-        
-        # Добавляем сотрудников с следующим количеством нарядов
-        for next_count in sorted(set(employee_duty_counts[emp.id] for emp in next_candidates)):
-            if len(selected_employees) >= people_needed:
-                break
-            
-            same_count_candidates = [emp for emp in next_candidates if employee_duty_counts[emp.id] == next_count]
-            # Сортируем: сначала предпочтительные, потом по дате последнего наряда
-            same_count_candidates.sort(key=lambda emp: (
-                emp not in preferred_employees,  # False (0) для предпочтительных, True (1) для обычных
-                employee_last_duty_dates_by_type[(emp.id, duty_type_id)] or date.min
-            ))
-            
-            needed_from_this_count = min(remaining_needed - len(selected_employees), len(same_count_candidates))
-            selected_employees.extend(same_count_candidates[:needed_from_this_count])
-    
-    return selected_employees
+    records_created = await write_plan_records(db, plan_horizon_records(snapshots, plans))
+    state = PlanningState(scope=scope, planned_through=carry.planned_through, state=carry_state_to_json(carry))
+    db.add(state)
+    await db.commit()
+    
+    months = []
+    for period, snapshot, duties in zip(periods, snapshots, plans):
+        months.append({
+            'year': period.start.year,
+            'month': period.start.month,
+            'departments': await _group_duties_by_department(db, duties, snapshot.employees)
+        })
+    return {
+        'state_id': state.id,
+        'planned_through': carry.planned_through.isoformat(),
+        'from_saved_state': saved is not None,
+        'records_created': records_created,
+        'months': months
+    }
+
+@router.get("/planning-state")
+async def get_planning_state(
+    department_id: Optional[int] = Query(None, description="ID подразделения"),
+    structure_id: Optional[int] = Query(None, description="ID структуры"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Последнее сохраненное состояние планировщика для области (с какого дня продолжать план)"""
+    scope = _planning_scope_key(department_id, structure_id)
+    result = await db.execute(
+        select(PlanningState)
+        .where(PlanningState.scope == scope)
+        .order_by(PlanningState.planned_through.desc(), PlanningState.id.desc())
+        .limit(1)
+    )
+    state = result.scalars().first()
+    if not state:
+        raise HTTPException(status_code=404, detail="Сохраненное состояние планирования не найдено")
+    return {
+        'id': state.id,
+        'scope': state.scope,
+        'planned_through': state.planned_through.isoformat(),
+        'next_start_date': (state.planned_through + timedelta(days=1)).isoformat(),
+        'employees': len(state.state['counts']),
+        'created_at': state.created_at.isoformat() if state.created_at else None
+    }
+
+@router.get("/records/{record_id}/replacements")
+async def get_duty_replacements(
+    record_id: int,
+    limit: int = Query(5, ge=1, le=50, description="Количество кандидатов"),
+    same_department: bool = Query(True, description="Искать только в подразделении сотрудника"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Подобрать замену для наряда по тем же критериям, что и при распределении"""
+    loaded = await load_duty_block(db, record_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Запись наряда не найдена")
+    record, duty_type, block = loaded
+    
+    candidates = await find_replacement_candidates(db, record, duty_type, limit=limit, same_department=same_department)
+    return {
+        "record_id": record.id,
+        "employee_id": record.employee_id,
+        "duty_type_id": record.duty_type_id,
+        "duty_date": record.duty_date.isoformat(),
+        "days": [item.duty_date.isoformat() for item in block],
+        "candidates": candidates
+    }
+
+@router.post("/records/{record_id}/replace")
+async def replace_duty_record_employee(
+    record_id: int,
+    replacement: DutyReplacementRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Заменить сотрудника в наряде (все дни наряда) в одной транзакции"""
+    try:
+        result = await replace_duty_employee(db, record_id, replacement.employee_id)
+    except ReplacementError as e:
+        await db.rollback()
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    await db.commit()
+    return {"message": "Сотрудник в наряде заменен", **result}
 
 @router.get("/department/{department_id}")
 async def get_duty_distribution_by_department(
     department_id: int,
     start_date: str = Query(None, description="Начальная дата (YYYY-MM-DD)"),
     end_date: str = Query(None, description="Конечная дата (YYYY-MM-DD)"),
+    compact: bool = Query(False, description="Компактный формат: справочники и наряды столбцами идентификаторов"),
     db: AsyncSession = Depends(get_db)
 ):
     """Получить распределение нарядов для конкретного подразделения за выбранный период"""
@@ -539,20 +484,26 @@ async def get_duty_distribution_by_department(
         raise HTTPException(status_code=404, detail="Подразделение не найдено")
     
     # Формируем запрос для получения нарядов
+    condition = Employee.department_id == department_id
+    period = None
+    if start_date and end_date:
+        try:
+            period = parse_date_range(start_date, end_date)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        condition = and_(condition, date_in_period(DutyRecord.duty_date, period))
+    
+    if compact:
+        return json_response(await _load_compact_duties(db, condition, period.start if period else None))
+    
     query = (
         select(DutyRecord, Employee, DutyType)
         .join(Employee, DutyRecord.employee_id == Employee.id)
         .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
-        .where(Employee.department_id == department_id)
+        .where(condition)
+        .order_by(DutyRecord.duty_date, Employee.last_name, Employee.first_name)
     )
     
-    if start_date and end_date:
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
-        query = query.where(DutyRecord.duty_date >= start_dt).where(DutyRecord.duty_date <= end_dt)
-    
-    query = query.order_by(DutyRecord.duty_date, Employee.last_name, Employee.first_name)
-    
     duty_records_result = await db.execute(query)
     duty_records = duty_records_result.all()
     
@@ -593,131 +544,192 @@ async def get_duty_distribution_by_type(
         })
     return result
 
-@router.get("/all")
+@router.get("/all", response_class=FastJSONResponse)
+@single_flight()
 async def get_all_duties(
     year: int = Query(..., description="Год"),
-    month: int = Query(..., description="Месяц"),
+    month: Optional[int] = Query(None, description="Месяц"),
+    week: Optional[int] = Query(None, description="Номер недели по ISO (вместо месяца)"),
+    compact: bool = Query(False, description="Компактный формат: справочники и наряды столбцами идентификаторов"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получить все наряды за месяц/год с группировкой по подразделениям"""
+    """Получить все наряды за месяц (или ISO-неделю) с группировкой по подразделениям"""
     
-    # Получаем все наряды за месяц
-    start_date = date(year, month, 1)
-    if month == 12:
-        end_date = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    if month is None and week is None:
+        raise HTTPException(status_code=400, detail="Укажите месяц или неделю")
+    try:
+        period = resolve_period(year=year, month=month, week=week)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if compact:
+        return json_response(await _load_compact_duties(db, date_in_period(DutyRecord.duty_date, period), period.start))
     
+    # Только нужные столбцы: без загрузки ORM-объектов и карты идентичности
     duty_records_result = await db.execute(
-        select(DutyRecord, Employee, Department, DutyType)
+        select(
+            DutyRecord.id, DutyRecord.duty_date,
+            Employee.id, Employee.last_name, Employee.first_name, Employee.duty_count,
+            Department.id, Department.name,
+            DutyType.id, DutyType.name, DutyType.people_per_day
+        )
         .join(Employee, DutyRecord.employee_id == Employee.id)
         .join(Department, Employee.department_id == Department.id)
         .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
-        .where(DutyRecord.duty_date >= start_date)
-        .where(DutyRecord.duty_date <= end_date)
+        .where(date_in_period(DutyRecord.duty_date, period))
         .order_by(DutyRecord.duty_date, Employee.last_name, Employee.first_name)
     )
-    duty_records = duty_records_result.all()
     
     # Формируем ответ с дополнительной информацией о duty_count
-    result = []
-    for duty_record, employee, department, duty_type in duty_records:
-        result.append({
-            'id': duty_record.id,
-            'date': duty_record.duty_date.isoformat(),
-            'employee_id': employee.id,
-            'employee_name': f"{employee.last_name} {employee.first_name}",
-            'department_id': department.id,
-            'department_name': department.name,
-            'duty_type_id': duty_type.id,
-            'duty_type_name': duty_type.name,
-            'people_per_day': duty_type.people_per_day,
-            'duty_count': employee.duty_count or 0  # Добавляем duty_count
-        })
+    result = [
+        {
+            'id': record_id,
+            'date': duty_date.isoformat(),
+            'employee_id': employee_id,
+            'employee_name': f"{last_name} {first_name}",
+            'department_id': department_id,
+            'department_name': department_name,
+            'duty_type_id': duty_type_id,
+            'duty_type_name': duty_type_name,
+            'people_per_day': people_per_day,
+            'duty_count': duty_count or 0  # Добавляем duty_count
+        }
+        for (
+            record_id, duty_date, employee_id, last_name, first_name, duty_count,
+            department_id, department_name, duty_type_id, duty_type_name, people_per_day
+        ) in duty_records_result.tuples()
+    ]
     
-    return result
+    return json_response(result)
 
 @router.delete("/clear")
 async def clear_duty_records(
     request: DutyDistributionRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """Удалить наряды за указанный период для конкретного подразделения"""
-    from models.models import DutyRecord
-    
-    # Парсим даты
-    start_date = datetime.strptime(request.start_date, "%Y-%m-%d").date()
-    end_date = datetime.strptime(request.end_date, "%Y-%m-%d").date()
+    """Удалить наряды за указанный период для конкретного подразделения или структуры"""
+    try:
+        period = parse_date_range(request.start_date, request.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Формируем запрос для удаления нарядов
+    # Одним запросом DELETE ... USING employees
     delete_query = (
-        select(DutyRecord)
-        .where(DutyRecord.duty_date >= start_date)
-        .where(DutyRecord.duty_date <= end_date)
+        delete(DutyRecord)
+        .where(date_in_period(DutyRecord.duty_date, period))
+        .execution_options(synchronize_session=False)
     )
     
-    # Если указано конкретное подразделение
-    if request.department_id:
-        delete_query = delete_query.where(Employee.department_id == request.department_id)
-    # Если указана структура (но не подразделение)
-    elif request.structure_id:
-        # Получаем все подразделения структуры
-        subdepts_result = await db.execute(
-            select(Department.id).where(Department.parent_id == request.structure_id)
+    # Та же область, что и у /generate: подразделение или структура с дочерними подразделениями
+    department_ids = await _planning_scope(db, request.department_id, request.structure_id)
+    if department_ids is not None:
+        delete_query = (
+            delete_query
+            .where(DutyRecord.employee_id == Employee.id)
+            .where(Employee.department_id.in_(department_ids))
         )
-        subdept_ids = [row[0] for row in subdepts_result.all()]
-        if subdept_ids:
-            delete_query = delete_query.where(Employee.department_id.in_(subdept_ids))
     
     result = await db.execute(delete_query)
-    records = result.scalars().all()
-    
-    for record in records:
-        await db.delete(record)
+    deleted_count = result.rowcount
     await db.commit()
     
-    return {"message": f"Удалено {len(records)} нарядов за период {start_date} - {end_date}"} 
+    return {
+        "message": f"Удалено {deleted_count} нарядов за период {period.start} - {period.last_day}",
+        "deleted_count": deleted_count
+    }
+
+# Размер пачки строк при чтении через серверный курсор
+EXPORT_BATCH_SIZE = 2000
+
+def _export_query():
+    """Запрос строк экспорта: только нужные колонки, без загрузки ORM-объектов"""
+    return (
+        select(
+            DutyRecord.duty_date,
+            Employee.id.label('employee_id'),
+            Employee.last_name,
+            Employee.first_name,
+            Department.id.label('department_id'),
+            Department.name.label('department_name'),
+            DutyType.id.label('duty_type_id'),
+            DutyType.name.label('duty_type_name')
+        )
+        .join(Employee, DutyRecord.employee_id == Employee.id)
+        .join(Department, Employee.department_id == Department.id)
+        .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
+    )
+
+def _to_export_row(row) -> DutyExportRow:
+    """Преобразовать строку запроса в строку экспорта"""
+    return DutyExportRow(
+        duty_date=row.duty_date,
+        employee_id=row.employee_id,
+        employee_name=f"{row.last_name} {row.first_name}",
+        department_id=row.department_id,
+        department_name=row.department_name,
+        duty_type_id=row.duty_type_id,
+        duty_type_name=row.duty_type_name
+    )
+
+async def _stream_export_rows(query):
+    """Читать строки экспорта через серверный курсор в отдельной сессии.
+
+    Сессия открывается внутри генератора, потому что ответ отдается уже после
+    выхода из обработчика.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for row in result:
+            yield _to_export_row(row)
+
+def _streaming_export_response(writer: ExportWriter, query, filename: str) -> StreamingResponse:
+    """Потоковый ответ в формате писателя (csv, jsonl, parquet)"""
+    if not writer.is_available():
+        raise HTTPException(status_code=400, detail=f"Формат {writer.extension} недоступен на сервере")
+    return StreamingResponse(
+        writer.stream(_stream_export_rows(query)),
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}.{writer.extension}"}
+    )
 
 @router.get("/export")
 async def export_duties_to_excel(
     year: int = Query(..., description="Год"),
-    month: int = Query(..., description="Месяц"),
+    month: Optional[int] = Query(None, description="Месяц (для csv, parquet и jsonl можно не указывать - весь год)"),
+    format: str = Query("xlsx", description="Формат экспорта: xlsx, csv, parquet или jsonl"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Экспортировать наряды за месяц/год в Excel (xlsx)"""
+    """Экспортировать наряды за месяц/год в Excel (xlsx) или в потоковом формате (csv, parquet, jsonl)"""
+    writer = get_export_writer(format)
+    if writer is None and month is None:
+        raise HTTPException(status_code=400, detail="Для экспорта в xlsx нужно указать месяц")
+    try:
+        period = resolve_period(year=year, month=month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if writer:
+        filename = f"duty_distribution_{year}" if month is None else f"duty_distribution_{year}_{month:02d}"
+        query = (
+            _export_query()
+            .where(date_in_period(DutyRecord.duty_date, period))
+            .order_by(DutyRecord.duty_date, DutyRecord.id)
+        )
+        return _streaming_export_response(writer, query, filename)
+    
     try:
         # Получаем все записи нарядов за месяц/год
         duty_records_result = await db.execute(
-            select(DutyRecord, Employee, Department, DutyType)
-            .join(Employee, DutyRecord.employee_id == Employee.id)
-            .join(Department, Employee.department_id == Department.id)
-            .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
-            .where(func.extract('year', DutyRecord.duty_date) == year)
-            .where(func.extract('month', DutyRecord.duty_date) == month)
+            _export_query()
+            .where(date_in_period(DutyRecord.duty_date, period))
             .order_by(DutyRecord.duty_date, Department.name, Employee.last_name, Employee.first_name)
         )
-        duty_records = duty_records_result.all()
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"Наряды {month:02d}.{year}"
-        ws.append(["Дата", "ФИО", "Подразделение", "Тип наряда"])
-        if not duty_records:
-            ws.append(["Нет данных", "", "", ""])
-        else:
-            for duty_record, employee, department, duty_type in duty_records:
-                ws.append([
-                    duty_record.duty_date.strftime("%d-%m-%Y"),
-                    f"{employee.last_name} {employee.first_name}",
-                    department.name,
-                    duty_type.name
-                ])
-        stream = io.BytesIO()
-        wb.save(stream)
-        stream.seek(0)
+        rows = [_to_export_row(row) for row in duty_records_result.all()]
+        content = render_month_workbook(rows, year, month)
         filename = f"duty_distribution_{year}_{month:02d}.xlsx"
         return StreamingResponse(
-            stream,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            io.BytesIO(content),
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
     except Exception as e:
@@ -728,153 +740,83 @@ async def export_department_duties_to_excel(
     department_id: int,
     year: int = Query(..., description="Год"),
     month: int = Query(..., description="Месяц"),
-    format: str = Query("employees", description="Формат экспорта: employees (по сотрудникам) или duty_types (по датам и типам)"),
+    format: str = Query("employees", description="Формат экспорта: employees (по сотрудникам), duty_types (по датам и типам), csv, parquet или jsonl"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Экспортировать наряды по подразделению в Excel"""
+    """Экспортировать наряды по подразделению в Excel или в потоковом формате (csv, parquet, jsonl)"""
+    try:
+        period = month_period(year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    writer = get_export_writer(format)
+    if writer:
+        query = (
+            _export_query()
+            .where(Employee.department_id == department_id)
+            .where(date_in_period(DutyRecord.duty_date, period))
+            .order_by(DutyRecord.duty_date, DutyRecord.id)
+        )
+        return _streaming_export_response(writer, query, f"department_{department_id}_duties_{year}_{month:02d}")
+    
     try:
-        from sqlalchemy import extract
-        
         # Получаем все записи нарядов для подразделения за месяц/год
         duty_records_result = await db.execute(
-            select(DutyRecord, Employee, DutyType)
-            .join(Employee, DutyRecord.employee_id == Employee.id)
-            .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
+            _export_query()
             .where(Employee.department_id == department_id)
-            .where(extract('year', DutyRecord.duty_date) == year)
-            .where(extract('month', DutyRecord.duty_date) == month)
+            .where(date_in_period(DutyRecord.duty_date, period))
             .order_by(Employee.last_name, Employee.first_name, DutyRecord.duty_date)
         )
-        duty_records = duty_records_result.all()
-        
-        import openpyxl
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        
-        if format == "duty_types":
-            # Формат: даты в строках, типы нарядов в колонках
-            ws.title = f"Подразделение {department_id} - по датам и типам"
-            
-            # Собираем уникальные даты и типы нарядов
-            dates = sorted({duty_record.duty_date for duty_record, _, _ in duty_records})
-            duty_types = []
-            duty_type_set = set()
-            for duty_record, _, duty_type in duty_records:
-                if duty_type.id not in duty_type_set:
-                    duty_types.append((duty_type.id, duty_type.name))
-                    duty_type_set.add(duty_type.id)
-            
-            # Строим мапу: (date, duty_type_id) -> список сотрудников
-            duty_map = {}
-            for duty_record, employee, duty_type in duty_records:
-                key = (duty_record.duty_date, duty_type.id)
-                if key not in duty_map:
-                    duty_map[key] = []
-                duty_map[key].append(f"{employee.last_name} {employee.first_name}")
-            
-            # Функция получения цвета для типа наряда
-            def get_duty_color(duty_type_name: str):
-                name = duty_type_name.lower()
-                if 'академический' in name:
-                    return {'bg': 'E9D5FF', 'text': '7C3AED'}  # purple
-                elif 'дежурный' in name or 'дежурство' in name:
-                    return {'bg': 'DBEAFE', 'text': '1D4ED8'}  # blue
-                elif 'патрульный' in name or 'патруль' in name:
-                    return {'bg': 'D1FAE5', 'text': '047857'}  # green
-                elif 'караульный' in name or 'караул' in name:
-                    return {'bg': 'FEE2E2', 'text': 'DC2626'}  # red
-                elif 'конвойный' in name or 'конвой' in name:
-                    return {'bg': 'FED7AA', 'text': 'EA580C'}  # orange
-                elif 'охранный' in name or 'охрана' in name:
-                    return {'bg': 'FEF3C7', 'text': 'D97706'}  # yellow
-                elif 'инспектор' in name:
-                    return {'bg': 'E0E7FF', 'text': '3730A3'}  # indigo
-                elif 'комендант' in name:
-                    return {'bg': 'FCE7F3', 'text': 'BE185D'}  # pink
-                else:
-                    return {'bg': 'F3F4F6', 'text': '374151'}  # gray
-            
-            # Заголовки
-            header = ["Дата"] + [duty_type_name for _, duty_type_name in duty_types]
-            ws.append(header)
-            
-            # Применяем стили к заголовкам
-            for col in range(1, len(header) + 1):
-                cell = ws.cell(row=1, column=col)
-                cell.font = openpyxl.styles.Font(bold=True)
-                cell.fill = openpyxl.styles.PatternFill(start_color="E5E7EB", end_color="E5E7EB", fill_type="solid")
-            
-            # Данные по датам
-            for row_idx, date in enumerate(dates, start=2):
-                row = [date.strftime("%d-%m")]
-                for col_idx, (duty_type_id, duty_type_name) in enumerate(duty_types, start=2):
-                    employees = duty_map.get((date, duty_type_id), [])
-                    cell_value = ", ".join(employees) if employees else "—"
-                    row.append(cell_value)
-                    
-                    # Применяем цвет к ячейке если есть сотрудники
-                    if employees:
-                        cell = ws.cell(row=row_idx, column=col_idx)
-                        colors = get_duty_color(duty_type_name)
-                        cell.fill = openpyxl.styles.PatternFill(
-                            start_color=colors['bg'], 
-                            end_color=colors['bg'], 
-                            fill_type="solid"
-                        )
-                        cell.font = openpyxl.styles.Font(
-                            color=colors['text'],
-                            bold=True
-                        )
-                        # Добавляем границы
-                        cell.border = openpyxl.styles.Border(
-                            left=openpyxl.styles.Side(style='thin'),
-                            right=openpyxl.styles.Side(style='thin'),
-                            top=openpyxl.styles.Side(style='thin'),
-                            bottom=openpyxl.styles.Side(style='thin')
-                        )
-                
-                ws.append(row)
-                
-            filename = f"department_{department_id}_duty_types_{year}_{month:02d}.xlsx"
-        else:
-            # Формат по умолчанию: сотрудники в строках, даты в колонках
-            ws.title = f"Подразделение {department_id}"
-            
-            # Собираем уникальные даты и сотрудников
-            dates = sorted({duty_record.duty_date for duty_record, _, _ in duty_records})
-            employees = []
-            emp_set = set()
-            for duty_record, employee, _ in duty_records:
-                if employee.id not in emp_set:
-                    employees.append((employee.id, f"{employee.last_name} {employee.first_name}"))
-                    emp_set.add(employee.id)
-            
-            # Строим мапу: (employee_id, date) -> тип наряда
-            duty_map = {}
-            for duty_record, employee, duty_type in duty_records:
-                duty_map[(employee.id, duty_record.duty_date)] = duty_type.name
-            
-            # Первая строка — даты
-            header = ["Сотрудник"] + [date.strftime("%d-%m") for date in dates]
-            ws.append(header)
-            
-            # Данные по сотрудникам
-            for emp_id, emp_name in employees:
-                row = [emp_name]
-                for date in dates:
-                    row.append(duty_map.get((emp_id, date), ""))
-                ws.append(row)
-                
-            filename = f"department_{department_id}_duties_{year}_{month:02d}.xlsx"
-        
-        stream = io.BytesIO()
-        wb.save(stream)
-        stream.seek(0)
+        rows = [_to_export_row(row) for row in duty_records_result.all()]
+        filename, content = render_department_workbook(rows, department_id, year, month, format)
         
         return StreamingResponse(
-            stream,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            io.BytesIO(content),
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Export error: {e}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Export error: {e}") 
+
+@router.get("/export/structure/{structure_id}")
+async def export_structure_duties_bundle(
+    structure_id: int,
+    year: int = Query(..., description="Год"),
+    month: int = Query(..., description="Месяц"),
+    format: str = Query("employees", description="Формат книг: employees (по сотрудникам) или duty_types (по датам и типам)"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Экспортировать наряды всех подразделений структуры одним ZIP-архивом (по книге Excel на подразделение)"""
+    structure_result = await db.execute(select(Department).where(Department.id == structure_id))
+    if not structure_result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Структура не найдена")
+    
+    subdepts_result = await db.execute(
+        select(Department.id, Department.name)
+        .where(Department.parent_id == structure_id)
+        .order_by(Department.name)
+    )
+    departments = [(row.id, row.name) for row in subdepts_result.all()]
+    if not departments:
+        raise HTTPException(status_code=404, detail="В структуре нет подразделений")
+    
+    try:
+        period = month_period(year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Один запрос на всю структуру, дальше строки делятся по подразделениям в памяти
+    duty_records_result = await db.execute(
+        _export_query()
+        .where(Department.parent_id == structure_id)
+        .where(date_in_period(DutyRecord.duty_date, period))
+        .order_by(Employee.last_name, Employee.first_name, DutyRecord.duty_date)
+    )
+    partitions = partition_by_department([_to_export_row(row) for row in duty_records_result.all()])
+    
+    filename = f"structure_{structure_id}_duties_{year}_{month:02d}.zip"
+    return StreamingResponse(
+        stream_department_bundle(departments, partitions, year, month, format),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -4,6 +4,9 @@ from sqlalchemy import select
 from typing import List, Optional
 from database import get_db
 from models.models import DutyType, EmployeeDutyType, Employee
+from services.department_cascade import department_subtree_ids
+from services.duty_type_assignment import assign_duty_type, count_subtree_employees, unassign_duty_type
+from services.fast_json import FastJSONResponse, json_response
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -66,6 +69,56 @@ async def get_unique_duty_types(db: AsyncSession = Depends(get_db)):
     duty_types = result.scalars().all()
     return duty_types
 
+# Объявлен до /{duty_type_id}, иначе путь перехватывается им
+@router.get("/all-with-departments", response_model=List[DutyTypeWithDepartmentResponse], response_class=FastJSONResponse)
+async def get_all_duty_types_with_departments(db: AsyncSession = Depends(get_db)):
+    """Получить все типы нарядов с информацией о подразделениях"""
+    # Получаем все типы нарядов с информацией о подразделениях
+    result = await db.execute(
+        select(
+            DutyType.id,
+            DutyType.name,
+            DutyType.description,
+            DutyType.duty_category,
+            DutyType.people_per_day,
+            DutyType.days_duration,
+            Employee.department_id
+        )
+        .join(EmployeeDutyType, DutyType.id == EmployeeDutyType.duty_type_id)
+        .join(Employee, EmployeeDutyType.employee_id == Employee.id)
+        .where(EmployeeDutyType.is_active == True)
+        .distinct()
+    )
+    
+    duty_types_with_dept = result.all()
+    
+    # Получаем названия подразделений
+    department_ids = list(set([row.department_id for row in duty_types_with_dept]))
+    
+    # Создаем словарь для маппинга department_id -> department_name
+    from models.models import Department
+    dept_result = await db.execute(
+        select(Department.id, Department.name)
+        .where(Department.id.in_(department_ids))
+    )
+    dept_mapping = {dept.id: dept.name for dept in dept_result.all()}
+    
+    # Формируем результат
+    response = []
+    for row in duty_types_with_dept:
+        dept_name = dept_mapping.get(row.department_id, "Неизвестное подразделение")
+        response.append({
+            "id": row.id,
+            "name": row.name,
+            "description": row.description,
+            "duty_category": row.duty_category,
+            "people_per_day": row.people_per_day,
+            "days_duration": row.days_duration,
+            "department_name": dept_name
+        })
+    
+    return json_response(response)
+
 @router.get("/{duty_type_id}", response_model=DutyTypeResponse)
 async def get_duty_type(duty_type_id: int, db: AsyncSession = Depends(get_db)):
     """Получить конкретный тип наряда по ID"""
@@ -125,14 +178,12 @@ async def create_duty_type(duty_type: DutyTypeCreate, db: AsyncSession = Depends
 
 @router.post("/department", response_model=DutyTypeResponse)
 async def create_duty_type_for_department(duty_type: DutyTypeCreateForDepartment, db: AsyncSession = Depends(get_db)):
-    """Создать новый тип наряда и назначить его всем сотрудникам подразделения"""
-    # Проверяем существование подразделения
-    department_result = await db.execute(
-        select(Employee).where(Employee.department_id == duty_type.department_id)
-    )
-    employees = department_result.scalars().all()
-    
-    if not employees:
+    """Создать новый тип наряда и назначить его всем сотрудникам подразделения.
+
+    Если department_id - структура, тип наряда назначается сотрудникам всех ее подразделений.
+    """
+    # Проверяем, что в подразделении (вместе с дочерними) есть сотрудники
+    if not await count_subtree_employees(db, duty_type.department_id):
         raise HTTPException(status_code=404, detail="Подразделение не найдено или в нем нет сотрудников")
     
     # Для нарядов "По подразделению" всегда создаем новый наряд для подразделения
@@ -145,10 +196,11 @@ async def create_duty_type_for_department(duty_type: DutyTypeCreateForDepartment
             .where(
                 DutyType.name == duty_type.name,
                 DutyType.duty_category == 'department',
-                Employee.department_id == duty_type.department_id
+                Employee.department_id.in_(department_subtree_ids(duty_type.department_id))
             )
+            .limit(1)
         )
-        existing_duty_type = existing_duty_type_result.scalar_one_or_none()
+        existing_duty_type = existing_duty_type_result.scalars().first()
         
         if existing_duty_type:
             # Если наряд уже существует в этом подразделении, используем его
@@ -188,28 +240,8 @@ async def create_duty_type_for_department(duty_type: DutyTypeCreateForDepartment
             await db.commit()
             await db.refresh(db_duty_type)
     
-    # Проверяем, не назначен ли уже этот тип наряда сотрудникам подразделения
-    employee_ids = [emp.id for emp in employees]
-    existing_assignments_result = await db.execute(
-        select(EmployeeDutyType).where(
-            EmployeeDutyType.duty_type_id == db_duty_type.id,
-            EmployeeDutyType.employee_id.in_(employee_ids)
-        )
-    )
-    existing_assignments = existing_assignments_result.scalars().all()
-    
-    # Создаем множество ID сотрудников, которым уже назначен этот тип наряда
-    assigned_employee_ids = {assignment.employee_id for assignment in existing_assignments}
-    
-    # Назначаем тип наряда только тем сотрудникам, которым он еще не назначен
-    for employee in employees:
-        if employee.id not in assigned_employee_ids:
-            employee_duty_type = EmployeeDutyType(
-                employee_id=employee.id,
-                duty_type_id=db_duty_type.id,
-                is_active=True
-            )
-            db.add(employee_duty_type)
+    # Назначаем тип наряда одним INSERT ... SELECT: активные назначения пропускаются, неактивные включаются
+    await assign_duty_type(db, db_duty_type.id, duty_type.department_id)
     
     await db.commit()
     return db_duty_type
@@ -240,17 +272,8 @@ async def delete_duty_type(duty_type_id: int, db: AsyncSession = Depends(get_db)
     if not duty_type:
         raise HTTPException(status_code=404, detail="Тип наряда не найден")
     
-    # Проверяем, не используется ли тип наряда
-    emp_duty_result = await db.execute(
-        select(EmployeeDutyType).where(EmployeeDutyType.duty_type_id == duty_type_id)
-    )
-    emp_duty_types = emp_duty_result.scalars().all()
-    
-    if emp_duty_types:
-        # Удаляем все связи с сотрудниками
-        for emp_duty_type in emp_duty_types:
-            await db.delete(emp_duty_type)
-        await db.commit()
+    # Удаляем все связи с сотрудниками одним оператором
+    await unassign_duty_type(db, duty_type_id)
     
     # Удаляем сам тип наряда
     await db.delete(duty_type)
@@ -258,8 +281,16 @@ async def delete_duty_type(duty_type_id: int, db: AsyncSession = Depends(get_db)
     return {"message": "Тип наряда удален"} 
 
 @router.delete("/{duty_type_id}/department/{department_id}")
-async def remove_duty_type_from_department(duty_type_id: int, department_id: int, db: AsyncSession = Depends(get_db)):
-    """Удалить тип наряда только из конкретного подразделения"""
+async def remove_duty_type_from_department(
+    duty_type_id: int,
+    department_id: int,
+    deactivate: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Удалить тип наряда только из конкретного подразделения (вместе с дочерними).
+
+    При deactivate=true назначения не удаляются, а помечаются неактивными.
+    """
     # Проверяем существование типа наряда
     result = await db.execute(select(DutyType).where(DutyType.id == duty_type_id))
     duty_type = result.scalar_one_or_none()
@@ -267,86 +298,28 @@ async def remove_duty_type_from_department(duty_type_id: int, department_id: int
     if not duty_type:
         raise HTTPException(status_code=404, detail="Тип наряда не найден")
     
-    # Получаем всех сотрудников подразделения
-    employees_result = await db.execute(
-        select(Employee).where(Employee.department_id == department_id)
-    )
-    employees = employees_result.scalars().all()
-    
-    if not employees:
-        raise HTTPException(status_code=404, detail="Подразделение не найдено или в нем нет сотрудников")
-    
-    # Получаем ID сотрудников подразделения
-    employee_ids = [emp.id for emp in employees]
-    
-    # Удаляем связи типа наряда только с сотрудниками этого подразделения
-    emp_duty_result = await db.execute(
-        select(EmployeeDutyType).where(
-            EmployeeDutyType.duty_type_id == duty_type_id,
-            EmployeeDutyType.employee_id.in_(employee_ids)
-        )
-    )
-    emp_duty_types = emp_duty_result.scalars().all()
+    removed_count = await unassign_duty_type(db, duty_type_id, department_id, deactivate=deactivate)
+    if not removed_count:
+        raise HTTPException(status_code=404, detail="Тип наряда не назначен сотрудникам этого подразделения")
     
-    if emp_duty_types:
-        for emp_duty_type in emp_duty_types:
-            await db.delete(emp_duty_type)
-        await db.commit()
-        return {"message": f"Тип наряда '{duty_type.name}' удален из подразделения"}
-    else:
-        raise HTTPException(status_code=404, detail="Тип наряда не назначен сотрудникам этого подразделения") 
+    await db.commit()
+    return {"message": f"Тип наряда '{duty_type.name}' удален из подразделения", "removed_count": removed_count}
 
-@router.get("/all-with-departments", response_model=List[DutyTypeWithDepartmentResponse])
-async def get_all_duty_types_with_departments(db: AsyncSession = Depends(get_db)):
-    """Получить все типы нарядов с информацией о подразделениях"""
-    # Получаем все типы нарядов с информацией о подразделениях
-    result = await db.execute(
-        select(
-            DutyType.id,
-            DutyType.name,
-            DutyType.description,
-            DutyType.duty_category,
-            DutyType.people_per_day,
-            DutyType.days_duration,
-            Employee.department_id
-        )
-        .join(EmployeeDutyType, DutyType.id == EmployeeDutyType.duty_type_id)
-        .join(Employee, EmployeeDutyType.employee_id == Employee.id)
-        .where(EmployeeDutyType.is_active == True)
-        .distinct()
-    )
-    
-    duty_types_with_dept = result.all()
-    
-    # Получаем названия подразделений
-    department_ids = list(set([row.department_id for row in duty_types_with_dept]))
-    departments_result = await db.execute(
-        select(Employee.id, Employee.department_id, Employee.department_id.label('dept_id'))
-        .where(Employee.department_id.in_(department_ids))
-    )
+@router.post("/{duty_type_id}/department/{department_id}")
+async def assign_duty_type_to_department(duty_type_id: int, department_id: int, db: AsyncSession = Depends(get_db)):
+    """Назначить существующий тип наряда всем сотрудникам подразделения или структуры"""
+    result = await db.execute(select(DutyType).where(DutyType.id == duty_type_id))
+    duty_type = result.scalar_one_or_none()
     
-    # Создаем словарь для маппинга department_id -> department_name
-    from models.models import Department
-    dept_result = await db.execute(
-        select(Department.id, Department.name)
-        .where(Department.id.in_(department_ids))
-    )
-    dept_mapping = {dept.id: dept.name for dept in dept_result.all()}
+    if not duty_type:
+        raise HTTPException(status_code=404, detail="Тип наряда не найден")
     
-    # Формируем результат
-    response = []
-    for row in duty_types_with_dept:
-        dept_name = dept_mapping.get(row.department_id, "Неизвестное подразделение")
-        response.append({
-            "id": row.id,
-            "name": row.name,
-            "description": row.description,
-            "duty_category": row.duty_category,
-            "people_per_day": row.people_per_day,
-            "department_name": dept_name
-        })
+    if not await count_subtree_employees(db, department_id):
+        raise HTTPException(status_code=404, detail="Подразделение не найдено или в нем нет сотрудников")
     
-    return response
+    assigned_count = await assign_duty_type(db, duty_type_id, department_id)
+    await db.commit()
+    return {"message": f"Тип наряда '{duty_type.name}' назначен подразделению", "assigned_count": assigned_count}
 
 @router.get("/structure/{structure_id}/all-with-departments", response_model=List[DutyTypeWithDepartmentResponse])
 async def get_duty_types_by_structure_with_departments(structure_id: int, db: AsyncSession = Depends(get_db)):
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
+from sqlalchemy import select, insert, delete, update
+from typing import Dict, List, Optional, Set, Tuple
 from database import get_db
+from services.periods import date_in_period, month_period
 from models.models import EmployeeDutyPreference, Employee
 from datetime import datetime, date
 from pydantic import BaseModel
@@ -14,6 +15,23 @@ class DutyPreferenceCreate(BaseModel):
     preference_type: str
     notes: Optional[str] = None
 
+class DutyPreferenceOperation(BaseModel):
+    employee_id: int
+    date: date
+    preference_type: str
+    action: str = "set"  # set или delete
+    notes: Optional[str] = None
+
+class DutyPreferenceCalendar(BaseModel):
+    employee_id: int
+    preference_type: str
+    # Битовая карта месяца: символ на каждый день, '1' - предпочтение установлено
+    bitmap: str
+
+class DutyPreferenceBatch(BaseModel):
+    operations: List[DutyPreferenceOperation] = []
+    calendars: List[DutyPreferenceCalendar] = []
+
 class DutyPreferenceResponse(BaseModel):
     id: int
     employee_id: int
@@ -56,18 +74,10 @@ async def get_employee_duty_preferences(
     if not employee:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
     
-    # Получаем первый и последний день месяца
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - date.resolution
-    else:
-        last_day = date(year, month + 1, 1) - date.resolution
-    
     # Строим запрос
     query = select(EmployeeDutyPreference).where(
         EmployeeDutyPreference.employee_id == employee_id,
-        EmployeeDutyPreference.date >= first_day,
-        EmployeeDutyPreference.date <= last_day
+        date_in_period(EmployeeDutyPreference.date, month_period(year, month))
     )
     
     # Если указан тип предпочтения, добавляем фильтр
@@ -165,19 +175,11 @@ async def delete_all_employee_duty_preferences_for_month(
     if not employee:
         raise HTTPException(status_code=404, detail="Сотрудник не найден")
     
-    # Получаем первый и последний день месяца
-    first_day = date(year, month, 1)
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - date.resolution
-    else:
-        last_day = date(year, month + 1, 1) - date.resolution
-    
     # Находим все предпочтения за месяц
     result = await db.execute(
         select(EmployeeDutyPreference).where(
             EmployeeDutyPreference.employee_id == employee_id,
-            EmployeeDutyPreference.date >= first_day,
-            EmployeeDutyPreference.date <= last_day
+            date_in_period(EmployeeDutyPreference.date, month_period(year, month))
         )
     )
     preferences = result.scalars().all()
@@ -190,6 +192,127 @@ async def delete_all_employee_duty_preferences_for_month(
     
     return {"message": f"Удалено {len(preferences)} предпочтений за {month}/{year}"}
 
+@router.put("/duty-preferences/batch")
+async def batch_update_duty_preferences(
+    batch: DutyPreferenceBatch,
+    year: int = Query(..., description="Год"),
+    month: int = Query(..., description="Месяц"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Пакетное изменение предпочтений за месяц.
+
+    operations - точечные установки и удаления, calendars - полное состояние месяца
+    для пары сотрудник/тип. Изменения сравниваются с текущими записями одним запросом
+    и применяются одним DELETE, одним INSERT и обновлением заметок у существующих записей
+    (set с notes). Возвращается итоговое состояние месяца.
+    """
+    try:
+        period = month_period(year, month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    days = list(period.days())
+    
+    # Желаемое состояние: (сотрудник, дата, тип) -> заметка, и ключи к удалению
+    to_set: Dict[Tuple[int, date, str], Optional[str]] = {}
+    # Заметки, явно переданные в операциях set (календари заметок не меняют)
+    new_notes: Dict[Tuple[int, date, str], str] = {}
+    to_unset: Set[Tuple[int, date, str]] = set()
+    replaced: Set[Tuple[int, str]] = set()
+    
+    for calendar in batch.calendars:
+        if calendar.preference_type not in ['preferred', 'unavailable']:
+            raise HTTPException(status_code=400, detail="Неверный тип предпочтения")
+        if len(calendar.bitmap) != len(days) or set(calendar.bitmap) - {"0", "1"}:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Битовая карта должна состоять из {len(days)} символов 0 или 1"
+            )
+        replaced.add((calendar.employee_id, calendar.preference_type))
+        for day, flag in zip(days, calendar.bitmap):
+            if flag == "1":
+                to_set[(calendar.employee_id, day, calendar.preference_type)] = None
+    
+    for operation in batch.operations:
+        if operation.preference_type not in ['preferred', 'unavailable']:
+            raise HTTPException(status_code=400, detail="Неверный тип предпочтения")
+        if operation.action not in ['set', 'delete']:
+            raise HTTPException(status_code=400, detail="Неверное действие. Допустимые значения: set, delete")
+        if not period.contains(operation.date):
+            raise HTTPException(status_code=400, detail=f"Дата {operation.date} не входит в {month}/{year}")
+        key = (operation.employee_id, operation.date, operation.preference_type)
+        if operation.action == "set":
+            to_set[key] = operation.notes
+            to_unset.discard(key)
+            if operation.notes is not None:
+                new_notes[key] = operation.notes
+        else:
+            to_set.pop(key, None)
+            new_notes.pop(key, None)
+            to_unset.add(key)
+    
+    employee_ids = {key[0] for key in to_set} | {key[0] for key in to_unset} | {key[0] for key in replaced}
+    if not employee_ids:
+        raise HTTPException(status_code=400, detail="Нет изменений")
+    
+    result = await db.execute(select(Employee.id).where(Employee.id.in_(employee_ids)))
+    missing = sorted(employee_ids - set(result.scalars().all()))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Сотрудники не найдены: {', '.join(map(str, missing))}")
+    
+    # Текущее состояние месяца для всех затронутых сотрудников одним запросом
+    result = await db.execute(
+        select(EmployeeDutyPreference.id, EmployeeDutyPreference.employee_id,
+               EmployeeDutyPreference.date, EmployeeDutyPreference.preference_type, EmployeeDutyPreference.notes)
+        .where(EmployeeDutyPreference.employee_id.in_(employee_ids))
+        .where(date_in_period(EmployeeDutyPreference.date, period))
+    )
+    existing = {}
+    delete_ids = []
+    note_updates = []
+    for preference_id, employee_id, preference_date, preference_type, current_notes in result.all():
+        key = (employee_id, preference_date, preference_type)
+        if key in existing:
+            # Дубликаты, оставшиеся от прежних версий, схлопываются
+            delete_ids.append(preference_id)
+            continue
+        existing[key] = preference_id
+        if key in to_unset or ((employee_id, preference_type) in replaced and key not in to_set):
+            delete_ids.append(preference_id)
+        elif key in new_notes and new_notes[key] != current_notes:
+            note_updates.append({"id": preference_id, "notes": new_notes[key]})
+    
+    inserts = [
+        {"employee_id": employee_id, "date": preference_date, "preference_type": preference_type, "notes": notes}
+        for (employee_id, preference_date, preference_type), notes in to_set.items()
+        if (employee_id, preference_date, preference_type) not in existing
+    ]
+    
+    if delete_ids:
+        await db.execute(delete(EmployeeDutyPreference).where(EmployeeDutyPreference.id.in_(delete_ids)))
+    if inserts:
+        await db.execute(insert(EmployeeDutyPreference), inserts)
+    if note_updates:
+        await db.execute(update(EmployeeDutyPreference), note_updates)
+    await db.commit()
+    
+    result = await db.execute(
+        select(EmployeeDutyPreference)
+        .where(EmployeeDutyPreference.employee_id.in_(employee_ids))
+        .where(date_in_period(EmployeeDutyPreference.date, period))
+        .order_by(EmployeeDutyPreference.employee_id, EmployeeDutyPreference.date)
+    )
+    preferences: Dict[int, list] = {employee_id: [] for employee_id in sorted(employee_ids)}
+    for preference in result.scalars().all():
+        preferences[preference.employee_id].append(DutyPreferenceResponse.from_orm(preference))
+    
+    return {
+        "message": "Предпочтения обновлены",
+        "created_count": len(inserts),
+        "deleted_count": len(delete_ids),
+        "updated_count": len(note_updates),
+        "preferences": preferences
+    }
+
 @router.put("/duty-preferences/{preference_id}", response_model=DutyPreferenceResponse)
 async def update_employee_duty_preference(
     preference_id: int,
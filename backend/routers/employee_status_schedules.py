@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, insert, and_, or_
 from typing import List, Optional
 from database import get_db
+from services.periods import date_range_period, month_period, range_overlaps_period
+from services.status_sync import sync_employee_statuses
 from models.models import Employee, EmployeeStatusSchedule
 from pydantic import BaseModel
 from datetime import datetime, date, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -15,6 +20,16 @@ class StatusScheduleCreate(BaseModel):
     end_date: date
     notes: Optional[str] = None
 
+class BulkStatusScheduleCreate(BaseModel):
+    employee_ids: List[int] = []
+    group_id: Optional[int] = None
+    department_id: Optional[int] = None
+    status: str
+    start_date: date
+    end_date: date
+    notes: Optional[str] = None
+    skip_conflicts: bool = False
+
 class StatusScheduleResponse(BaseModel):
     id: int
     employee_id: int
@@ -47,17 +62,8 @@ async def get_employee_status_schedules(
     
     # Если указаны год и месяц, фильтруем по ним
     if year and month:
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - date.resolution
-        else:
-            end_date = date(year, month + 1, 1) - date.resolution
-        
         query = query.where(
-            and_(
-                EmployeeStatusSchedule.start_date <= end_date,
-                EmployeeStatusSchedule.end_date >= start_date
-            )
+            range_overlaps_period(EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date, month_period(year, month))
         )
     
     query = query.order_by(EmployeeStatusSchedule.start_date)
@@ -427,22 +433,12 @@ async def delete_employee_status_schedules_for_month(
         if not employee:
             raise HTTPException(status_code=404, detail="Сотрудник не найден")
         
-        # Вычисляем начальную и конечную даты месяца
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(year, month + 1, 1) - timedelta(days=1)
-        
         # Находим все статусы, которые пересекаются с указанным месяцем
         schedules_result = await db.execute(
             select(EmployeeStatusSchedule).where(
                 and_(
                     EmployeeStatusSchedule.employee_id == employee_id,
-                    and_(
-                        EmployeeStatusSchedule.start_date <= end_date,
-                        EmployeeStatusSchedule.end_date >= start_date
-                    )
+                    range_overlaps_period(EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date, month_period(year, month))
                 )
             )
         )
@@ -478,4 +474,87 @@ async def delete_employee_status_schedules_for_month(
     except Exception as e:
         await db.rollback()
         logger.error(f"Ошибка при удалении статусов за месяц: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Ошибка при удалении статусов: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Ошибка при удалении статусов: {str(e)}") 
+
+@router.post("/employees/status-schedules/bulk")
+async def create_bulk_status_schedules(
+    schedule_data: BulkStatusScheduleCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """Установить один статус на период сразу нескольким сотрудникам.
+
+    Сотрудники задаются списком ID и/или группой или подразделением (только активные).
+    Пересечения проверяются одним запросом, расписания вставляются одним оператором,
+    после чего статусы синхронизируются одним UPDATE.
+    """
+    valid_statuses = ['Б', 'К', 'О']  # Болен, Командировка, Отпуск
+    if schedule_data.status not in valid_statuses:
+        raise HTTPException(status_code=400, detail=f"Неверный статус. Допустимые значения: {', '.join(valid_statuses)}")
+    
+    try:
+        period = date_range_period(schedule_data.start_date, schedule_data.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    scopes = []
+    if schedule_data.employee_ids:
+        scopes.append(Employee.id.in_(schedule_data.employee_ids))
+    if schedule_data.group_id is not None:
+        scopes.append(and_(Employee.group_id == schedule_data.group_id, Employee.is_active == True))
+    if schedule_data.department_id is not None:
+        scopes.append(and_(Employee.department_id == schedule_data.department_id, Employee.is_active == True))
+    if not scopes:
+        raise HTTPException(status_code=400, detail="Не указаны сотрудники, группа или подразделение")
+    
+    result = await db.execute(select(Employee.id).where(or_(*scopes)).order_by(Employee.id))
+    employee_ids = list(result.scalars().all())
+    
+    missing = sorted(set(schedule_data.employee_ids) - set(employee_ids))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Сотрудники не найдены: {', '.join(map(str, missing))}")
+    if not employee_ids:
+        raise HTTPException(status_code=404, detail="Сотрудники не найдены")
+    
+    # Пересечения с существующими расписаниями для всех сотрудников сразу
+    conflicts_result = await db.execute(
+        select(EmployeeStatusSchedule.employee_id)
+        .where(EmployeeStatusSchedule.employee_id.in_(employee_ids))
+        .where(range_overlaps_period(EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date, period))
+        .distinct()
+    )
+    conflicts = sorted(conflicts_result.scalars().all())
+    if conflicts and not schedule_data.skip_conflicts:
+        raise HTTPException(
+            status_code=400,
+            detail=f"На указанный период уже установлен статус у сотрудников: {', '.join(map(str, conflicts))}"
+        )
+    
+    conflict_set = set(conflicts)
+    target_ids = [employee_id for employee_id in employee_ids if employee_id not in conflict_set]
+    created_ids = []
+    if target_ids:
+        result = await db.execute(
+            insert(EmployeeStatusSchedule).returning(EmployeeStatusSchedule.id, sort_by_parameter_order=True),
+            [
+                {
+                    "employee_id": employee_id,
+                    "status": schedule_data.status,
+                    "start_date": schedule_data.start_date,
+                    "end_date": schedule_data.end_date,
+                    "notes": schedule_data.notes
+                }
+                for employee_id in target_ids
+            ]
+        )
+        created_ids = list(result.scalars().all())
+        await sync_employee_statuses(db, target_ids)
+    
+    await db.commit()
+    
+    return {
+        "message": f"Статус установлен {len(created_ids)} сотрудникам",
+        "created_count": len(created_ids),
+        "schedule_ids": created_ids,
+        "employee_ids": target_ids,
+        "skipped_employee_ids": conflicts
+    }
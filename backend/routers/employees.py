@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from database import get_db
 from models.models import Employee, Department, DutyType, EmployeeDutyType, Group, EmployeeStatusDetails
+from services.employee_import import ImportLookups, insert_employees, iter_csv_rows, iter_xlsx_rows, validate_row
+from services.single_flight import single_flight
+from services.fast_json import FastJSONResponse, json_response
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 
 router = APIRouter()
 
@@ -48,7 +52,7 @@ async def get_employees(db: AsyncSession = Depends(get_db)):
     employees = result.scalars().all()
     return employees
 
-@router.get("/with-status")
+@router.get("/with-status", response_class=FastJSONResponse)
 async def get_all_employees_with_status(db: AsyncSession = Depends(get_db)):
     """Получить всех сотрудников со статусами для строевой записки"""
     result = await db.execute(
@@ -97,7 +101,7 @@ async def get_all_employees_with_status(db: AsyncSession = Depends(get_db)):
         
         employees_with_status.append(employee_data)
     
-    return employees_with_status
+    return json_response(employees_with_status)
 
 @router.get("/department/{department_id}")
 async def get_employees_by_department(department_id: int, db: AsyncSession = Depends(get_db)):
@@ -185,6 +189,7 @@ async def get_employees_by_department_with_status(department_id: int, db: AsyncS
     return employees_with_status
 
 @router.get("/structure/{structure_id}/with-status")
+@single_flight()
 async def get_employees_by_structure_with_status(structure_id: int, db: AsyncSession = Depends(get_db)):
     """Получить всех сотрудников структуры с их статусами"""
     # Получаем все подразделения структуры
@@ -307,6 +312,57 @@ async def create_employee(employee: EmployeeCreate, db: AsyncSession = Depends(g
     await db.refresh(db_employee)
     return db_employee
 
+@router.post("/import")
+async def import_employees(
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Только проверить файл, ничего не сохраняя"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Массовый импорт сотрудников из CSV или XLSX.
+
+    Столбцы: Фамилия, Имя, Отчество, Должность, Звание, Подразделение, Группа, Статус,
+    Типы нарядов (через ; или ,). Подразделение с неуникальным названием указывается
+    путем через / (Родитель / Подразделение). Строки с ошибками пропускаются и попадают в отчет.
+    """
+    filename = (file.filename or "").lower()
+    if filename.endswith(".xlsx"):
+        iter_rows = iter_xlsx_rows
+    elif filename.endswith(".csv"):
+        iter_rows = iter_csv_rows
+    else:
+        raise HTTPException(status_code=400, detail="Поддерживаются только файлы CSV и XLSX")
+    
+    # Разбор файла выполняется в потоке, чтобы не блокировать цикл событий
+    try:
+        records = await asyncio.to_thread(lambda: list(iter_rows(file.file)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Не удалось прочитать файл")
+    
+    lookups = await ImportLookups.load(db)
+    employees = []
+    errors = []
+    for line, record in records:
+        values, duty_type_ids, row_errors = validate_row(record, lookups)
+        if row_errors:
+            errors.append({"row": line, "errors": row_errors})
+        else:
+            employees.append((values, duty_type_ids))
+    
+    created = 0
+    if employees and not dry_run:
+        created = len(await insert_employees(db, employees))
+        await db.commit()
+    
+    return {
+        "message": "Проверка файла завершена" if dry_run else "Импорт завершен",
+        "total_rows": len(records),
+        "valid_rows": len(employees),
+        "created": created,
+        "errors": errors
+    }
+
 @router.get("/{employee_id}", response_model=EmployeeResponse)
 async def get_employee(employee_id: int, db: AsyncSession = Depends(get_db)):
     """Получить сотрудника по ID"""
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Запуск сервера API с параметрами профиля (settings.py).
+
+Production:
+    ENVIRONMENT=production python run.py
+    - один процесс uvicorn без --reload, без access-лога и SQL в логе, pool_pre_ping
+      и пул на DB_POOL_SIZE соединений.
+    - WORKERS (WEB_CONCURRENCY) больше 1 допустим только после переноса в общее хранилище
+      состояния, которое сейчас живет в памяти процесса:
+        * счетчики /metrics (services/metrics.py) - каждый процесс отдает только свои;
+        * буфер медленных запросов (services/slow_queries.py) - /api/admin/slow-queries
+          показывает запросы одного процесса (файл журнала общий);
+        * автосинхронизация (routers/auto_sync.py) запускается в каждом процессе.
+      Пул создается в каждом процессе: общее число соединений с базой -
+      WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW), оно должно укладываться в max_connections.
+    - схема базы не создается при старте процессов: перед запуском выполните
+      python migrate.py (миграции Alembic и проверка версии), процессы только сверяют версию.
+      Проверки: /health/live - процесс жив, /health/ready - база доступна и схема актуальна.
+
+Development:
+    python run.py
+    - один процесс с перезагрузкой при изменении кода, таблицы создаются по моделям (DB_CREATE_ALL).
+"""
+import logging
+
+import uvicorn
+
+from settings import settings
+
+if __name__ == "__main__":
+    if settings.workers > 1 and not settings.reload:
+        logging.basicConfig(level=settings.log_level)
+        logging.getLogger(__name__).warning(
+            "WORKERS=%s: /metrics и буфер медленных запросов "
+            "хранятся в памяти каждого процесса, автосинхронизация запускается в каждом (см. run.py)",
+            settings.workers,
+        )
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        # uvicorn не поддерживает reload вместе с несколькими процессами
+        workers=1 if settings.reload else settings.workers,
+        reload=settings.reload,
+        log_level=settings.log_level.lower(),
+        access_log=settings.access_log,
+        proxy_headers=True,
+    )
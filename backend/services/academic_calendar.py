@@ -0,0 +1,95 @@
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from dateutil.rrule import rrulestr
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import DepartmentDutyDay, DepartmentDutyRule
+from services.periods import Period, date_in_period
+
+
+@lru_cache(maxsize=256)
+def parse_rrule(rule: str, start_date: date):
+    """Разобрать правило RRULE с DTSTART = start_date (ValueError при ошибке)"""
+    return rrulestr(rule, dtstart=datetime.combine(start_date, time()))
+
+
+def expand_rule(
+    rule: str,
+    start_date: date,
+    period: Period,
+    end_date: Optional[date] = None,
+    exdates: Iterable[str] = ()
+) -> Iterator[date]:
+    """Даты повторения правила внутри периода (с учетом end_date и исключений)"""
+    last_day = min(period.last_day, end_date) if end_date else period.last_day
+    first_day = max(period.start, start_date)
+    if first_day > last_day:
+        return
+    excluded = {date.fromisoformat(value) for value in exdates or ()}
+    for occurrence in parse_rrule(rule, start_date).between(
+        datetime.combine(first_day, time()), datetime.combine(last_day, time()), inc=True
+    ):
+        day = occurrence.date()
+        if day not in excluded:
+            yield day
+
+
+def expand_duty_rule(rule: DepartmentDutyRule, period: Period) -> Iterator[date]:
+    return expand_rule(rule.rrule, rule.start_date, period, rule.end_date, rule.exdates or ())
+
+
+class AcademicCalendar:
+    """Календарь академических нарядов за период: (тип наряда, дата) -> подразделения.
+
+    Объединяет отдельные дни (DepartmentDutyDay) и правила повторения, развернутые
+    только в пределах периода.
+    """
+
+    def __init__(self, period: Period):
+        self.period = period
+        self._days: Dict[Tuple[int, date], Set[int]] = {}
+
+    def add(self, duty_type_id: int, duty_date: date, department_id: int):
+        if self.period.contains(duty_date):
+            self._days.setdefault((duty_type_id, duty_date), set()).add(department_id)
+
+    def departments_on(self, duty_type_id: int, duty_date: date) -> List[int]:
+        """Подразделения, дежурящие в этот день по типу наряда (по возрастанию ID)"""
+        return sorted(self._days.get((duty_type_id, duty_date), ()))
+
+    def to_dict(self) -> Dict[Tuple[int, date], List[int]]:
+        """Календарь в виде обычного словаря (для передачи в другой процесс)"""
+        return {key: sorted(departments) for key, departments in self._days.items()}
+
+    def __len__(self) -> int:
+        return sum(len(departments) for departments in self._days.values())
+
+
+async def load_academic_calendar(
+    db: AsyncSession,
+    period: Period,
+    department_ids: Optional[List[int]] = None
+) -> AcademicCalendar:
+    """Загрузить календарь за период двумя запросами (дни и правила)"""
+    calendar = AcademicCalendar(period)
+
+    days_query = select(
+        DepartmentDutyDay.duty_type_id, DepartmentDutyDay.duty_date, DepartmentDutyDay.department_id
+    ).where(date_in_period(DepartmentDutyDay.duty_date, period))
+    rules_query = select(DepartmentDutyRule).where(
+        DepartmentDutyRule.start_date < period.end,
+        (DepartmentDutyRule.end_date == None) | (DepartmentDutyRule.end_date >= period.start)
+    )
+    if department_ids is not None:
+        days_query = days_query.where(DepartmentDutyDay.department_id.in_(department_ids))
+        rules_query = rules_query.where(DepartmentDutyRule.department_id.in_(department_ids))
+
+    for duty_type_id, duty_date, department_id in (await db.execute(days_query)).all():
+        calendar.add(duty_type_id, duty_date, department_id)
+    for rule in (await db.execute(rules_query)).scalars().all():
+        for duty_date in expand_duty_rule(rule, period):
+            calendar.add(rule.duty_type_id, duty_date, rule.department_id)
+    return calendar
@@ -0,0 +1,88 @@
+"""Компактный (словарный) формат списков нарядов.
+
+В обычном формате каждая строка наряда повторяет ФИО, подразделение и тип наряда.
+В компактном справочники передаются один раз, а наряды - столбцами идентификаторов
+и смещений дней от start_date:
+
+    {
+      "format": "compact",
+      "start_date": "2025-02-01",
+      "employees":   {"id": [...], "name": [...], "department_id": [...], "duty_count": [...]},
+      "departments": {"id": [...], "name": [...]},
+      "duty_types":  {"id": [...], "name": [...], "people_per_day": [...], "days_duration": [...]},
+      "duties":      {"id": [...], "day": [...], "employee_id": [...], "duty_type_id": [...]}
+    }
+
+Столбцы таблицы имеют одинаковую длину: i-я строка - значения i-х элементов. Дата
+наряда - start_date плюс day дней. В нарядах из /generate (еще без записей в базе)
+столбца id нет. expand_duties() восстанавливает строки со всеми полями.
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Sequence
+
+EMPLOYEE_COLUMNS = ("id", "name", "department_id", "duty_count")
+DEPARTMENT_COLUMNS = ("id", "name")
+DUTY_TYPE_COLUMNS = ("id", "name", "people_per_day", "days_duration")
+
+
+def columns(rows: Iterable[Sequence[Any]], names: Sequence[str]) -> Dict[str, list]:
+    """Строки (кортежи) -> столбцы"""
+    values = list(zip(*rows))
+    if not values:
+        return {name: [] for name in names}
+    return {name: list(column) for name, column in zip(names, values)}
+
+
+def compact_duties(
+    start_date: date,
+    duties: Dict[str, list],
+    employees: Dict[str, list],
+    departments: Dict[str, list],
+    duty_types: Dict[str, list],
+) -> Dict[str, Any]:
+    return {
+        "format": "compact",
+        "start_date": start_date.isoformat(),
+        "employees": employees,
+        "departments": departments,
+        "duty_types": duty_types,
+        "duties": duties,
+    }
+
+
+def day_offsets(dates: Iterable[date], start_date: date) -> List[int]:
+    start = start_date.toordinal()
+    return [value.toordinal() - start for value in dates]
+
+
+def _rows(table: Dict[str, list]) -> List[dict]:
+    names = list(table)
+    return [dict(zip(names, values)) for values in zip(*table.values())]
+
+
+def expand_duties(compact: Dict[str, Any]) -> List[dict]:
+    """Строки нарядов со всеми полями справочников (для клиентов и проверок)"""
+    start_date = date.fromisoformat(compact["start_date"])
+    employees = {row["id"]: row for row in _rows(compact["employees"])}
+    departments = {row["id"]: row for row in _rows(compact["departments"])}
+    duty_types = {row["id"]: row for row in _rows(compact["duty_types"])}
+    result = []
+    for duty in _rows(compact["duties"]):
+        employee = employees[duty["employee_id"]]
+        duty_type = duty_types[duty["duty_type_id"]]
+        row = {
+            "date": (start_date + timedelta(days=duty["day"])).isoformat(),
+            "employee_id": employee["id"],
+            "employee_name": employee["name"],
+            "department_id": employee["department_id"],
+            "department_name": departments[employee["department_id"]]["name"],
+            "duty_type_id": duty_type["id"],
+            "duty_type_name": duty_type["name"],
+            "people_per_day": duty_type["people_per_day"],
+            "days_duration": duty_type["days_duration"],
+            "duty_count": employee["duty_count"],
+        }
+        if "id" in duty:
+            row["id"] = duty["id"]
+        result.append(row)
+    return result
@@ -0,0 +1,291 @@
+"""Сжатие HTTP-ответов с выбором алгоритма по Accept-Encoding.
+
+Поддерживаются gzip (zlib, всегда), br (пакет brotli) и zstd (пакет zstandard) - если
+установлены. Из алгоритмов, принимаемых клиентом, выбирается первый по порядку
+COMPRESSION_ALGORITHMS. Сжимаются только текстовые типы (JSON, CSV, NDJSON, text/*) от
+COMPRESSION_MINIMUM_SIZE байт; xlsx, zip и parquet уже сжаты и передаются как есть.
+
+Потоковые ответы (экспорт CSV/NDJSON, большие JSON-массивы) сжимаются по частям: начало
+тела накапливается до порога, дальше каждая часть проходит через потоковый компрессор.
+Большие тела и части сжимаются в пуле потоков (zlib, brotli и zstd отпускают GIL).
+
+Метрики: compression_bytes_in_total / compression_bytes_out_total (степень сжатия),
+compression_cpu_seconds_total и compression_skipped_total.
+"""
+import asyncio
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from services.metrics import (
+    compression_bytes_in_total,
+    compression_bytes_out_total,
+    compression_cpu_seconds_total,
+    compression_responses_total,
+    compression_skipped_total,
+)
+from settings import settings
+
+try:
+    import brotli
+except ImportError:  # br недоступен
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd недоступен
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/problem+json",
+)
+# Тело от этого размера сжимается целиком в пуле потоков, а не в цикле событий
+THREAD_MIN_BYTES = 256 * 1024
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=settings.compression_brotli_quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=settings.compression_zstd_level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+ENCODERS = {"gzip": _Gzip}
+if brotli is not None:
+    ENCODERS["br"] = _Brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _Zstd
+
+
+def available_encodings(preference: str = None) -> List[str]:
+    """Доступные алгоритмы в порядке предпочтения сервера"""
+    names = [name.strip() for name in (preference or settings.compression_algorithms).split(",")]
+    return [name for name in names if name in ENCODERS]
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding -> {алгоритм: q}"""
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def negotiate(header: str, encodings: List[str]) -> Optional[str]:
+    """Первый алгоритм сервера, принимаемый клиентом (q > 0); None - без сжатия"""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    for name in encodings:
+        if accepted.get(name, wildcard) > 0:
+            return name
+    return None
+
+
+def _is_compressible(content_type: str) -> bool:
+    return content_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+class _Counted:
+    """Компрессор с учетом байтов и процессорного времени"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self._encoder = ENCODERS[encoding]()
+
+    def compress(self, data: bytes, finish: bool = False) -> bytes:
+        started = time.thread_time()
+        output = self._encoder.compress(data)
+        if finish:
+            output += self._encoder.finish()
+        self.cpu_seconds += time.thread_time() - started
+        self.bytes_in += len(data)
+        self.bytes_out += len(output)
+        return output
+
+    def record(self):
+        compression_responses_total.inc(encoding=self.encoding)
+        compression_bytes_in_total.inc(self.bytes_in, encoding=self.encoding)
+        compression_bytes_out_total.inc(self.bytes_out, encoding=self.encoding)
+        compression_cpu_seconds_total.inc(self.cpu_seconds, encoding=self.encoding)
+
+
+class CompressionMiddleware:
+    """ASGI middleware: сжатие ответов по Accept-Encoding от минимального размера"""
+
+    def __init__(
+        self,
+        app,
+        enabled: bool = settings.compression_enabled,
+        minimum_size: int = settings.compression_minimum_size,
+        encodings: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings() if encodings is None else encodings
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    """send для одного ответа: решение о сжатии по заголовкам и началу тела"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[dict] = None
+        # None - решение не принято, False - без сжатия
+        self.compressor = None
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            if not self._eligible(message):
+                self.compressor = False
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or self.compressor is False:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is not None:
+            await self._send_part(body, more_body)
+            return
+
+        # Начало тела накапливается до порога
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if more_body and self.pending_size < self.minimum_size:
+            return
+        body = b"".join(self.pending)
+        self.pending = []
+        if self.pending_size < self.minimum_size:
+            compression_skipped_total.inc(reason="small")
+            self.compressor = False
+            await self.send(self.start)
+            await self.send({"type": "http.response.body", "body": body})
+            return
+
+        self.compressor = _Counted(self.encoding)
+        if more_body:
+            await self.send(self._compressed_start())
+            await self._send_part(body, more_body=True)
+            return
+        # Тело целиком: сжатие одним вызовом, известная длина
+        output = await self._compress(body, finish=True)
+        self.compressor.record()
+        await self.send(self._compressed_start(len(output)))
+        await self.send({"type": "http.response.body", "body": output})
+
+    def _eligible(self, message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        content_type = ""
+        for name, value in message.get("headers", []):
+            name = name.lower()
+            if name == b"content-encoding":
+                compression_skipped_total.inc(reason="encoded")
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1")
+        if not _is_compressible(content_type):
+            compression_skipped_total.inc(reason="type")
+            return False
+        return True
+
+    def _compressed_start(self, content_length: Optional[int] = None) -> dict:
+        """Заголовки сжатого ответа; без content-length - потоковая передача"""
+        headers: List[Tuple[bytes, bytes]] = []
+        vary = b"Accept-Encoding"
+        for name, value in self.start.get("headers", []):
+            lowered = name.lower()
+            if lowered == b"content-length":
+                continue
+            if lowered == b"vary":
+                vary = value + b", " + vary
+                continue
+            headers.append((name, value))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", vary))
+        return {**self.start, "headers": headers}
+
+    async def _compress(self, body: bytes, finish: bool) -> bytes:
+        if len(body) >= THREAD_MIN_BYTES:
+            return await asyncio.to_thread(self.compressor.compress, body, finish)
+        return self.compressor.compress(body, finish)
+
+    async def _send_part(self, body: bytes, more_body: bool):
+        output = await self._compress(body, finish=not more_body)
+        if not more_body:
+            self.compressor.record()
+        # Пустые части (компрессор накапливает данные) не отправляются, кроме последней
+        if output or not more_body:
+            await self.send({"type": "http.response.body", "body": output, "more_body": more_body})
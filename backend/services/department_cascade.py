@@ -0,0 +1,85 @@
+from typing import Dict
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import (
+    Department, DepartmentDutyDay, DepartmentDutyRule, DutyRecord, Employee, EmployeeDutyPreference, EmployeeDutyType,
+    EmployeeStatusDetails, EmployeeStatusSchedule, Group
+)
+
+
+def department_subtree_ids(department_id: int):
+    """Подзапрос с ID подразделения и всех его дочерних подразделений (рекурсивно)"""
+    subtree = (
+        select(Department.id)
+        .where(Department.id == department_id)
+        .cte("department_subtree", recursive=True)
+    )
+    subtree = subtree.union_all(
+        select(Department.id).where(Department.parent_id == subtree.c.id)
+    )
+    return select(subtree.c.id)
+
+
+def _subtree_employee_ids(subtree_ids):
+    # Одно и то же CTE должно использоваться во всем операторе, иначе имена конфликтуют
+    return select(Employee.id).where(Employee.department_id.in_(subtree_ids))
+
+
+# Зависимые от сотрудников таблицы в порядке удаления
+_EMPLOYEE_DEPENDENTS = [
+    ("duty_records", DutyRecord),
+    ("employee_duty_types", EmployeeDutyType),
+    ("employee_status_schedules", EmployeeStatusSchedule),
+    ("employee_duty_preferences", EmployeeDutyPreference),
+    ("employee_status_details", EmployeeStatusDetails),
+]
+
+
+async def count_department_subtree(db: AsyncSession, department_id: int) -> Dict[str, int]:
+    """Количество строк, которые будут удалены вместе с подразделением (один запрос)"""
+    subtree_ids = department_subtree_ids(department_id)
+    employee_ids = _subtree_employee_ids(subtree_ids)
+    counts = {
+        "departments": select(func.count()).where(Department.id.in_(subtree_ids)),
+        "groups": select(func.count()).where(Group.department_id.in_(subtree_ids)),
+        "employees": select(func.count()).where(Employee.id.in_(employee_ids)),
+        "department_duty_days": select(func.count()).where(DepartmentDutyDay.department_id.in_(subtree_ids)),
+        "department_duty_rules": select(func.count()).where(DepartmentDutyRule.department_id.in_(subtree_ids)),
+    }
+    for name, model in _EMPLOYEE_DEPENDENTS:
+        counts[name] = select(func.count()).where(model.employee_id.in_(employee_ids))
+
+    result = await db.execute(select(*[query.scalar_subquery().label(name) for name, query in counts.items()]))
+    return dict(result.one()._mapping)
+
+
+async def delete_department_subtree(db: AsyncSession, department_id: int) -> Dict[str, int]:
+    """Удалить подразделение со всем поддеревом несколькими множественными запросами.
+
+    Коммит выполняет вызывающий код.
+    """
+    subtree_ids = department_subtree_ids(department_id)
+    employee_ids = _subtree_employee_ids(subtree_ids)
+    deleted = {}
+
+    for name, model in _EMPLOYEE_DEPENDENTS:
+        result = await db.execute(
+            delete(model).where(model.employee_id.in_(employee_ids)).execution_options(synchronize_session=False)
+        )
+        deleted[name] = result.rowcount
+
+    statements = [
+        ("employees", delete(Employee).where(Employee.department_id.in_(subtree_ids))),
+        ("groups", delete(Group).where(Group.department_id.in_(subtree_ids))),
+        ("department_duty_days", delete(DepartmentDutyDay).where(DepartmentDutyDay.department_id.in_(subtree_ids))),
+        ("department_duty_rules", delete(DepartmentDutyRule).where(DepartmentDutyRule.department_id.in_(subtree_ids))),
+        # Ссылки parent_id внутри поддерева проверяются в конце оператора, поэтому порядок строк не важен
+        ("departments", delete(Department).where(Department.id.in_(subtree_ids))),
+    ]
+    for name, statement in statements:
+        result = await db.execute(statement.execution_options(synchronize_session=False))
+        deleted[name] = result.rowcount
+
+    return deleted
@@ -0,0 +1,594 @@
+import time
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import (
+    DutyRecord, DutyType, Employee, EmployeeDutyPreference, EmployeeDutyType, EmployeeStatusSchedule
+)
+from services.academic_calendar import load_academic_calendar
+from services.periods import date_in_period, date_range_period, range_overlaps_period
+from services.tracing import NOOP_SPAN, Span, span, tracing
+
+# Статусы, при которых сотрудник не может заступать в наряд
+BLOCKING_STATUSES = ("Б", "К", "О")
+
+
+class PlanningDutyType(NamedTuple):
+    id: int
+    name: str
+    duty_category: str
+    people_per_day: int
+    days_duration: int
+
+
+class PlanningEmployee(NamedTuple):
+    id: int
+    last_name: str
+    first_name: str
+    department_id: int
+    duty_count: int
+
+
+class PlanningSnapshot(NamedTuple):
+    """Все данные, нужные для распределения нарядов за период.
+
+    Состоит только из простых типов, поэтому передается в другой процесс.
+    """
+    start_date: date
+    end_date: date
+    duty_types: List[PlanningDutyType]
+    employees: Dict[int, PlanningEmployee]
+    # Тип наряда -> допущенные сотрудники
+    qualified: Dict[int, List[int]]
+    # (тип наряда, дата) -> подразделения, дежурящие по академическому календарю
+    calendar: Dict[Tuple[int, date], List[int]]
+    # Количество нарядов сотрудника за период (уже в базе)
+    period_counts: Dict[int, int]
+    # (сотрудник, тип наряда) -> дата последнего наряда этого типа
+    last_duty_by_type: Dict[Tuple[int, int], date]
+    # Сотрудник -> (дата последнего наряда любого типа, его длительность)
+    last_duty_any: Dict[int, Tuple[date, int]]
+    preferences: Dict[Tuple[int, date], str]
+    blocked: Dict[int, List[Tuple[date, date]]]
+    existing_records: Set[Tuple[int, int, date]]
+
+
+def _scope_filter(department_ids: Optional[List[int]]):
+    return Employee.department_id.in_(department_ids) if department_ids is not None else true()
+
+
+async def load_planning_snapshot(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    department_ids: Optional[List[int]] = None,
+    include_history: bool = True
+) -> PlanningSnapshot:
+    """Загрузить снимок данных для планирования фиксированным числом запросов.
+
+    department_ids ограничивает сотрудников и календарь подразделениями (None - все).
+    include_history=False пропускает чтение всей истории нарядов (последние наряды) -
+    для периодов, которые продолжают сохраненное состояние планировщика.
+    """
+    period = date_range_period(start_date, end_date)
+    scope = _scope_filter(department_ids)
+    scope_employees = select(Employee.id).where(scope)
+
+    with span("load.duty_types") as current:
+        duty_types = {
+            row.id: PlanningDutyType(row.id, row.name, row.duty_category, row.people_per_day or 1, row.days_duration or 1)
+            for row in (await db.execute(
+                select(DutyType.id, DutyType.name, DutyType.duty_category, DutyType.people_per_day, DutyType.days_duration)
+            )).all()
+        }
+        current.count("rows", len(duty_types))
+
+    employees: Dict[int, PlanningEmployee] = {}
+    qualified: Dict[int, List[int]] = {}
+    with span("load.employees") as current:
+        result = await db.execute(
+            select(
+                Employee.id, Employee.last_name, Employee.first_name, Employee.department_id, Employee.duty_count,
+                EmployeeDutyType.duty_type_id
+            )
+            .join(EmployeeDutyType, Employee.id == EmployeeDutyType.employee_id)
+            .where(Employee.is_active == True)
+            .where(EmployeeDutyType.is_active == True)
+            .where(scope)
+            .order_by(EmployeeDutyType.duty_type_id, Employee.id)
+        )
+        for row in result.all():
+            employees.setdefault(
+                row.id, PlanningEmployee(row.id, row.last_name, row.first_name, row.department_id, row.duty_count or 0)
+            )
+            qualified.setdefault(row.duty_type_id, []).append(row.id)
+        current.count("rows", len(employees))
+
+    with span("load.academic_calendar") as current:
+        calendar = await load_academic_calendar(db, period, department_ids)
+        calendar = calendar.to_dict()
+        current.count("entries", len(calendar))
+
+    with span("load.period_counts"):
+        result = await db.execute(
+            select(DutyRecord.employee_id, func.count(DutyRecord.id))
+            .where(DutyRecord.employee_id.in_(scope_employees))
+            .where(date_in_period(DutyRecord.duty_date, period))
+            .group_by(DutyRecord.employee_id)
+        )
+        period_counts = dict(result.all())
+
+    last_duty_by_type: Dict[Tuple[int, int], date] = {}
+    last_duty_any: Dict[int, Tuple[date, int]] = {}
+    if include_history:
+        with span("load.history"):
+            result = await db.execute(
+                select(DutyRecord.employee_id, DutyRecord.duty_type_id, func.max(DutyRecord.duty_date))
+                .where(DutyRecord.employee_id.in_(scope_employees))
+                .group_by(DutyRecord.employee_id, DutyRecord.duty_type_id)
+            )
+            last_duty_by_type = {(employee_id, duty_type_id): last for employee_id, duty_type_id, last in result.all()}
+
+            result = await db.execute(
+                select(DutyRecord.employee_id, DutyRecord.duty_date, DutyType.days_duration)
+                .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
+                .where(DutyRecord.employee_id.in_(scope_employees))
+                .order_by(DutyRecord.employee_id, DutyRecord.duty_date.desc())
+                .distinct(DutyRecord.employee_id)
+            )
+            last_duty_any = {employee_id: (last, duration or 1) for employee_id, last, duration in result.all()}
+
+    preferences: Dict[Tuple[int, date], str] = {}
+    with span("load.preferences") as current:
+        result = await db.execute(
+            select(EmployeeDutyPreference.employee_id, EmployeeDutyPreference.date, EmployeeDutyPreference.preference_type)
+            .where(EmployeeDutyPreference.employee_id.in_(scope_employees))
+            .where(date_in_period(EmployeeDutyPreference.date, period))
+        )
+        for employee_id, preference_date, preference_type in result.all():
+            # 'unavailable' важнее 'preferred', если на дату есть оба
+            if preferences.get((employee_id, preference_date)) != 'unavailable':
+                preferences[(employee_id, preference_date)] = preference_type
+        current.count("rows", len(preferences))
+
+    blocked: Dict[int, List[Tuple[date, date]]] = {}
+    with span("load.status_schedules") as current:
+        result = await db.execute(
+            select(EmployeeStatusSchedule.employee_id, EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date)
+            .where(EmployeeStatusSchedule.employee_id.in_(scope_employees))
+            .where(EmployeeStatusSchedule.status.in_(BLOCKING_STATUSES))
+            .where(range_overlaps_period(EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date, period))
+        )
+        for employee_id, blocked_from, blocked_to in result.all():
+            blocked.setdefault(employee_id, []).append((blocked_from, blocked_to))
+        current.count("employees", len(blocked))
+
+    with span("load.existing_records") as current:
+        result = await db.execute(
+            select(DutyRecord.employee_id, DutyRecord.duty_type_id, DutyRecord.duty_date)
+            .where(DutyRecord.employee_id.in_(scope_employees))
+            .where(date_in_period(DutyRecord.duty_date, period))
+        )
+        existing_records = set(result.all())
+        current.count("rows", len(existing_records))
+
+    return PlanningSnapshot(
+        start_date=start_date,
+        end_date=end_date,
+        duty_types=[duty_types[duty_type_id] for duty_type_id in sorted(qualified)],
+        employees=employees,
+        qualified=qualified,
+        calendar=calendar,
+        period_counts=period_counts,
+        last_duty_by_type=last_duty_by_type,
+        last_duty_any=last_duty_any,
+        preferences=preferences,
+        blocked=blocked,
+        existing_records=existing_records,
+    )
+
+
+class CarryState(NamedTuple):
+    """Состояние планировщика, переносимое из месяца в месяц и между запусками.
+
+    Содержит только то, что влияет на дальнейший выбор сотрудников.
+    """
+    planned_through: date
+    # Сотрудник -> наряды в уже спланированных месяцах горизонта
+    counts: Dict[int, int]
+    # (сотрудник, тип наряда) -> дата последнего наряда этого типа
+    last_by_type: Dict[Tuple[int, int], date]
+    # Сотрудник -> первый свободный день (с учетом незавершенных многодневных нарядов)
+    rest_until: Dict[int, date]
+    # Дни многодневных нарядов после planned_through: (сотрудник, тип наряда, дата)
+    ongoing: List[Tuple[int, int, date]]
+
+
+def initial_carry_state(snapshot: PlanningSnapshot) -> CarryState:
+    """Начальное состояние из истории нарядов снимка"""
+    return CarryState(
+        planned_through=snapshot.start_date - timedelta(days=1),
+        counts={},
+        last_by_type=dict(snapshot.last_duty_by_type),
+        rest_until={
+            employee_id: last + timedelta(days=duration)
+            for employee_id, (last, duration) in snapshot.last_duty_any.items()
+        },
+        ongoing=[],
+    )
+
+
+def carry_state_to_json(carry: CarryState) -> dict:
+    return {
+        "planned_through": carry.planned_through.isoformat(),
+        "counts": {str(employee_id): count for employee_id, count in carry.counts.items()},
+        "last_by_type": [
+            [employee_id, duty_type_id, last.isoformat()]
+            for (employee_id, duty_type_id), last in carry.last_by_type.items()
+        ],
+        "rest_until": {str(employee_id): value.isoformat() for employee_id, value in carry.rest_until.items()},
+        "ongoing": [
+            [employee_id, duty_type_id, duty_date.isoformat()] for employee_id, duty_type_id, duty_date in carry.ongoing
+        ],
+    }
+
+
+def carry_state_from_json(data: dict) -> CarryState:
+    return CarryState(
+        planned_through=date.fromisoformat(data["planned_through"]),
+        counts={int(employee_id): count for employee_id, count in data["counts"].items()},
+        last_by_type={
+            (employee_id, duty_type_id): date.fromisoformat(last)
+            for employee_id, duty_type_id, last in data["last_by_type"]
+        },
+        rest_until={int(employee_id): date.fromisoformat(value) for employee_id, value in data["rest_until"].items()},
+        ongoing=[
+            (employee_id, duty_type_id, date.fromisoformat(duty_date)) for employee_id, duty_type_id, duty_date in data["ongoing"]
+        ],
+    )
+
+
+class PlannerState:
+    """Назначения, сделанные во время планирования периода, и перенесенное состояние"""
+
+    def __init__(self, carry: CarryState, existing_records: Set[Tuple[int, int, date]] = frozenset()):
+        # Сотрудник -> дата -> типы нарядов, которыми он занят
+        self.busy: Dict[int, Dict[date, Set[int]]] = {}
+        # Наряды, назначенные в текущем периоде
+        self.counts: Dict[int, int] = {}
+        self.carried_counts = carry.counts
+        self.last_by_type: Dict[Tuple[int, int], date] = dict(carry.last_by_type)
+        self.rest_until: Dict[int, date] = dict(carry.rest_until)
+        # Дни, в которые у сотрудника уже есть наряд в базе
+        self.reserved: Dict[int, Set[date]] = {}
+        for employee_id, _, duty_date in existing_records:
+            self.reserved.setdefault(employee_id, set()).add(duty_date)
+        # Дни нарядов, выходящие за конец периода
+        self.ongoing: List[Tuple[int, int, date]] = []
+        # Продолжение нарядов прошлого периода (если они еще не сохранены в базе)
+        for employee_id, duty_type_id, duty_date in carry.ongoing:
+            if (employee_id, duty_type_id, duty_date) not in existing_records:
+                self.occupy(employee_id, duty_date, duty_type_id)
+
+    def _touch(self, employee_id: int, duty_date: date, duty_type_id: int):
+        key = (employee_id, duty_type_id)
+        if key not in self.last_by_type or self.last_by_type[key] < duty_date:
+            self.last_by_type[key] = duty_date
+
+    def occupy(self, employee_id: int, duty_date: date, duty_type_id: int):
+        days = self.busy.setdefault(employee_id, {})
+        types = days.setdefault(duty_date, set())
+        if duty_type_id not in types:
+            types.add(duty_type_id)
+            self.counts[employee_id] = self.counts.get(employee_id, 0) + 1
+        self._touch(employee_id, duty_date, duty_type_id)
+
+    def extend(self, employee_id: int, duty_date: date, duty_type_id: int):
+        """День наряда за концом периода: учитывается в следующем периоде"""
+        self.ongoing.append((employee_id, duty_type_id, duty_date))
+        self._touch(employee_id, duty_date, duty_type_id)
+
+    def start_duty(self, employee_id: int, duty_date: date, days_duration: int):
+        """Сотрудник свободен только после окончания наряда"""
+        free_from = duty_date + timedelta(days=days_duration)
+        if self.rest_until.get(employee_id, date.min) < free_from:
+            self.rest_until[employee_id] = free_from
+
+    def is_busy(self, employee_id: int, duty_date: date, duty_type_id: int) -> bool:
+        return duty_type_id in self.busy.get(employee_id, {}).get(duty_date, ())
+
+    def is_free(self, employee_id: int, duty_date: date, days_duration: int) -> bool:
+        """Сотрудник отдохнул и не имеет нарядов в базе на дни нового наряда"""
+        if duty_date < self.rest_until.get(employee_id, date.min):
+            return False
+        reserved = self.reserved.get(employee_id)
+        return not reserved or not any(
+            duty_date + timedelta(days=day_offset) in reserved for day_offset in range(days_duration)
+        )
+
+    def carry(self, snapshot: PlanningSnapshot) -> CarryState:
+        """Состояние на конец периода снимка для планирования следующего"""
+        counts = dict(self.carried_counts)
+        for employee_id in set(snapshot.period_counts) | set(self.counts):
+            counts[employee_id] = (
+                counts.get(employee_id, 0)
+                + snapshot.period_counts.get(employee_id, 0)
+                + self.counts.get(employee_id, 0)
+            )
+        next_day = snapshot.end_date + timedelta(days=1)
+        return CarryState(
+            planned_through=snapshot.end_date,
+            counts=counts,
+            last_by_type=dict(self.last_by_type),
+            # Уже закончившийся отдых больше ни на что не влияет
+            rest_until={employee_id: value for employee_id, value in self.rest_until.items() if value > next_day},
+            ongoing=list(self.ongoing),
+        )
+
+
+class Candidates(NamedTuple):
+    """Сотрудники, которые могут заступить в наряд, и данные для выбора между ними"""
+    available: List[int]
+    duty_counts: Dict[int, int]
+    last_by_type: Dict[int, date]
+    preferred: Set[int]
+
+
+def eligible_candidates(
+    snapshot: PlanningSnapshot,
+    state: PlannerState,
+    employee_ids: List[int],
+    duty_date: date,
+    duty_type_id: int,
+    days_duration: int = 1
+) -> Candidates:
+    """Отбирает сотрудников, свободных для наряда (статусы, предпочтения, занятость, отдых)"""
+    duty_counts = {}
+    last_by_type = {}
+    available = []
+    preferred = set()
+
+    for employee_id in employee_ids:
+        employee = snapshot.employees[employee_id]
+
+        # Проверяем статусы сотрудника (Болен, Командировка, Отпуск)
+        if any(start <= duty_date <= end for start, end in snapshot.blocked.get(employee_id, ())):
+            continue
+
+        # Проверяем предпочтения сотрудника
+        preference = snapshot.preferences.get((employee_id, duty_date))
+        if preference == 'unavailable':
+            continue
+
+        # Проверяем, не занят ли сотрудник в этот тип наряда в эту дату
+        if state.is_busy(employee_id, duty_date, duty_type_id):
+            continue
+
+        # Проверяем интервал после последнего наряда с учетом его длительности
+        if not state.is_free(employee_id, duty_date, days_duration):
+            continue
+
+        # Общее количество нарядов = прошлые месяцы горизонта + наряды в периоде (база и память) + duty_count
+        duty_counts[employee_id] = (
+            state.carried_counts.get(employee_id, 0)
+            + snapshot.period_counts.get(employee_id, 0)
+            + state.counts.get(employee_id, 0)
+            + employee.duty_count
+        )
+        last_by_type[employee_id] = state.last_by_type.get((employee_id, duty_type_id), date.min)
+
+        if preference == 'preferred':
+            preferred.add(employee_id)
+        available.append(employee_id)
+
+    return Candidates(available, duty_counts, last_by_type, preferred)
+
+
+def pick_employees(candidates: Candidates, people_needed: int) -> List[int]:
+    """Выбирает из свободных сотрудников тех, у кого меньше всего нарядов"""
+    available, duty_counts, last_by_type, preferred = candidates
+    if not available:
+        return []
+
+    # Сначала предпочтительные, затем по общему количеству нарядов
+    available.sort(key=lambda employee_id: employee_id not in preferred)
+    available.sort(key=lambda employee_id: duty_counts[employee_id])
+
+    def tie_break(employee_id: int):
+        # Сначала предпочтительные, потом по дате последнего наряда этого типа
+        return (employee_id not in preferred, last_by_type[employee_id])
+
+    # Берем сотрудников группами с одинаковым количеством нарядов, начиная с наименьшего
+    selected: List[int] = []
+    for index, count in enumerate(sorted({duty_counts[employee_id] for employee_id in available})):
+        if len(selected) >= people_needed:
+            break
+        candidates = [employee_id for employee_id in available if duty_counts[employee_id] == count]
+        if index > 0 or len(candidates) > people_needed:
+            candidates.sort(key=tie_break)
+        selected.extend(candidates[:people_needed - len(selected)])
+    return selected
+
+
+def select_employees_for_duty(
+    snapshot: PlanningSnapshot,
+    state: PlannerState,
+    employee_ids: List[int],
+    duty_date: date,
+    people_needed: int,
+    duty_type_id: int,
+    days_duration: int = 1
+) -> List[int]:
+    """Выбирает сотрудников для наряда с учетом количества нарядов за период и ограничения интервалов между нарядами"""
+    return pick_employees(
+        eligible_candidates(snapshot, state, employee_ids, duty_date, duty_type_id, days_duration), people_needed
+    )
+
+
+def _plan_period(snapshot: PlanningSnapshot, state: PlannerState, spill: bool) -> List[dict]:
+    """Распределить наряды периода снимка, продолжая состояние state.
+
+    spill=True переносит дни многодневного наряда за концом периода в следующий период
+    (state.ongoing), иначе они отбрасываются.
+    """
+    # Допущенные сотрудники академических нарядов по подразделениям (порядок сохраняется)
+    department_pools: Dict[Tuple[int, int], List[int]] = {}
+    with span("plan.department_pools"):
+        for duty_type in snapshot.duty_types:
+            if duty_type.duty_category == "academic":
+                for employee_id in snapshot.qualified[duty_type.id]:
+                    key = (duty_type.id, snapshot.employees[employee_id].department_id)
+                    department_pools.setdefault(key, []).append(employee_id)
+
+    duties = []
+    current_date = snapshot.start_date
+    while current_date <= snapshot.end_date:
+        with span("plan.day", date=current_date.isoformat()) as day:
+            _plan_day(snapshot, state, spill, department_pools, current_date, duties, day)
+        current_date += timedelta(days=1)
+    return duties
+
+
+def _plan_day(
+    snapshot: PlanningSnapshot,
+    state: PlannerState,
+    spill: bool,
+    department_pools: Dict[Tuple[int, int], List[int]],
+    current_date: date,
+    duties: List[dict],
+    day: Span
+):
+    """Распределить наряды одного дня по всем типам нарядов"""
+    # Отбор и выбор вызываются тысячи раз: вместо интервалов их время копится в счетчиках дня
+    traced = day is not NOOP_SPAN
+    for duty_type in snapshot.duty_types:
+        if duty_type.duty_category == "academic":
+            # Для каждого подразделения из календаря выбираем его сотрудников
+            groups = [
+                department_pools.get((duty_type.id, department_id), [])
+                for department_id in snapshot.calendar.get((duty_type.id, current_date), ())
+            ]
+        else:
+            groups = [snapshot.qualified[duty_type.id]]
+
+        for employee_ids in groups:
+            if not employee_ids:
+                continue
+            if traced:
+                started = time.perf_counter()
+                candidates = eligible_candidates(
+                    snapshot, state, employee_ids, current_date, duty_type.id, duty_type.days_duration
+                )
+                eligible = time.perf_counter()
+                selected = pick_employees(candidates, duty_type.people_per_day)
+                day.add_time("eligibility", eligible - started)
+                day.add_time("selection", time.perf_counter() - eligible)
+                day.count("candidates", len(employee_ids))
+                day.count("eligible", len(candidates.available))
+                day.count("slots", duty_type.people_per_day)
+                day.count("filled", len(selected))
+            else:
+                selected = select_employees_for_duty(
+                    snapshot, state, employee_ids, current_date,
+                    duty_type.people_per_day, duty_type.id, duty_type.days_duration
+                )
+            for employee_id in selected:
+                employee = snapshot.employees[employee_id]
+                # Блокируем сотрудника на все дни длительности наряда
+                for day_offset in range(duty_type.days_duration):
+                    duty_day = current_date + timedelta(days=day_offset)
+                    if duty_day > snapshot.end_date:
+                        if not spill:
+                            break
+                        state.extend(employee_id, duty_day, duty_type.id)
+                    else:
+                        state.occupy(employee_id, duty_day, duty_type.id)
+                state.start_duty(employee_id, current_date, duty_type.days_duration)
+                duties.append({
+                    'date': current_date.isoformat(),
+                    'employee_id': employee_id,
+                    'employee_name': f"{employee.last_name} {employee.first_name}",
+                    'duty_type_id': duty_type.id,
+                    'duty_type_name': duty_type.name,
+                    'people_per_day': duty_type.people_per_day,
+                    'days_duration': duty_type.days_duration,
+                    'duty_count': employee.duty_count
+                })
+
+
+def plan_snapshot(snapshot: PlanningSnapshot) -> List[dict]:
+    """Распределить наряды по снимку данных (без обращений к базе).
+
+    Наряды назначаются по дням, в каждом дне - по типам нарядов. Академические наряды
+    назначаются только подразделениям из календаря. Возвращает наряды по первым дням
+    в том же формате, что и ответ /generate.
+    """
+    state = PlannerState(initial_carry_state(snapshot), snapshot.existing_records)
+    return _plan_period(snapshot, state, spill=False)
+
+
+def plan_snapshot_traced(snapshot: PlanningSnapshot) -> Tuple[List[dict], dict]:
+    """plan_snapshot с трассировкой (для пула процессов): наряды и интервалы трассы"""
+    with tracing("planner", process_name="planner") as tracer:
+        with span("plan_snapshot", employees=len(snapshot.employees), duty_types=len(snapshot.duty_types)) as current:
+            duties = plan_snapshot(snapshot)
+            current.count("duties", len(duties))
+    return duties, tracer.export()
+
+
+def plan_horizon(
+    snapshots: List[PlanningSnapshot],
+    carry: Optional[CarryState] = None
+) -> Tuple[List[List[dict]], CarryState]:
+    """Распределить наряды на несколько идущих подряд периодов за один проход.
+
+    Состояние (счетчики, последние наряды по типам, незавершенные многодневные наряды)
+    переносится из периода в период. Без carry начальное состояние берется из истории
+    первого снимка. Возвращает наряды по периодам и состояние на конец горизонта.
+    """
+    carry = carry or initial_carry_state(snapshots[0])
+    plans = []
+    for snapshot in snapshots:
+        state = PlannerState(carry, snapshot.existing_records)
+        plans.append(_plan_period(snapshot, state, spill=True))
+        carry = state.carry(snapshot)
+    return plans, carry
+
+
+def _duty_records(duties: List[dict], seen: Set[Tuple[int, int, date]], through: Optional[date]) -> List[dict]:
+    records = []
+    for duty in duties:
+        start = date.fromisoformat(duty['date'])
+        for day_offset in range(duty['days_duration']):
+            duty_day = start + timedelta(days=day_offset)
+            if through is not None and duty_day > through:
+                break
+            key = (duty['employee_id'], duty['duty_type_id'], duty_day)
+            if key not in seen:
+                seen.add(key)
+                records.append({"employee_id": key[0], "duty_type_id": key[1], "duty_date": duty_day})
+    return records
+
+
+def plan_records(snapshot: PlanningSnapshot, duties: List[dict]) -> List[dict]:
+    """Строки duty_records для плана: все дни длительности в пределах периода, без уже существующих"""
+    return _duty_records(duties, set(snapshot.existing_records), snapshot.end_date)
+
+
+def plan_horizon_records(snapshots: List[PlanningSnapshot], plans: List[List[dict]]) -> List[dict]:
+    """Строки duty_records для горизонта: многодневные наряды сохраняются полностью"""
+    seen = set().union(*(snapshot.existing_records for snapshot in snapshots))
+    records = []
+    for plan in plans:
+        records.extend(_duty_records(plan, seen, None))
+    return records
+
+
+async def write_plan_records(db: AsyncSession, records: List[dict]) -> int:
+    """Сохранить записи нарядов одним многострочным INSERT. Коммит выполняет вызывающий код."""
+    if records:
+        await db.execute(insert(DutyRecord), records)
+    return len(records)
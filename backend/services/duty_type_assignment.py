@@ -0,0 +1,64 @@
+from typing import Optional
+
+from sqlalchemy import delete, func, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, EmployeeDutyType
+from services.department_cascade import department_subtree_ids
+
+
+def _subtree_employees(department_id: int):
+    return select(Employee.id).where(Employee.department_id.in_(department_subtree_ids(department_id)))
+
+
+async def count_subtree_employees(db: AsyncSession, department_id: int) -> int:
+    """Количество сотрудников подразделения вместе с дочерними подразделениями"""
+    result = await db.execute(select(func.count()).select_from(_subtree_employees(department_id).subquery()))
+    return result.scalar_one()
+
+
+async def assign_duty_type(db: AsyncSession, duty_type_id: int, department_id: int) -> int:
+    """Назначить тип наряда всем сотрудникам поддерева подразделения одним INSERT ... SELECT.
+
+    Активные назначения не изменяются, неактивные (снятые с deactivate=True) снова
+    включаются (ON CONFLICT DO UPDATE ... WHERE NOT is_active). Возвращает число новых и
+    включенных назначений. Коммит выполняет вызывающий код.
+    """
+    statement = (
+        insert(EmployeeDutyType)
+        .from_select(
+            ["employee_id", "duty_type_id", "is_active"],
+            select(Employee.id, literal(duty_type_id), true())
+            .where(Employee.department_id.in_(department_subtree_ids(department_id)))
+        )
+        .on_conflict_do_update(
+            constraint="uq_employee_duty_types_employee_id_duty_type_id",
+            set_={"is_active": True},
+            where=EmployeeDutyType.is_active.is_(False)
+        )
+    )
+    result = await db.execute(statement)
+    return result.rowcount
+
+
+async def unassign_duty_type(
+    db: AsyncSession,
+    duty_type_id: int,
+    department_id: Optional[int] = None,
+    deactivate: bool = False
+) -> int:
+    """Снять тип наряда с сотрудников поддерева подразделения (или со всех) одним оператором.
+
+    При deactivate=True назначения не удаляются, а помечаются неактивными.
+    Коммит выполняет вызывающий код.
+    """
+    condition = EmployeeDutyType.duty_type_id == duty_type_id
+    if department_id is not None:
+        condition = condition & EmployeeDutyType.employee_id.in_(_subtree_employees(department_id))
+    if deactivate:
+        statement = update(EmployeeDutyType).where(condition, EmployeeDutyType.is_active == True).values(is_active=False)
+    else:
+        statement = delete(EmployeeDutyType).where(condition)
+    result = await db.execute(statement.execution_options(synchronize_session=False))
+    return result.rowcount
@@ -0,0 +1,231 @@
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+import csv
+import io
+import re
+
+from openpyxl import load_workbook
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Department, DutyType, Employee, EmployeeDutyType, Group
+
+# Звания (совпадают с frontend/src/constants/ranks.ts)
+MILITARY_RANKS = (
+    'Гражданский персонал',
+    'Рядовой',
+    'Ефрейтор',
+    'Младший сержант',
+    'Сержант',
+    'Старший сержант',
+    'Старшина',
+    'Прапорщик',
+    'Старший прапорщик',
+    'Лейтенант',
+    'Старший лейтенант',
+    'Капитан',
+    'Майор',
+    'Подполковник',
+    'Полковник',
+    'Генерал-майор',
+    'Генерал-лейтенант',
+    'Генерал-Полковник',
+)
+
+EMPLOYEE_STATUSES = ("НЛ", "Б", "К", "НВ", "НГ", "О")
+
+# Заголовки столбцов файла (русские и английские) -> поле
+COLUMN_ALIASES = {
+    "фамилия": "last_name", "last_name": "last_name",
+    "имя": "first_name", "first_name": "first_name",
+    "отчество": "middle_name", "middle_name": "middle_name",
+    "должность": "position", "position": "position",
+    "звание": "rank", "rank": "rank",
+    "подразделение": "department", "department": "department",
+    "группа": "group", "group": "group",
+    "статус": "status", "status": "status",
+    "типы нарядов": "duty_types", "duty_types": "duty_types",
+}
+
+REQUIRED_COLUMNS = ("last_name", "first_name", "position", "department")
+
+_RANKS_BY_KEY = {rank.lower(): rank for rank in MILITARY_RANKS}
+
+
+def _key(value) -> str:
+    return re.sub(r"\s+", " ", str(value)).strip().lower() if value is not None else ""
+
+
+def _department_key(value) -> str:
+    # Путь "Родитель / Подразделение" сравнивается по частям
+    return " / ".join(_key(part) for part in str(value).split("/"))
+
+
+def _department_keys(departments: List[Tuple[int, str, Optional[int]]]) -> Dict[str, List[int]]:
+    """Название и полный путь подразделения -> ID (названий с одним ключом может быть несколько)
+
+    departments - строки (id, name, parent_id).
+    """
+    by_id = {id: (name, parent_id) for id, name, parent_id in departments}
+    keys: Dict[str, List[int]] = {}
+    for id, (name, parent_id) in by_id.items():
+        path = [_department_key(name)]
+        seen = {id}
+        while parent_id in by_id and parent_id not in seen:
+            seen.add(parent_id)
+            parent_name, parent_id = by_id[parent_id]
+            path.append(_department_key(parent_name))
+        for key in {path[0], " / ".join(reversed(path))}:
+            keys.setdefault(key, []).append(id)
+    return keys
+
+
+def _cell(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _map_header(header) -> List[Optional[str]]:
+    columns = [COLUMN_ALIASES.get(_key(name)) for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"В файле нет обязательных столбцов: {', '.join(missing)}")
+    return columns
+
+
+def _rows_with_header(rows: Iterator[tuple]) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Файл пуст")
+    columns = _map_header(header)
+    for line, values in enumerate(rows, start=2):
+        record = {name: _cell(value) for name, value in zip(columns, values) if name}
+        if any(record.values()):
+            yield line, record
+
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """Строки CSV (разделитель ; или ,) как словари полей с номером строки файла"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    sample = text.read(4096)
+    text.seek(0)
+    dialect = csv.Sniffer().sniff(sample, delimiters=";,\t") if sample else csv.excel
+    return _rows_with_header(iter(csv.reader(text, dialect)))
+
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """Строки первого листа XLSX в режиме read_only (без загрузки книги целиком)"""
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from _rows_with_header(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+class ImportLookups:
+    """Справочники для сопоставления названий с ID, загружаются одним набором запросов"""
+
+    def __init__(self, departments: Dict[str, List[int]], groups: Dict[Tuple[int, str], int], duty_types: Dict[str, int]):
+        self.departments = departments
+        self.groups = groups
+        self.duty_types = duty_types
+
+    @classmethod
+    async def load(cls, db: AsyncSession) -> "ImportLookups":
+        departments = _department_keys(
+            (await db.execute(select(Department.id, Department.name, Department.parent_id))).all()
+        )
+        groups = {
+            (department_id, _key(name)): id
+            for id, department_id, name in (await db.execute(select(Group.id, Group.department_id, Group.name))).all()
+        }
+        duty_types = {_key(name): id for id, name in (await db.execute(select(DutyType.id, DutyType.name))).all()}
+        return cls(departments, groups, duty_types)
+
+
+def validate_row(record: Dict[str, Optional[str]], lookups: ImportLookups) -> Tuple[Optional[dict], List[int], List[str]]:
+    """Проверить строку файла: (поля сотрудника, ID типов нарядов, ошибки)"""
+    errors = []
+    for name in REQUIRED_COLUMNS:
+        if not record.get(name):
+            errors.append(f"Не заполнено поле {name}")
+
+    department_id = None
+    if record.get("department"):
+        department_ids = lookups.departments.get(_department_key(record["department"]), [])
+        if len(department_ids) == 1:
+            department_id = department_ids[0]
+        elif department_ids:
+            errors.append(
+                f"Неоднозначное подразделение: {record['department']} ({len(department_ids)} с таким названием), "
+                f"укажите путь через /, например: Родитель / {record['department']}"
+            )
+        else:
+            errors.append(f"Подразделение не найдено: {record['department']}")
+
+    group_id = None
+    if record.get("group") and department_id is not None:
+        group_id = lookups.groups.get((department_id, _key(record["group"])))
+        if group_id is None:
+            errors.append(f"Группа не найдена в подразделении: {record['group']}")
+
+    rank = None
+    if record.get("rank"):
+        rank = _RANKS_BY_KEY.get(_key(record["rank"]))
+        if rank is None:
+            errors.append(f"Неизвестное звание: {record['rank']}")
+
+    status = (record.get("status") or "НЛ").upper()
+    if status not in EMPLOYEE_STATUSES:
+        errors.append(f"Неизвестный статус: {record['status']}")
+
+    duty_type_ids = []
+    for name in re.split(r"[;,]", record.get("duty_types") or ""):
+        if not name.strip():
+            continue
+        duty_type_id = lookups.duty_types.get(_key(name))
+        if duty_type_id is None:
+            errors.append(f"Тип наряда не найден: {name.strip()}")
+        elif duty_type_id not in duty_type_ids:
+            duty_type_ids.append(duty_type_id)
+
+    if errors:
+        return None, [], errors
+
+    values = {
+        "first_name": record["first_name"],
+        "last_name": record["last_name"],
+        "middle_name": record.get("middle_name"),
+        "position": record["position"],
+        "rank": rank,
+        "department_id": department_id,
+        "group_id": group_id,
+        "status": status,
+        "is_active": True,
+        "duty_count": 0,
+    }
+    return values, duty_type_ids, []
+
+
+async def insert_employees(db: AsyncSession, employees: List[Tuple[dict, List[int]]]) -> List[int]:
+    """Вставить сотрудников и их типы нарядов многострочными INSERT.
+
+    ID возвращаются в порядке входного списка. Коммит выполняет вызывающий код.
+    """
+    if not employees:
+        return []
+    result = await db.execute(
+        insert(Employee).returning(Employee.id, sort_by_parameter_order=True),
+        [values for values, _ in employees]
+    )
+    employee_ids = list(result.scalars().all())
+
+    assignments = [
+        {"employee_id": employee_id, "duty_type_id": duty_type_id, "is_active": True}
+        for employee_id, (_, duty_type_ids) in zip(employee_ids, employees)
+        for duty_type_id in duty_type_ids
+    ]
+    if assignments:
+        await db.execute(insert(EmployeeDutyType), assignments)
+    return employee_ids
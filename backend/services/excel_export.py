@@ -0,0 +1,129 @@
+from datetime import date
+from typing import Iterable, List, NamedTuple, Tuple
+import io
+
+import openpyxl
+
+from services.excel_styles import ExcelStyleRegistry
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class DutyExportRow(NamedTuple):
+    """Строка экспорта нарядов (только примитивы, чтобы строки можно было передавать между процессами)"""
+    duty_date: date
+    employee_id: int
+    employee_name: str
+    department_id: int
+    department_name: str
+    duty_type_id: int
+    duty_type_name: str
+
+
+def _save(wb) -> bytes:
+    stream = io.BytesIO()
+    wb.save(stream)
+    return stream.getvalue()
+
+
+def render_month_workbook(rows: Iterable[DutyExportRow], year: int, month: int) -> bytes:
+    """Книга со всеми нарядами за месяц: дата, ФИО, подразделение, тип наряда"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = f"Наряды {month:02d}.{year}"
+    ws.append(["Дата", "ФИО", "Подразделение", "Тип наряда"])
+    empty = True
+    for row in rows:
+        empty = False
+        ws.append([
+            row.duty_date.strftime("%d-%m-%Y"),
+            row.employee_name,
+            row.department_name,
+            row.duty_type_name
+        ])
+    if empty:
+        ws.append(["Нет данных", "", "", ""])
+    return _save(wb)
+
+
+def render_department_workbook(
+    rows: List[DutyExportRow],
+    department_id: int,
+    year: int,
+    month: int,
+    format: str = "employees"
+) -> Tuple[str, bytes]:
+    """Книга нарядов подразделения. Возвращает (имя файла, содержимое xlsx)"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+
+    if format == "duty_types":
+        # Формат: даты в строках, типы нарядов в колонках
+        ws.title = f"Подразделение {department_id} - по датам и типам"
+        styles = ExcelStyleRegistry(wb)
+
+        # Собираем уникальные даты и типы нарядов
+        dates = sorted({row.duty_date for row in rows})
+        duty_types = []
+        duty_type_set = set()
+        for row in rows:
+            if row.duty_type_id not in duty_type_set:
+                duty_types.append((row.duty_type_id, row.duty_type_name))
+                duty_type_set.add(row.duty_type_id)
+
+        # Строим мапу: (date, duty_type_id) -> список сотрудников
+        duty_map = {}
+        for row in rows:
+            duty_map.setdefault((row.duty_date, row.duty_type_id), []).append(row.employee_name)
+
+        # Стиль каждого типа наряда вычисляется один раз на экспорт
+        column_styles = [styles.duty_style(duty_type_id, duty_type_name) for duty_type_id, duty_type_name in duty_types]
+
+        # Заголовки
+        ws.append(["Дата"] + [duty_type_name for _, duty_type_name in duty_types])
+        styles.apply_header(ws)
+
+        # Данные по датам
+        for row_idx, duty_date in enumerate(dates, start=2):
+            values = [duty_date.strftime("%d-%m")]
+            filled_columns = []
+            for col_idx, (duty_type_id, _) in enumerate(duty_types, start=2):
+                employees = duty_map.get((duty_date, duty_type_id))
+                if employees:
+                    values.append(", ".join(employees))
+                    filled_columns.append(col_idx)
+                else:
+                    values.append("—")
+            ws.append(values)
+
+            # Цвет применяем только к ячейкам, где есть сотрудники
+            for col_idx in filled_columns:
+                ws.cell(row=row_idx, column=col_idx).style = column_styles[col_idx - 2]
+
+        filename = f"department_{department_id}_duty_types_{year}_{month:02d}.xlsx"
+    else:
+        # Формат по умолчанию: сотрудники в строках, даты в колонках
+        ws.title = f"Подразделение {department_id}"
+
+        # Собираем уникальные даты и сотрудников
+        dates = sorted({row.duty_date for row in rows})
+        employees = []
+        emp_set = set()
+        for row in rows:
+            if row.employee_id not in emp_set:
+                employees.append((row.employee_id, row.employee_name))
+                emp_set.add(row.employee_id)
+
+        # Строим мапу: (employee_id, date) -> тип наряда
+        duty_map = {(row.employee_id, row.duty_date): row.duty_type_name for row in rows}
+
+        # Первая строка — даты
+        ws.append(["Сотрудник"] + [duty_date.strftime("%d-%m") for duty_date in dates])
+
+        # Данные по сотрудникам
+        for emp_id, emp_name in employees:
+            ws.append([emp_name] + [duty_map.get((emp_id, duty_date), "") for duty_date in dates])
+
+        filename = f"department_{department_id}_duties_{year}_{month:02d}.xlsx"
+
+    return filename, _save(wb)
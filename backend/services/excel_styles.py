@@ -0,0 +1,82 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from openpyxl.styles import Border, Font, NamedStyle, PatternFill, Side
+
+# Палитры типов нарядов: ключевые слова в названии -> (цвет фона, цвет текста)
+DUTY_PALETTES = [
+    (('академический',), 'E9D5FF', '7C3AED'),  # purple
+    (('дежурный', 'дежурство'), 'DBEAFE', '1D4ED8'),  # blue
+    (('патрульный', 'патруль'), 'D1FAE5', '047857'),  # green
+    (('караульный', 'караул'), 'FEE2E2', 'DC2626'),  # red
+    (('конвойный', 'конвой'), 'FED7AA', 'EA580C'),  # orange
+    (('охранный', 'охрана'), 'FEF3C7', 'D97706'),  # yellow
+    (('инспектор',), 'E0E7FF', '3730A3'),  # indigo
+    (('комендант',), 'FCE7F3', 'BE185D'),  # pink
+]
+DEFAULT_PALETTE = ('F3F4F6', '374151')  # gray
+
+HEADER_STYLE_NAME = "naradi_header"
+HEADER_FILL_COLOR = "E5E7EB"
+
+
+@lru_cache(maxsize=1024)
+def resolve_duty_palette(duty_type_name: str) -> Tuple[str, str]:
+    """Получить (цвет фона, цвет текста) для типа наряда по его названию"""
+    name = duty_type_name.lower()
+    for keywords, bg, text in DUTY_PALETTES:
+        if any(keyword in name for keyword in keywords):
+            return bg, text
+    return DEFAULT_PALETTE
+
+
+class ExcelStyleRegistry:
+    """Реестр именованных стилей книги Excel.
+
+    Каждая палитра регистрируется в книге один раз как NamedStyle, а ячейкам
+    назначается только имя стиля, поэтому таблица стилей не растет с числом ячеек.
+    """
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self._registered = set(workbook.named_styles)
+        self._duty_styles: Dict[int, str] = {}
+
+    def _register(self, style: NamedStyle) -> str:
+        if style.name not in self._registered:
+            self.workbook.add_named_style(style)
+            self._registered.add(style.name)
+        return style.name
+
+    def header_style(self) -> str:
+        """Имя стиля заголовка таблицы"""
+        if HEADER_STYLE_NAME not in self._registered:
+            style = NamedStyle(name=HEADER_STYLE_NAME)
+            style.font = Font(bold=True)
+            style.fill = PatternFill(start_color=HEADER_FILL_COLOR, end_color=HEADER_FILL_COLOR, fill_type="solid")
+            self._register(style)
+        return HEADER_STYLE_NAME
+
+    def duty_style(self, duty_type_id: int, duty_type_name: str) -> str:
+        """Имя стиля заполненной ячейки для типа наряда (палитра вычисляется один раз на экспорт)"""
+        style_name = self._duty_styles.get(duty_type_id)
+        if style_name is not None:
+            return style_name
+
+        bg, text = resolve_duty_palette(duty_type_name)
+        style_name = f"naradi_duty_{bg}_{text}"
+        if style_name not in self._registered:
+            thin = Side(style='thin')
+            style = NamedStyle(name=style_name)
+            style.fill = PatternFill(start_color=bg, end_color=bg, fill_type="solid")
+            style.font = Font(color=text, bold=True)
+            style.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            self._register(style)
+        self._duty_styles[duty_type_id] = style_name
+        return style_name
+
+    def apply_header(self, worksheet, row: int = 1):
+        """Применить стиль заголовка ко всем ячейкам строки"""
+        style_name = self.header_style()
+        for cell in worksheet[row]:
+            cell.style = style_name
@@ -0,0 +1,56 @@
+from typing import AsyncIterator, Dict, List, Tuple
+import asyncio
+import re
+import zipfile
+
+from services.excel_export import DutyExportRow, render_department_workbook
+from services.export_writers import ChunkSink
+from services.process_pool import get_process_pool
+
+
+def partition_by_department(rows: List[DutyExportRow]) -> Dict[int, List[DutyExportRow]]:
+    """Разбить строки экспорта по подразделениям с сохранением порядка"""
+    partitions: Dict[int, List[DutyExportRow]] = {}
+    for row in rows:
+        partitions.setdefault(row.department_id, []).append(row)
+    return partitions
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("_") or "department"
+
+
+async def stream_department_bundle(
+    departments: List[Tuple[int, str]],
+    partitions: Dict[int, List[DutyExportRow]],
+    year: int,
+    month: int,
+    format: str = "employees"
+) -> AsyncIterator[bytes]:
+    """ZIP с книгами всех подразделений.
+
+    Книги рендерятся параллельно в пуле процессов, а архив отдается по мере
+    готовности книг в порядке списка подразделений.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    futures = [
+        loop.run_in_executor(
+            pool, render_department_workbook,
+            partitions.get(department_id, []), department_id, year, month, format
+        )
+        for department_id, _ in departments
+    ]
+
+    sink = ChunkSink()
+    try:
+        # xlsx уже сжат, поэтому файлы кладутся в архив без повторного сжатия
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for (department_id, department_name), future in zip(departments, futures):
+                filename, content = await future
+                archive.writestr(f"{_safe_filename(department_name)}_{filename}", content)
+                yield sink.drain()
+    finally:
+        for future in futures:
+            future.cancel()
+    yield sink.drain()
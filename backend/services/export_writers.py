@@ -0,0 +1,165 @@
+from typing import AsyncIterator, Dict, List
+import csv
+import io
+import json
+
+from services.excel_export import DutyExportRow
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Размер буфера, после заполнения которого очередной фрагмент отдается клиенту
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ExportWriter:
+    """Базовый класс потокового формата экспорта нарядов.
+
+    Писатель получает асинхронный поток строк DutyExportRow и отдает фрагменты файла
+    по мере готовности, не накапливая весь результат в памяти.
+    """
+    media_type = "application/octet-stream"
+    extension = "bin"
+
+    def is_available(self) -> bool:
+        return True
+
+    def stream(self, rows: AsyncIterator[DutyExportRow]) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+
+class CsvExportWriter(ExportWriter):
+    """CSV: заголовок с именами полей, затем по строке на запись"""
+    # Кодировку (charset=utf-8) к text/* добавляет StreamingResponse
+    media_type = "text/csv"
+    extension = "csv"
+
+    async def stream(self, rows: AsyncIterator[DutyExportRow]) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(DutyExportRow._fields)
+        async for row in rows:
+            writer.writerow((row.duty_date.isoformat(),) + tuple(row[1:]))
+            if buffer.tell() >= STREAM_CHUNK_SIZE:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class JsonLinesExportWriter(ExportWriter):
+    """JSON Lines: по одному JSON-объекту на строку"""
+    media_type = "application/x-ndjson"
+    extension = "jsonl"
+
+    async def stream(self, rows: AsyncIterator[DutyExportRow]) -> AsyncIterator[bytes]:
+        chunk: List[str] = []
+        size = 0
+        async for row in rows:
+            record = row._asdict()
+            record["duty_date"] = row.duty_date.isoformat()
+            line = json.dumps(record, ensure_ascii=False) + "\n"
+            chunk.append(line)
+            size += len(line)
+            if size >= STREAM_CHUNK_SIZE:
+                yield "".join(chunk).encode("utf-8")
+                chunk = []
+                size = 0
+        if chunk:
+            yield "".join(chunk).encode("utf-8")
+
+
+class ChunkSink(io.RawIOBase):
+    """Файлоподобный приемник, из которого можно забирать уже записанные байты.
+
+    Позиция (tell) считается от начала файла, а не буфера, чтобы смещения
+    групп строк в метаданных Parquet оставались корректными.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ParquetExportWriter(ExportWriter):
+    """Parquet: колоночный формат, запись группами строк по row_group_size"""
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, row_group_size: int = 50_000):
+        self.row_group_size = row_group_size
+
+    def is_available(self) -> bool:
+        return pq is not None
+
+    def _schema(self):
+        return pa.schema([
+            ("duty_date", pa.date32()),
+            ("employee_id", pa.int32()),
+            ("employee_name", pa.string()),
+            ("department_id", pa.int32()),
+            ("department_name", pa.string()),
+            ("duty_type_id", pa.int32()),
+            ("duty_type_name", pa.string()),
+        ])
+
+    async def stream(self, rows: AsyncIterator[DutyExportRow]) -> AsyncIterator[bytes]:
+        schema = self._schema()
+        sink = ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        columns: List[list] = [[] for _ in schema.names]
+
+        def flush_row_group():
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            writer.write_table(table, row_group_size=self.row_group_size)
+            for values in columns:
+                values.clear()
+
+        try:
+            async for row in rows:
+                for values, value in zip(columns, row):
+                    values.append(value)
+                if len(columns[0]) >= self.row_group_size:
+                    flush_row_group()
+                    yield sink.drain()
+            if columns[0]:
+                flush_row_group()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+
+EXPORT_WRITERS: Dict[str, ExportWriter] = {
+    "csv": CsvExportWriter(),
+    "jsonl": JsonLinesExportWriter(),
+    "parquet": ParquetExportWriter(),
+}
+
+
+def get_export_writer(format: str):
+    """Писатель для формата экспорта или None, если формат не потоковый"""
+    return EXPORT_WRITERS.get(format)
@@ -0,0 +1,85 @@
+"""Быстрая сериализация больших JSON-ответов.
+
+Эндпоинты, которые сами собирают ответ из доверенных данных (списки словарей из базы),
+возвращают json_response(...) вместо списка: FastAPI тогда не прогоняет результат через
+jsonable_encoder и проверку response_model, а кодирование выполняет orjson (если
+установлен, иначе стандартный json). Массивы от JSON_STREAM_MIN_ROWS элементов
+отдаются потоком частями по JSON_STREAM_CHUNK_ROWS - без одной огромной строки в памяти.
+
+FAST_JSON_RESPONSES=false возвращает стандартный путь FastAPI (для сравнения и отката).
+"""
+import json
+from typing import Any, Iterable, Iterator, Optional
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from settings import settings
+
+try:
+    import orjson
+except ImportError:  # Без orjson используется стандартный json
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON в UTF-8; даты и время - в ISO 8601"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON-ответ, кодируемый orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _chunks(rows: Iterable[Any], size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JSONArrayStreamingResponse(StreamingResponse):
+    """JSON-массив, кодируемый и отправляемый частями по chunk_rows элементов"""
+
+    def __init__(self, rows: Iterable[Any], chunk_rows: Optional[int] = None, **kwargs):
+        self.chunk_rows = chunk_rows or settings.json_stream_chunk_rows
+        super().__init__(self._encode(rows), media_type="application/json", **kwargs)
+
+    async def _encode(self, rows: Iterable[Any]):
+        # Асинхронный генератор: StreamingResponse не переключается в пул потоков на каждой части
+        yield b"["
+        for index, chunk in enumerate(_chunks(rows, self.chunk_rows)):
+            yield self._encode_chunk(chunk, index == 0)
+        yield b"]"
+
+    @staticmethod
+    def _encode_chunk(chunk: list, first: bool) -> bytes:
+        # Элементы части без внешних скобок массива
+        body = dumps(chunk)[1:-1]
+        return body if first else b"," + body
+
+
+def json_response(content: Any, status_code: int = 200):
+    """Ответ эндпоинта с доверенными данными: быстрый JSON, большие массивы - потоком.
+
+    При FAST_JSON_RESPONSES=false возвращает content без изменений (стандартный путь FastAPI).
+    """
+    if not settings.fast_json_responses:
+        return content
+    if isinstance(content, list) and len(content) >= settings.json_stream_min_rows:
+        return JSONArrayStreamingResponse(content, status_code=status_code)
+    return FastJSONResponse(content, status_code=status_code)
@@ -0,0 +1,297 @@
+"""Метрики приложения в текстовом формате Prometheus (без внешних зависимостей).
+
+Счетчики, гистограммы и показатели хранятся в памяти процесса; /metrics отдает их
+в формате text/plain version 0.0.4. Показатели пула соединений считываются в момент запроса.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# charset=utf-8 добавляется ответом Starlette для text/*
+CONTENT_TYPE = "text/plain; version=0.0.4"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        if not self.labels:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+        if not self.labels:
+            self._values[()] = 0
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_callback(self, callback: Optional[Callable[[], float]]):
+        """Значение вычисляется при каждом чтении метрик"""
+        self._callback = callback
+
+    def samples(self) -> List[str]:
+        if self._callback is not None:
+            try:
+                self._values[()] = self._callback()
+            except Exception:
+                pass
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Значения меток -> (счетчики по корзинам, сумма, количество)
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Количество HTTP-запросов", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP-запросы, обрабатываемые в данный момент"
+))
+
+# Объединение одинаковых запросов (services/single_flight.py): leader - выполнил вычисление,
+# follower - дождался чужого, grace - получил недавний ответ
+single_flight_requests_total = registry.register(Counter(
+    "single_flight_requests_total", "Запросы к эндпоинтам с объединением одинаковых запросов", ("route", "role")
+))
+
+# Сжатие ответов (services/compression.py): степень сжатия - bytes_out / bytes_in
+compression_responses_total = registry.register(Counter(
+    "compression_responses_total", "Сжатые ответы", ("encoding",)
+))
+compression_bytes_in_total = registry.register(Counter(
+    "compression_bytes_in_total", "Байты ответов до сжатия", ("encoding",)
+))
+compression_bytes_out_total = registry.register(Counter(
+    "compression_bytes_out_total", "Байты ответов после сжатия", ("encoding",)
+))
+compression_cpu_seconds_total = registry.register(Counter(
+    "compression_cpu_seconds_total", "Процессорное время сжатия", ("encoding",)
+))
+compression_skipped_total = registry.register(Counter(
+    "compression_skipped_total", "Ответы без сжатия при поддержке клиентом: small, type, encoded", ("reason",)
+))
+
+# Пул соединений с базой (значения берутся из пула при чтении метрик)
+db_pool_size = registry.register(Gauge("db_pool_size", "Размер пула соединений"))
+db_pool_checked_out = registry.register(Gauge("db_pool_checked_out", "Соединения, выданные из пула"))
+db_pool_overflow = registry.register(Gauge("db_pool_overflow", "Соединения сверх размера пула"))
+
+# Кэш (Redis)
+cache_requests_total = registry.register(Counter(
+    "cache_requests_total", "Обращения к кэшу", ("cache", "result")
+))
+
+# Автоматическая синхронизация статусов
+auto_sync_runs_total = registry.register(Counter(
+    "auto_sync_runs_total", "Запуски синхронизации статусов", ("result",)
+))
+auto_sync_duration_seconds = registry.register(Histogram(
+    "auto_sync_duration_seconds", "Время синхронизации статусов"
+))
+auto_sync_changed_rows_total = registry.register(Counter(
+    "auto_sync_changed_rows_total", "Сотрудники, обновленные синхронизацией статусов"
+))
+
+# Распределение нарядов
+duty_generation_duration_seconds = registry.register(Histogram(
+    "duty_generation_duration_seconds", "Время расчета распределения (без загрузки и записи)", ("mode",)
+))
+duty_generation_days_planned_total = registry.register(Counter(
+    "duty_generation_days_planned_total", "Спланированные дни", ("mode",)
+))
+duty_generation_slots_filled_total = registry.register(Counter(
+    "duty_generation_slots_filled_total", "Назначенные наряды", ("mode",)
+))
+
+
+def record_cache_access(cache: str, hit: bool):
+    cache_requests_total.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_generation(mode: str, seconds: float, days: int, slots_filled: int):
+    duty_generation_duration_seconds.observe(seconds, mode=mode)
+    duty_generation_days_planned_total.inc(days, mode=mode)
+    duty_generation_slots_filled_total.inc(slots_filled, mode=mode)
+
+
+def bind_pool(engine):
+    """Показатели пула соединений движка (AsyncEngine или Engine)"""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if not hasattr(pool, "checkedout"):
+        return
+    db_pool_size.set_callback(pool.size)
+    db_pool_checked_out.set_callback(pool.checkedout)
+    # overflow() отрицателен, пока пул не заполнен
+    db_pool_overflow.set_callback(lambda: max(0, pool.overflow()))
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время и количество запросов по шаблону маршрута, запросы в обработке"""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+
+    def _route_path(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._routes.get(endpoint)
+        if path is None:
+            router = scope.get("router")
+            for route in getattr(router, "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            path = self._routes[endpoint] = path or "unmatched"
+        return path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            route = self._route_path(scope)
+            http_request_duration_seconds.observe(time.perf_counter() - started, method=scope["method"], route=route)
+            http_requests_total.inc(method=scope["method"], route=route, status=status)
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+from typing import Iterator, NamedTuple, Optional
+
+from sqlalchemy import and_
+
+
+class Period(NamedTuple):
+    """Полуоткрытый период дат [start, end)"""
+    start: date
+    end: date
+
+    @property
+    def last_day(self) -> date:
+        """Последний день периода включительно"""
+        return self.end - timedelta(days=1)
+
+    def days(self) -> Iterator[date]:
+        current = self.start
+        while current < self.end:
+            yield current
+            current += timedelta(days=1)
+
+    def contains(self, value: date) -> bool:
+        return self.start <= value < self.end
+
+
+def month_period(year: int, month: int) -> Period:
+    """Период календарного месяца"""
+    if not 1 <= month <= 12:
+        raise ValueError("Месяц должен быть от 1 до 12")
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return Period(start, end)
+
+
+def year_period(year: int) -> Period:
+    """Период календарного года"""
+    return Period(date(year, 1, 1), date(year + 1, 1, 1))
+
+
+def iso_week_period(year: int, week: int) -> Period:
+    """Период недели по ISO 8601 (с понедельника по воскресенье)"""
+    start = date.fromisocalendar(year, week, 1)
+    return Period(start, start + timedelta(days=7))
+
+
+def date_range_period(start_date: date, end_date: date) -> Period:
+    """Период по датам начала и окончания включительно"""
+    if start_date > end_date:
+        raise ValueError("Дата начала не может быть позже даты окончания")
+    return Period(start_date, end_date + timedelta(days=1))
+
+
+def parse_date_range(start_date: str, end_date: str) -> Period:
+    """Период по строкам дат YYYY-MM-DD включительно"""
+    return date_range_period(date.fromisoformat(start_date), date.fromisoformat(end_date))
+
+
+def resolve_period(
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    week: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Period:
+    """Определить период по параметрам запроса: диапазон дат, ISO-неделя, месяц или год"""
+    if start_date is not None and end_date is not None:
+        return date_range_period(start_date, end_date)
+    if year is None:
+        raise ValueError("Не указан период")
+    if week is not None:
+        return iso_week_period(year, week)
+    if month is not None:
+        return month_period(year, month)
+    return year_period(year)
+
+
+def date_in_period(column, period: Period):
+    """Условие column ∈ [start, end), использующее индекс по колонке"""
+    return and_(column >= period.start, column < period.end)
+
+
+def range_overlaps_period(start_column, end_column, period: Period):
+    """Условие пересечения интервала [start_column, end_column] (включительно) с периодом"""
+    return and_(start_column < period.end, end_column >= period.start)
@@ -0,0 +1,23 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from settings import settings
+
+# Общий пул процессов для задач, нагружающих CPU (рендеринг книг, планирование нарядов)
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Общий пул процессов (создается при первом обращении)"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.process_pool_workers or None)
+    return _process_pool
+
+
+def shutdown_process_pool():
+    """Остановить пул процессов"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,169 @@
+"""Учет SQL-запросов на запрос API: количество, время в базе и подозрения на N+1.
+
+Запросы считаются через события движка SQLAlchemy (before/after_cursor_execute) и
+записываются во все активные сборщики текущего контекста (contextvars), поэтому
+параллельные запросы API не смешиваются. Middleware добавляет к ответу заголовки
+Server-Timing и X-DB-Query-Count и пишет в лог повторяющиеся одинаковые запросы.
+
+Фикстура pytest query_budget подключается через pytest_plugins = ["services.query_stats"]
+в conftest.py или ключом pytest -p services.query_stats.
+"""
+import logging
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from settings import settings
+
+# Фикстура нужна только под pytest: импорт pytest (~0.1 с) не должен замедлять запуск API
+pytest = sys.modules.get("pytest")
+
+logger = logging.getLogger(__name__)
+
+# Сколько одинаковых запросов за один запрос API считается подозрением на N+1
+N_PLUS_ONE_THRESHOLD = settings.query_stats_n_plus_one_threshold
+# Сколько худших запросов выводить в лог
+WORST_STATEMENTS = 3
+
+
+class QueryStats:
+    """Запросы, выполненные в пределах одного сборщика"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Одинаковые запросы, выполненные не меньше threshold раз (по убыванию)"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+_collectors: ContextVar[Tuple[QueryStats, ...]] = ContextVar("query_stats_collectors", default=())
+# ASGI scope текущего HTTP-запроса (маршрут дописывается в scope после сопоставления)
+_request_scope: ContextVar[Optional[dict]] = ContextVar("query_stats_request_scope", default=None)
+
+
+def current_route() -> Optional[str]:
+    """Метод и шаблон маршрута HTTP-запроса, в котором выполняется код (None вне запроса)"""
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    collectors = _collectors.get()
+    if not collectors:
+        return
+    started = getattr(context, "_query_stats_started", None)
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+    for stats in collectors:
+        stats.record(statement, elapsed)
+
+
+def install_query_stats(engine):
+    """Подключить учет запросов к движку (AsyncEngine или Engine); повторный вызов ничего не делает"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def collect_queries() -> Iterator[QueryStats]:
+    """Собрать запросы, выполненные внутри блока (включая вложенные сборщики)"""
+    stats = QueryStats()
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, allow_repeated: bool = False) -> Iterator[QueryStats]:
+    """Проверить, что блок выполняет не больше max_queries запросов и не содержит N+1"""
+    with collect_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(f"Выполнено {stats.count} SQL-запросов при бюджете {max_queries}")
+    repeated = stats.repeated()
+    if repeated and not allow_repeated:
+        statement, count = repeated[0]
+        raise QueryBudgetExceeded(f"Подозрение на N+1: запрос выполнен {count} раз: {_shorten(statement)}")
+
+
+def _shorten(statement: str, limit: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware: учет запросов к базе для каждого HTTP-запроса"""
+
+    def __init__(self, app, n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope_token = _request_scope.set(scope)
+        with collect_queries() as stats:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    # Заголовки отправляются до тела: запросы при потоковой выдаче в них не попадут
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"'.encode()))
+                    headers.append((b"x-db-query-count", str(stats.count).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                _request_scope.reset(scope_token)
+                self._report(scope, stats)
+
+    def _report(self, scope, stats: QueryStats):
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        if not repeated:
+            return
+        worst = "; ".join(f"{count}x {_shorten(statement)}" for statement, count in repeated[:WORST_STATEMENTS])
+        logger.warning(
+            "Подозрение на N+1: %s %s - %d запросов (%.1f мс), повторы: %s",
+            scope["method"], scope["path"], stats.count, stats.seconds * 1000, worst
+        )
+
+
+if pytest is not None:
+    @pytest.fixture(name="query_budget")
+    def query_budget_fixture():
+        """Фикстура: with query_budget(5): client.get(...) - не больше 5 запросов и без N+1"""
+        from database import engine
+
+        install_query_stats(engine)
+        return query_budget
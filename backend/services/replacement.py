@@ -0,0 +1,194 @@
+from datetime import timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import (
+    Department, DutyRecord, DutyType, Employee, EmployeeDutyPreference, EmployeeDutyType, EmployeeStatusSchedule
+)
+from services.duty_planner import BLOCKING_STATUSES
+from services.periods import Period, date_in_period, month_period, range_overlaps_period
+
+
+class ReplacementError(Exception):
+    """Замена невозможна (сообщение и код пригодны для ответа API)"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def load_duty_block(db: AsyncSession, record_id: int, for_update: bool = False):
+    """Запись наряда, ее тип и все записи того же наряда (дни длительности, начиная с record).
+
+    Возвращает (record, duty_type, block) или None, если записи нет.
+    """
+    query = select(DutyRecord, DutyType).join(DutyType, DutyRecord.duty_type_id == DutyType.id).where(DutyRecord.id == record_id)
+    if for_update:
+        query = query.with_for_update(of=DutyRecord)
+    row = (await db.execute(query)).first()
+    if not row:
+        return None
+    record, duty_type = row
+    window = Period(record.duty_date, record.duty_date + timedelta(days=duty_type.days_duration or 1))
+
+    block_query = (
+        select(DutyRecord)
+        .where(DutyRecord.employee_id == record.employee_id)
+        .where(DutyRecord.duty_type_id == record.duty_type_id)
+        .where(date_in_period(DutyRecord.duty_date, window))
+        .order_by(DutyRecord.duty_date)
+    )
+    if for_update:
+        block_query = block_query.with_for_update()
+    block = (await db.execute(block_query)).scalars().all()
+    return record, duty_type, block
+
+
+async def find_replacement_candidates(
+    db: AsyncSession,
+    record: DutyRecord,
+    duty_type: DutyType,
+    limit: int = 5,
+    same_department: bool = True,
+    employee_id: Optional[int] = None
+) -> List[dict]:
+    """Подходящие замены для наряда одним запросом, в порядке критериев распределения.
+
+    Условия: допуск к типу наряда, нет статуса Б/К/О и предпочтения 'unavailable' на дни
+    наряда, нет пересечения с другими нарядами с учетом их длительности (интервал отдыха).
+    Порядок как в select_employees_for_duty: меньше нарядов (за месяц наряда + duty_count),
+    затем предпочтительная дата, затем более ранний последний наряд этого типа.
+    """
+    duty_date = record.duty_date
+    window = Period(duty_date, duty_date + timedelta(days=duty_type.days_duration or 1))
+    month = month_period(duty_date.year, duty_date.month)
+
+    absent_result = await db.execute(
+        select(Employee.department_id, Department.parent_id)
+        .join(Department, Employee.department_id == Department.id)
+        .where(Employee.id == record.employee_id)
+    )
+    absent_department_id, parent_id = absent_result.one()
+    max_duration = (await db.execute(select(func.max(DutyType.days_duration)))).scalar() or 1
+
+    period_count = (
+        select(func.count(DutyRecord.id))
+        .where(DutyRecord.employee_id == Employee.id)
+        .where(date_in_period(DutyRecord.duty_date, month))
+        .correlate(Employee)
+        .scalar_subquery()
+    )
+    last_same_type = (
+        select(func.max(DutyRecord.duty_date))
+        .where(DutyRecord.employee_id == Employee.id)
+        .where(DutyRecord.duty_type_id == record.duty_type_id)
+        .where(DutyRecord.duty_date < duty_date)
+        .correlate(Employee)
+        .scalar_subquery()
+    )
+    preferred = exists().where(
+        EmployeeDutyPreference.employee_id == Employee.id,
+        EmployeeDutyPreference.date == duty_date,
+        EmployeeDutyPreference.preference_type == 'preferred'
+    )
+    unavailable = exists().where(
+        EmployeeDutyPreference.employee_id == Employee.id,
+        date_in_period(EmployeeDutyPreference.date, window),
+        EmployeeDutyPreference.preference_type == 'unavailable'
+    )
+    status_blocked = exists().where(
+        EmployeeStatusSchedule.employee_id == Employee.id,
+        EmployeeStatusSchedule.status.in_(BLOCKING_STATUSES),
+        range_overlaps_period(EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date, window)
+    )
+    # Другой наряд, который пересекается с окном с учетом своей длительности
+    other_duty = (
+        select(DutyRecord.id)
+        .join(DutyType, DutyRecord.duty_type_id == DutyType.id)
+        .where(DutyRecord.employee_id == Employee.id)
+        .where(DutyRecord.duty_date >= duty_date - timedelta(days=max_duration))
+        .where(DutyRecord.duty_date < window.end)
+        .where(DutyRecord.duty_date + func.coalesce(DutyType.days_duration, 1) > duty_date)
+        .exists()
+    )
+    total_count = (period_count + func.coalesce(Employee.duty_count, 0)).label("total_duty_count")
+
+    query = (
+        select(
+            Employee.id, Employee.last_name, Employee.first_name, Employee.department_id,
+            period_count.label("period_duty_count"), total_count,
+            last_same_type.label("last_duty_date"), preferred.label("preferred")
+        )
+        .join(EmployeeDutyType, and_(
+            EmployeeDutyType.employee_id == Employee.id,
+            EmployeeDutyType.duty_type_id == record.duty_type_id,
+            EmployeeDutyType.is_active == True
+        ))
+        .where(Employee.is_active == True)
+        .where(Employee.id != record.employee_id)
+        .where(~status_blocked, ~unavailable, ~other_duty)
+        .order_by(total_count, preferred.desc(), last_same_type.asc().nullsfirst(), Employee.id)
+        .limit(limit)
+    )
+    if employee_id is not None:
+        query = query.where(Employee.id == employee_id)
+    if same_department:
+        query = query.where(Employee.department_id == absent_department_id)
+    elif parent_id is not None:
+        # Вся структура: подразделения с тем же родителем
+        query = query.where(Employee.department_id.in_(select(Department.id).where(Department.parent_id == parent_id)))
+
+    result = await db.execute(query)
+    return [
+        {
+            "employee_id": row.id,
+            "employee_name": f"{row.last_name} {row.first_name}",
+            "department_id": row.department_id,
+            "period_duty_count": row.period_duty_count,
+            "total_duty_count": row.total_duty_count,
+            "last_duty_date": row.last_duty_date.isoformat() if row.last_duty_date else None,
+            "preferred": row.preferred
+        }
+        for row in result.all()
+    ]
+
+
+async def replace_duty_employee(db: AsyncSession, record_id: int, employee_id: int) -> dict:
+    """Атомарно передать наряд (все его дни) другому сотруднику.
+
+    Запись наряда и сотрудник-замена блокируются (SELECT ... FOR UPDATE), допустимость
+    замены проверяется повторно внутри той же транзакции. Коммит выполняет вызывающий код.
+    """
+    # Сначала блокируем сотрудника, чтобы параллельные замены на него выполнялись по очереди
+    locked = await db.execute(select(Employee.id).where(Employee.id == employee_id).with_for_update())
+    if locked.scalar_one_or_none() is None:
+        raise ReplacementError("Сотрудник не найден", 404)
+
+    loaded = await load_duty_block(db, record_id, for_update=True)
+    if loaded is None:
+        raise ReplacementError("Запись наряда не найдена", 404)
+    record, duty_type, block = loaded
+    previous_employee_id = record.employee_id
+
+    candidates = await find_replacement_candidates(
+        db, record, duty_type, limit=1, same_department=False, employee_id=employee_id
+    )
+    if not candidates:
+        raise ReplacementError("Сотрудник не может заменить в этом наряде")
+
+    block_ids = [item.id for item in block]
+    await db.execute(
+        update(DutyRecord)
+        .where(DutyRecord.id.in_(block_ids))
+        .values(employee_id=employee_id)
+        .execution_options(synchronize_session=False)
+    )
+    return {
+        "record_ids": block_ids,
+        "previous_employee_id": previous_employee_id,
+        "employee_id": employee_id,
+        "duty_type_id": record.duty_type_id,
+        "dates": [item.duty_date.isoformat() for item in block]
+    }
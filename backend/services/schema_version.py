@@ -0,0 +1,58 @@
+"""Проверка версии схемы базы по ревизиям Alembic.
+
+Ревизии читаются из файлов alembic/versions регулярным выражением, без загрузки
+скриптов Alembic: проверка выполняется в каждом процессе API при запуске и должна
+быть быстрой. migrate.py сверяет результат с ScriptDirectory Alembic.
+"""
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import FrozenSet, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+VERSIONS_DIR = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+
+_REVISION = re.compile(r"^revision(?:\s*:[^=]+)?\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision(?:\s*:[^=]+)?\s*=\s*(.+)$", re.MULTILINE)
+_QUOTED = re.compile(r"['\"]([^'\"]+)['\"]")
+
+
+class SchemaStatus(NamedTuple):
+    ok: bool
+    current: FrozenSet[str]
+    expected: FrozenSet[str]
+
+
+@lru_cache(maxsize=1)
+def migration_heads() -> FrozenSet[str]:
+    """Головные ревизии миграций (на которые не ссылается ни одна другая ревизия)"""
+    revisions = set()
+    parents = set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = _REVISION.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION.search(source)
+        if down_revision:
+            parents.update(_QUOTED.findall(down_revision.group(1)))
+    return frozenset(revisions - parents)
+
+
+async def database_revisions(connection) -> FrozenSet[str]:
+    """Ревизии из таблицы alembic_version (пусто, если таблицы нет)"""
+    try:
+        result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+    except DBAPIError:
+        return frozenset()
+    return frozenset(result.scalars().all())
+
+
+async def check_schema(connection) -> SchemaStatus:
+    """Сравнить версию схемы в базе с головными ревизиями миграций"""
+    current = await database_revisions(connection)
+    expected = migration_heads()
+    return SchemaStatus(current == expected, current, expected)
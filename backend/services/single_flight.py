@@ -0,0 +1,143 @@
+"""Объединение одинаковых одновременных запросов (single-flight) для дорогих GET-эндпоинтов.
+
+Эндпоинт подключается декоратором @single_flight(). Одновременные GET-запросы с одинаковым
+путем и одинаковыми (после нормализации) параметрами строки запроса выполняются один раз:
+первый запускает вычисление в отдельной задаче, остальные ждут ее и получают тот же
+сериализованный ответ (статус, заголовки, тело). Поэтому нагрузка на базу в пиках растет
+с числом различных запросов, а не пользователей.
+
+grace - сколько секунд после завершения успешный ответ отдается новым одинаковым запросам
+(по умолчанию SINGLE_FLIGHT_GRACE_SECONDS, 0 - только одновременные запросы).
+"""
+import asyncio
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from starlette.routing import Match
+
+from services.metrics import single_flight_requests_total
+from settings import settings
+
+
+class SingleFlightOptions(NamedTuple):
+    grace: float
+
+
+class CapturedResponse(NamedTuple):
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+def single_flight(grace: Optional[float] = None):
+    """Декоратор эндпоинта: объединять одинаковые одновременные GET-запросы"""
+    def decorator(endpoint):
+        endpoint.__single_flight__ = SingleFlightOptions(
+            settings.single_flight_grace_seconds if grace is None else grace
+        )
+        return endpoint
+    return decorator
+
+
+def request_key(scope) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Путь и отсортированные параметры строки запроса"""
+    query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    return scope["path"], tuple(sorted(query))
+
+
+class SingleFlightMiddleware:
+    """ASGI middleware: общий ответ для одинаковых одновременных запросов к отмеченным эндпоинтам"""
+
+    def __init__(self, app, enabled: bool = settings.single_flight_enabled):
+        self.app = app
+        self.enabled = enabled
+        # Маршруты с @single_flight (определяются при первом запросе)
+        self._routes: Optional[list] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # Ключ -> (время окончания grace, ответ)
+        self._recent: Dict[tuple, Tuple[float, CapturedResponse]] = {}
+
+    def _match(self, scope):
+        if self._routes is None:
+            self._routes = [
+                (route, route.endpoint.__single_flight__)
+                for route in scope["app"].router.routes
+                if hasattr(getattr(route, "endpoint", None), "__single_flight__")
+            ]
+        for route, options in self._routes:
+            match, child_scope = route.matches(scope)
+            if match is Match.FULL:
+                return route, options, child_scope
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        matched = self._match(scope)
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+
+        route, options, child_scope = matched
+        # Как после маршрутизации: метрики и журналы видят маршрут и у ожидающих запросов
+        scope.update(child_scope)
+        key = request_key(scope)
+
+        recent = self._recent.get(key)
+        if recent is not None and recent[0] > time.monotonic():
+            single_flight_requests_total.inc(route=route.path, role="grace")
+            await self._replay(recent[1], send)
+            return
+
+        computation = self._inflight.get(key)
+        if computation is None:
+            single_flight_requests_total.inc(route=route.path, role="leader")
+            # Отдельная задача: отключение первого клиента не прерывает вычисление для остальных
+            computation = asyncio.ensure_future(self._compute(dict(scope)))
+            self._inflight[key] = computation
+            computation.add_done_callback(lambda done: self._finish(key, done, options.grace))
+        else:
+            single_flight_requests_total.inc(route=route.path, role="follower")
+
+        await self._replay(await asyncio.shield(computation), send)
+
+    async def _compute(self, scope) -> CapturedResponse:
+        start = {}
+        body = []
+        received = False
+
+        async def receive():
+            # Тело GET-запроса пустое; отключения клиента для общего вычисления не бывает
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Event().wait()
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        return CapturedResponse(start["status"], list(start.get("headers", [])), b"".join(body))
+
+    def _finish(self, key: tuple, computation: asyncio.Future, grace: float):
+        if self._inflight.get(key) is computation:
+            del self._inflight[key]
+        if grace <= 0 or computation.cancelled() or computation.exception() is not None:
+            return
+        response = computation.result()
+        if response.status < 400:
+            now = time.monotonic()
+            for expired in [recent_key for recent_key, (until, _) in self._recent.items() if until <= now]:
+                del self._recent[expired]
+            self._recent[key] = (now + grace, response)
+
+    @staticmethod
+    async def _replay(response: CapturedResponse, send):
+        await send({"type": "http.response.start", "status": response.status, "headers": response.headers})
+        await send({"type": "http.response.body", "body": response.body})
@@ -0,0 +1,199 @@
+"""Журнал медленных SQL-запросов с выборочным EXPLAIN (ANALYZE, BUFFERS).
+
+Запросы дольше порога (SLOW_QUERY_THRESHOLD_MS) записываются с типами параметров и
+маршрутом API, из которого они выполнены. Для доли медленных SELECT, построенных
+через SQLAlchemy (SLOW_QUERY_EXPLAIN_SAMPLE_RATE), план снимается отдельной задачей на отдельном
+соединении в транзакции с откатом, не задерживая исходный запрос; одновременно
+снимается не больше одного плана. Записи хранятся в кольцевом буфере
+(GET /api/admin/slow-queries) и дописываются в файл SLOW_QUERY_LOG_FILE (JSON по строке).
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import List, Optional
+
+from sqlalchemy import CompoundSelect, Select, event
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
+
+from services.query_stats import current_route
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Длина текста запроса в записи
+STATEMENT_LIMIT = 4000
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+
+def _parameter_type(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """Типы связанных параметров без значений (значения могут содержать персональные данные)"""
+    if executemany:
+        rows = list(parameters or ())
+        return {"executemany": len(rows), "types": parameter_shape(rows[0]) if rows else []}
+    if isinstance(parameters, dict):
+        return {name: _parameter_type(value) for name, value in parameters.items()}
+    return [_parameter_type(value) for value in parameters or ()]
+
+
+def _explainable(context) -> bool:
+    """EXPLAIN ANALYZE выполняет запрос: анализируются только чтения без блокировок.
+
+    Решение принимается по контексту выполнения, а не по тексту: WITH ... DELETE
+    (каскадное удаление подразделения) начинается так же, как SELECT с CTE.
+    Запросы text(), SELECT ... FOR UPDATE и SELECT с изменяющими CTE не анализируются.
+    """
+    compiled = getattr(context, "compiled", None)
+    if compiled is None or context.isinsert or context.isupdate or context.isdelete:
+        return False
+    statement = compiled.statement
+    if not isinstance(statement, (Select, CompoundSelect)):
+        return False
+    if getattr(statement, "_for_update_arg", None) is not None:
+        return False
+    return not any(isinstance(element, UpdateBase) for element in visitors.iterate(statement))
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: float,
+        explain_sample_rate: float,
+        buffer_size: int = 200,
+        log_file: str = "",
+        explain_timeout_ms: int = 5000
+    ):
+        self.threshold = threshold_ms / 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_timeout_ms = explain_timeout_ms
+        self.log_file = log_file
+        self._entries: deque = deque(maxlen=buffer_size)
+        self._engine = None
+        self._explain_task: Optional[asyncio.Task] = None
+        self._file_logger: Optional[logging.Logger] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def install(self, engine):
+        """Подключить журнал к движку (AsyncEngine); повторный вызов ничего не делает"""
+        if not self.enabled:
+            return
+        self._engine = engine
+        sync_engine = getattr(engine, "sync_engine", engine)
+        if not event.contains(sync_engine, "after_cursor_execute", self._after_cursor_execute):
+            event.listen(sync_engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        if self.log_file and self._file_logger is None:
+            self._file_logger = self._open_log_file(self.log_file)
+
+    @staticmethod
+    def _open_log_file(path: str) -> Optional[logging.Logger]:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"Файл журнала медленных запросов {path} недоступен: {e}")
+            return None
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        file_logger = logging.getLogger("slow_queries.file")
+        file_logger.handlers = [handler]
+        file_logger.setLevel(logging.INFO)
+        file_logger.propagate = False
+        return file_logger
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(elapsed * 1000, 2),
+            "route": current_route(),
+            "statement": statement[:STATEMENT_LIMIT],
+            "parameters": parameter_shape(parameters, executemany),
+            "rowcount": getattr(cursor, "rowcount", -1),
+            "plan": None,
+        }
+        self._entries.append(entry)
+        logger.warning(f"Медленный SQL-запрос {entry['duration_ms']} мс ({entry['route'] or 'вне запроса API'})")
+
+        if self._should_explain(context, executemany):
+            # Обработчик вызывается в цикле событий (через greenlet), план снимается отдельной задачей
+            self._explain_task = asyncio.get_running_loop().create_task(self._explain(entry, statement, parameters))
+        else:
+            self._persist(entry)
+
+    def _should_explain(self, context, executemany: bool) -> bool:
+        if executemany or not _explainable(context):
+            return False
+        if self._engine is None or self._engine.dialect.driver != "asyncpg":
+            return False
+        if self._explain_task is not None and not self._explain_task.done():
+            return False
+        return random.random() < self.explain_sample_rate
+
+    async def _explain(self, entry: dict, statement: str, parameters):
+        try:
+            async with self._engine.connect() as connection:
+                raw = await connection.get_raw_connection()
+                driver = raw.driver_connection
+                transaction = driver.transaction()
+                await transaction.start()
+                try:
+                    await driver.execute(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}")
+                    rows = await driver.fetch("EXPLAIN (ANALYZE, BUFFERS) " + statement, *(parameters or ()))
+                finally:
+                    await transaction.rollback()
+            entry["plan"] = "\n".join(row[0] for row in rows)
+        except Exception as e:
+            entry["plan_error"] = f"{e.__class__.__name__}: {e}"
+        finally:
+            self._persist(entry)
+
+    def _persist(self, entry: dict):
+        if self._file_logger is not None:
+            self._file_logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def entries(self, limit: Optional[int] = None, route: Optional[str] = None) -> List[dict]:
+        """Записи буфера, последние первыми"""
+        result = [dict(entry) for entry in reversed(self._entries) if route is None or entry["route"] == route]
+        return result[:limit] if limit else result
+
+    def clear(self):
+        self._entries.clear()
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.slow_query_threshold_ms,
+    explain_sample_rate=settings.slow_query_explain_sample_rate,
+    buffer_size=settings.slow_query_buffer_size,
+    log_file=settings.slow_query_log_file,
+    explain_timeout_ms=settings.slow_query_explain_timeout_ms,
+)
+
+
+def install_slow_query_log(engine):
+    slow_query_log.install(engine)
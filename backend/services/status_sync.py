@@ -0,0 +1,44 @@
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import Employee, EmployeeStatusSchedule
+
+
+def current_schedule_status(today: date):
+    """Скалярный подзапрос: статус из расписания сотрудника, активного на дату (или НЛ)"""
+    scheduled = (
+        select(EmployeeStatusSchedule.status)
+        .where(
+            EmployeeStatusSchedule.employee_id == Employee.id,
+            EmployeeStatusSchedule.start_date <= today,
+            EmployeeStatusSchedule.end_date >= today
+        )
+        .order_by(EmployeeStatusSchedule.start_date.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(scheduled, "НЛ")
+
+
+async def sync_employee_statuses(
+    db: AsyncSession,
+    employee_ids: Optional[Iterable[int]] = None,
+    today: Optional[date] = None
+) -> int:
+    """Синхронизировать статусы сотрудников с расписанием одним UPDATE.
+
+    Без employee_ids обновляются все активные сотрудники. Коммит выполняет вызывающий код.
+    """
+    statement = update(Employee).values(
+        status=current_schedule_status(today or date.today()),
+        status_updated_at=datetime.utcnow()
+    )
+    if employee_ids is None:
+        statement = statement.where(Employee.is_active == True)
+    else:
+        statement = statement.where(Employee.id.in_(list(employee_ids)))
+    result = await db.execute(statement.execution_options(synchronize_session=False))
+    return result.rowcount
@@ -0,0 +1,130 @@
+"""Легковесная трассировка: вложенные интервалы (spans) с длительностью и счетчиками.
+
+Трассировка включается блоком tracing(); вне его span() возвращает пустой интервал и
+почти ничего не стоит, поэтому вызовы можно оставлять в горячем коде. Трасса хранится
+в памяти процесса и выгружается в формате Chrome trace events (chrome://tracing,
+https://ui.perfetto.dev). Интервалы из процессов пула передаются обратно через
+Tracer.export() и добавляются в трассу запроса через Tracer.merge().
+
+Время берется из time.perf_counter (CLOCK_MONOTONIC в Linux - общий для процессов хоста).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+
+class Span:
+    __slots__ = ("name", "start", "args", "counters")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.start = time.perf_counter()
+        self.args = args
+        self.counters: Dict[str, float] = {}
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float):
+        """Накопить время подэтапа, слишком частого для отдельных интервалов (в мс)"""
+        self.count(name + "_ms", seconds * 1000)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def count(self, name: str, value: float = 1):
+        pass
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, name: str, process_name: str = "api"):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        # Завершенные интервалы: name, start, end (с), pid, tid, args
+        self.spans: List[dict] = []
+        self.process_names: Dict[int, str] = {self.pid: process_name}
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[Span]:
+        span = Span(name, args)
+        try:
+            yield span
+        finally:
+            self.spans.append({
+                "name": name,
+                "start": span.start,
+                "end": time.perf_counter(),
+                "pid": self.pid,
+                "tid": threading.get_ident(),
+                "args": {
+                    **span.args,
+                    **{counter: round(value, 3) if isinstance(value, float) else value for counter, value in span.counters.items()}
+                },
+            })
+
+    def export(self) -> dict:
+        """Интервалы для передачи в другой процесс (сериализуются pickle)"""
+        return {"spans": self.spans, "process_names": self.process_names}
+
+    def merge(self, exported: dict):
+        self.spans.extend(exported["spans"])
+        self.process_names.update(exported["process_names"])
+
+    def to_chrome(self) -> dict:
+        """Трасса в формате Chrome trace events (JSON Object Format)"""
+        events = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+            for pid, name in self.process_names.items()
+        ]
+        for span in sorted(self.spans, key=lambda span: span["start"]):
+            events.append({
+                "name": span["name"],
+                "cat": self.name,
+                "ph": "X",
+                "ts": round((span["start"] - self.origin) * 1e6, 1),
+                "dur": round((span["end"] - span["start"]) * 1e6, 1),
+                "pid": span["pid"],
+                "tid": span["tid"],
+                "args": span["args"],
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+_current_tracer: ContextVar[Optional[Tracer]] = ContextVar("current_tracer", default=None)
+
+
+@contextmanager
+def tracing(name: str, process_name: str = "api") -> Iterator[Tracer]:
+    """Включить трассировку в текущем контексте"""
+    tracer = Tracer(name, process_name)
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+@contextmanager
+def span(name: str, **args) -> Iterator[Span]:
+    """Интервал в текущей трассе (пустой интервал, если трассировка не включена)"""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    with tracer.span(name, **args) as current:
+        yield current
@@ -0,0 +1,62 @@
+"""Очистка нарядов по подразделению или структуре: та же область, что и у /generate"""
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from models.models import Department, DutyRecord, DutyType, Employee
+from routers.duty_distribution import DutyDistributionRequest, clear_duty_records
+
+pytestmark = pytest.mark.anyio
+
+DUTY_DATE = date(2031, 3, 10)
+
+
+async def _employee_with_record(db, department: Department, duty_type: DutyType) -> Employee:
+    employee = Employee(first_name="Иван", last_name="Тестов", position="Инженер", department_id=department.id)
+    db.add(employee)
+    await db.flush()
+    db.add(DutyRecord(employee_id=employee.id, duty_type_id=duty_type.id, duty_date=DUTY_DATE))
+    await db.flush()
+    return employee
+
+
+async def _records(db, employee: Employee) -> int:
+    result = await db.execute(select(func.count()).where(DutyRecord.employee_id == employee.id))
+    return result.scalar()
+
+
+async def _clear(db, structure_id: int) -> int:
+    request = DutyDistributionRequest(start_date="2031-03-01", end_date="2031-03-31", structure_id=structure_id)
+    return (await clear_duty_records(request, db))["deleted_count"]
+
+
+async def _structure(db, name: str, parent_id=None) -> Department:
+    department = Department(name=name, parent_id=parent_id)
+    db.add(department)
+    await db.flush()
+    return department
+
+
+async def test_clear_structure_without_subdepartments(db_session):
+    duty_type = DutyType(name="Тестовый наряд")
+    db_session.add(duty_type)
+    structure = await _structure(db_session, "Структура без подразделений")
+    other = await _structure(db_session, "Другая структура")
+    employee = await _employee_with_record(db_session, structure, duty_type)
+    other_employee = await _employee_with_record(db_session, other, duty_type)
+
+    assert await _clear(db_session, structure.id) == 1
+    assert await _records(db_session, employee) == 0
+    assert await _records(db_session, other_employee) == 1
+
+
+async def test_clear_structure_with_subdepartments(db_session):
+    duty_type = DutyType(name="Тестовый наряд")
+    db_session.add(duty_type)
+    structure = await _structure(db_session, "Структура")
+    child = await _structure(db_session, "Подразделение", structure.id)
+    employee = await _employee_with_record(db_session, child, duty_type)
+
+    assert await _clear(db_session, structure.id) == 1
+    assert await _records(db_session, employee) == 0
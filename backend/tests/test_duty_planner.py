@@ -0,0 +1,82 @@
+"""Планирование горизонта по синтетическим снимкам (без базы)"""
+import json
+from datetime import date, timedelta
+
+from services.duty_planner import (
+    PlanningDutyType, PlanningEmployee, PlanningSnapshot, carry_state_from_json, carry_state_to_json,
+    plan_horizon, plan_horizon_records
+)
+
+MONTHS = [(date(2026, 1, 1), date(2026, 1, 31)), (date(2026, 2, 1), date(2026, 2, 28)), (date(2026, 3, 1), date(2026, 3, 31))]
+
+DUTY_TYPES = [
+    PlanningDutyType(1, "Дежурный по роте", "regular", 2, 1),
+    # Многодневный наряд переходит через границу месяца
+    PlanningDutyType(2, "Караул", "regular", 1, 3),
+    PlanningDutyType(3, "Дежурный по кафедре", "academic", 1, 1),
+]
+
+EMPLOYEES = {
+    employee_id: PlanningEmployee(employee_id, f"Фамилия{employee_id}", "Имя", 1 + employee_id % 2, employee_id % 3)
+    for employee_id in range(1, 13)
+}
+
+QUALIFIED = {
+    1: list(range(1, 13)),
+    2: list(range(1, 9)),
+    3: list(range(5, 13)),
+}
+
+
+def _snapshot(start: date, end: date, existing_records=(), history: bool = False) -> PlanningSnapshot:
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    existing_records = set(existing_records)
+    period_counts = {}
+    for employee_id, _, _ in existing_records:
+        period_counts[employee_id] = period_counts.get(employee_id, 0) + 1
+    return PlanningSnapshot(
+        start_date=start,
+        end_date=end,
+        duty_types=DUTY_TYPES,
+        employees=EMPLOYEES,
+        qualified=QUALIFIED,
+        # Кафедра дежурит по будням, подразделения чередуются по неделям
+        calendar={(3, day): [1 + day.isocalendar()[1] % 2] for day in days if day.weekday() < 5},
+        period_counts=period_counts,
+        last_duty_by_type={(3, 1): date(2025, 12, 30), (4, 2): date(2025, 12, 29)} if history else {},
+        last_duty_any={3: (date(2025, 12, 30), 1), 4: (date(2025, 12, 29), 3)} if history else {},
+        preferences={(1, day): "unavailable" for day in days[:5]} | {(2, day): "preferred" for day in days[10:12]},
+        blocked={6: [(start + timedelta(days=3), start + timedelta(days=9))]},
+        existing_records=existing_records,
+    )
+
+
+def _records(snapshots, plans):
+    return sorted(
+        (record["employee_id"], record["duty_type_id"], record["duty_date"])
+        for record in plan_horizon_records(snapshots, plans)
+    )
+
+
+def test_horizon_matches_month_by_month_with_saved_state():
+    snapshots = [_snapshot(start, end, history=index == 0) for index, (start, end) in enumerate(MONTHS)]
+    plans, carry = plan_horizon(snapshots)
+    expected = _records(snapshots, plans)
+
+    first_plans, first_carry = plan_horizon(snapshots[:1])
+    first_records = _records(snapshots[:1], first_plans)
+    # Состояние сохраняется в базе как JSON
+    saved = carry_state_from_json(json.loads(json.dumps(carry_state_to_json(first_carry))))
+    assert saved == first_carry
+
+    # Наряды первого месяца уже в базе: продолжение многодневных попадает в следующий снимок
+    rest = [
+        _snapshot(start, end, [record for record in first_records if start <= record[2] <= end])
+        for start, end in MONTHS[1:]
+    ]
+    rest_plans, rest_carry = plan_horizon(rest, saved)
+    actual = sorted(first_records + _records(rest, rest_plans))
+
+    assert any(record[1] == 2 and record[2] == date(2026, 2, 1) for record in first_records)
+    assert actual == expected
+    assert rest_carry.planned_through == carry.planned_through
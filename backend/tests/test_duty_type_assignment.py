@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import select
+
+from models.models import Department, DutyType, Employee, EmployeeDutyType
+from services.duty_type_assignment import assign_duty_type, unassign_duty_type
+
+pytestmark = pytest.mark.anyio
+
+
+async def _department_with_employees(db, count: int):
+    department = Department(name="Тестовое подразделение")
+    duty_type = DutyType(name="Тестовый наряд")
+    db.add_all([department, duty_type])
+    await db.flush()
+    db.add_all([
+        Employee(first_name=f"Имя{index}", last_name="Тестов", position="Инженер", department_id=department.id)
+        for index in range(count)
+    ])
+    await db.flush()
+    return department, duty_type
+
+
+async def _active_assignments(db, duty_type_id: int) -> list:
+    result = await db.execute(
+        select(EmployeeDutyType.is_active).where(EmployeeDutyType.duty_type_id == duty_type_id)
+    )
+    return result.scalars().all()
+
+
+async def test_assign_skips_active_assignments(db_session):
+    department, duty_type = await _department_with_employees(db_session, 3)
+
+    assert await assign_duty_type(db_session, duty_type.id, department.id) == 3
+    assert await assign_duty_type(db_session, duty_type.id, department.id) == 0
+    assert await _active_assignments(db_session, duty_type.id) == [True, True, True]
+
+
+async def test_reassign_reactivates_deactivated_assignments(db_session):
+    department, duty_type = await _department_with_employees(db_session, 3)
+    await assign_duty_type(db_session, duty_type.id, department.id)
+
+    assert await unassign_duty_type(db_session, duty_type.id, department.id, deactivate=True) == 3
+    assert await _active_assignments(db_session, duty_type.id) == [False, False, False]
+
+    assert await assign_duty_type(db_session, duty_type.id, department.id) == 3
+    assert await _active_assignments(db_session, duty_type.id) == [True, True, True]
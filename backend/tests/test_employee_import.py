@@ -0,0 +1,47 @@
+"""Сопоставление подразделений при импорте сотрудников (без базы)"""
+from services.employee_import import ImportLookups, _department_keys, validate_row
+
+# Два подразделения "1 взвод" в разных ротах
+DEPARTMENTS = [
+    (1, "1 рота", None),
+    (2, "2 рота", None),
+    (3, "1 взвод", 1),
+    (4, "1 взвод", 2),
+    (5, "Штаб", None),
+]
+
+
+def _record(department: str) -> dict:
+    return {"last_name": "Иванов", "first_name": "Иван", "position": "Стрелок", "department": department}
+
+
+def _validate(department: str):
+    return validate_row(_record(department), ImportLookups(_department_keys(DEPARTMENTS), {}, {}))
+
+
+def test_unique_department_name():
+    values, _, errors = _validate("штаб")
+
+    assert errors == []
+    assert values["department_id"] == 5
+
+
+def test_duplicate_department_name_is_ambiguous():
+    values, _, errors = _validate("1 взвод")
+
+    assert values is None
+    assert len(errors) == 1
+    assert errors[0].startswith("Неоднозначное подразделение: 1 взвод")
+
+
+def test_department_path_resolves_duplicate_name():
+    values, _, errors = _validate("2 рота/ 1  взвод")
+
+    assert errors == []
+    assert values["department_id"] == 4
+
+
+def test_unknown_department_path():
+    _, _, errors = _validate("3 рота / 1 взвод")
+
+    assert errors == ["Подразделение не найдено: 3 рота / 1 взвод"]
@@ -0,0 +1,59 @@
+"""Потоковые ответы экспорта нарядов (без базы: строки подставляются вместо курсора)"""
+from datetime import date
+
+import anyio
+import pytest
+
+from routers import duty_distribution
+from services.excel_export import DutyExportRow
+from services.export_writers import EXPORT_WRITERS
+
+pytestmark = pytest.mark.anyio
+
+ROWS = [DutyExportRow(date(2025, 3, 1), 1, "Иванов Иван", 2, "1 рота", 3, "Дежурный по роте")]
+
+
+@pytest.fixture
+def export_rows(monkeypatch):
+    async def stream_rows(query):
+        for row in ROWS:
+            yield row
+
+    monkeypatch.setattr(duty_distribution, "_stream_export_rows", stream_rows)
+
+
+async def _send(response):
+    """Выполнить ответ как ASGI-приложение: (заголовки, тело)"""
+    messages = []
+    done = anyio.Event()
+
+    async def receive():
+        # Клиент не отключается до конца ответа
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await response({"type": "http", "method": "GET"}, receive, send)
+    done.set()
+    headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    return headers, b"".join(message.get("body", b"") for message in messages[1:])
+
+
+async def test_csv_export_content_type(export_rows):
+    response = duty_distribution._streaming_export_response(EXPORT_WRITERS["csv"], None, "duties")
+
+    headers, body = await _send(response)
+
+    assert headers["content-type"] == "text/csv; charset=utf-8"
+    assert headers["content-disposition"] == "attachment; filename=duties.csv"
+    assert body.decode("utf-8").splitlines()[1] == "2025-03-01,1,Иванов Иван,2,1 рота,3,Дежурный по роте"
+
+
+async def test_jsonl_export_content_type(export_rows):
+    response = duty_distribution._streaming_export_response(EXPORT_WRITERS["jsonl"], None, "duties")
+
+    headers, _ = await _send(response)
+
+    assert headers["content-type"] == "application/x-ndjson"
@@ -0,0 +1,102 @@
+"""Планы запросов: фильтры по месяцу должны использовать индексы по датам (миграция 005).
+
+EXPLAIN выполняется с отключенным последовательным сканированием (enable_seqscan = off):
+если предикат допускает поиск по индексу, планировщик выберет индекс даже на пустой
+таблице; для несаргабельных условий (extract(...) = ...) индекс по дате не используется.
+"""
+import json
+
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+
+from models.models import DepartmentDutyDay, DutyRecord, EmployeeDutyPreference, EmployeeStatusSchedule
+from services.periods import date_in_period, month_period, range_overlaps_period
+
+pytestmark = pytest.mark.anyio
+
+PERIOD = month_period(2025, 3)
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+# Индексы миграции 005 по таблицам
+DUTY_RECORDS_INDEXES = ("ix_duty_records_duty_date", "ix_duty_records_employee_id_duty_date")
+
+# (запрос, допустимые индексы, столбец даты в условии индекса). На маленькой таблице
+# планировщик может выбрать любой из индексов таблицы с этим столбцом, поэтому
+# проверяется условие поиска по дате, а не конкретный индекс.
+INDEXED = {
+    "наряды за месяц": (
+        select(DutyRecord.id).where(date_in_period(DutyRecord.duty_date, PERIOD)),
+        DUTY_RECORDS_INDEXES, "duty_date",
+    ),
+    "наряды сотрудника за месяц": (
+        select(DutyRecord.id)
+        .where(DutyRecord.employee_id == 1)
+        .where(date_in_period(DutyRecord.duty_date, PERIOD)),
+        ("ix_duty_records_employee_id_duty_date",), "duty_date",
+    ),
+    "дни академических нарядов за месяц": (
+        select(DepartmentDutyDay.id).where(date_in_period(DepartmentDutyDay.duty_date, PERIOD)),
+        ("ix_department_duty_days_duty_date",), "duty_date",
+    ),
+    "предпочтения сотрудника за месяц": (
+        select(EmployeeDutyPreference.id)
+        .where(EmployeeDutyPreference.employee_id == 1)
+        .where(date_in_period(EmployeeDutyPreference.date, PERIOD)),
+        ("ix_employee_duty_preferences_employee_id_date",), "date",
+    ),
+    "статусы сотрудника, пересекающие месяц": (
+        select(EmployeeStatusSchedule.id)
+        .where(EmployeeStatusSchedule.employee_id == 1)
+        .where(range_overlaps_period(EmployeeStatusSchedule.start_date, EmployeeStatusSchedule.end_date, PERIOD)),
+        ("ix_employee_status_schedules_employee_id_start_date",), "start_date",
+    ),
+}
+
+
+def _index_scans(plan: dict) -> list:
+    """(индекс, условие индекса) для всех сканирований по индексу в плане"""
+    found = []
+    if plan["Node Type"] in INDEX_SCANS:
+        found.append((plan["Index Name"], plan.get("Index Cond", "")))
+    for child in plan.get("Plans", []):
+        found.extend(_index_scans(child))
+    return found
+
+
+async def _explain(connection, query) -> dict:
+    sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    plan = (await connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+@pytest.fixture
+async def explain(db_connection):
+    # SET LOCAL действует до отката транзакции теста
+    await db_connection.execute(text("SET LOCAL enable_seqscan = off"))
+    return lambda query: _explain(db_connection, query)
+
+
+@pytest.mark.parametrize("title", list(INDEXED))
+async def test_period_filter_uses_index(explain, title):
+    query, indexes, column = INDEXED[title]
+
+    scans = _index_scans(await explain(query))
+
+    assert [name for name, condition in scans if name in indexes and column in condition], f"{title}: {scans or 'Seq Scan'}"
+
+
+async def test_extract_filter_does_not_use_date_index(explain):
+    query = (
+        select(DutyRecord.id)
+        .where(func.extract("year", DutyRecord.duty_date) == 2025)
+        .where(func.extract("month", DutyRecord.duty_date) == 3)
+    )
+
+    scans = _index_scans(await explain(query))
+
+    # Без условия по дате возможен только полный просмотр индекса (enable_seqscan = off)
+    assert not [name for name, condition in scans if "duty_date" in condition]
@@ -0,0 +1,40 @@
+"""Бюджет SQL-запросов (фикстура query_budget) на SQLite в памяти"""
+import pytest
+from sqlalchemy import create_engine, select
+
+from models.models import Base, Employee
+from services.query_stats import N_PLUS_ONE_THRESHOLD, QueryBudgetExceeded, install_query_stats
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    install_query_stats(engine)
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+
+def _select_employees(connection, times: int):
+    for employee_id in range(times):
+        connection.execute(select(Employee.id).where(Employee.id == employee_id)).all()
+
+
+def test_budget_allows_queries_within_limit(query_budget, connection):
+    with query_budget(N_PLUS_ONE_THRESHOLD - 1) as stats:
+        _select_employees(connection, N_PLUS_ONE_THRESHOLD - 1)
+
+    assert stats.count == N_PLUS_ONE_THRESHOLD - 1
+
+
+def test_budget_fails_when_exceeded(query_budget, connection):
+    with pytest.raises(QueryBudgetExceeded, match="при бюджете 2"):
+        with query_budget(2, allow_repeated=True):
+            _select_employees(connection, 3)
+
+
+def test_budget_fails_on_repeated_statement(query_budget, connection):
+    with pytest.raises(QueryBudgetExceeded, match="Подозрение на N\\+1"):
+        with query_budget(100):
+            _select_employees(connection, N_PLUS_ONE_THRESHOLD)
@@ -0,0 +1,55 @@
+"""Выбор запросов для EXPLAIN ANALYZE в журнале медленных запросов (без PostgreSQL)"""
+import pytest
+from sqlalchemy import create_engine, delete, event, select, text
+from sqlalchemy.exc import DBAPIError
+
+from models.models import Base, Department, Employee
+from services.department_cascade import department_subtree_ids
+from services.slow_queries import _explainable
+
+
+@pytest.fixture
+def executed():
+    """Выполнить запрос на SQLite в памяти и вернуть его контекст выполнения"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    contexts = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        contexts.append((statement, context))
+
+    def execute(statement):
+        contexts.clear()
+        # Контекст нужен до выполнения: DELETE в CTE SQLite не поддерживает
+        try:
+            with engine.begin() as connection:
+                connection.execute(statement)
+        except DBAPIError:
+            pass
+        return contexts[-1]
+
+    yield execute
+    engine.dispose()
+
+
+def test_recursive_cte_delete_is_not_explained(executed):
+    statement, context = executed(delete(Employee).where(Employee.department_id.in_(department_subtree_ids(1))))
+
+    assert statement.lstrip().upper().startswith("WITH RECURSIVE")
+    assert not _explainable(context)
+
+
+def test_recursive_cte_select_is_explained(executed):
+    statement, context = executed(select(Employee.id).where(Employee.department_id.in_(department_subtree_ids(1))))
+
+    assert statement.lstrip().upper().startswith("WITH RECURSIVE")
+    assert _explainable(context)
+
+
+def test_locking_and_modifying_selects_are_not_explained(executed):
+    removed = delete(Department).where(Department.id == 1).returning(Department.id).cte("removed")
+
+    assert not _explainable(executed(select(Department.id).with_for_update())[1])
+    assert not _explainable(executed(text("SELECT 1"))[1])
+    assert not _explainable(executed(select(removed.c.id))[1])